@@ -2,13 +2,17 @@
 网页监控系统 - 主应用
 包含反爬虫绕过功能，支持Telegram通知
 """
+import asyncio
+import concurrent.futures
 import os
 import json
-import asyncio
 import gc
+import threading
+import time
 from datetime import datetime
 from flask import Flask, render_template, request, jsonify
 from flask_cors import CORS
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 import sqlite3
@@ -19,6 +23,19 @@ from pathlib import Path
 from monitor import WebMonitor
 from database import Database
 from telegram_bot import TelegramNotifier
+from url_scheduler import DueScheduler
+from async_runner import AsyncLoopThread
+from log_writer import LogWriter
+from log_retention import LogRetention
+from notification_dispatcher import NotificationDispatcher
+from http_session import session_pool
+from page_readiness import READY_STRATEGIES
+from fetch_strategy import FETCH_MODES, DEFAULT_FETCH_MODE
+from response_cache import ResponseCache
+from run_coordinator import RunCoordinator
+from worker_pool import WorkerPool
+from url_leases import LeaseManager
+import metrics
 
 # 尝试导入健康监控（可选）
 try:
@@ -29,15 +46,6 @@ except ImportError:
     HEALTH_MONITOR_AVAILABLE = False
     logging.warning("健康监控模块未安装（需要psutil），部分功能不可用")
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('monitor.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 # 初始化Flask应用
@@ -45,13 +53,80 @@ app = Flask(__name__)
 CORS(app)
 app.config['JSON_AS_ASCII'] = False
 
-# 初始化数据库
-db = Database()
+# 只读接口的响应缓存（写接口调用 response_cache.invalidate() 使其失效）
+response_cache = ResponseCache()
+
+# 调度器检查到期URL的频率（秒）
+SCHEDULER_TICK_SECONDS = 5
+# 日志清理的执行频率（秒）
+LOG_RETENTION_SECONDS = 30
+# 检查工作进程数（环境变量 MONITOR_WORKERS），为0时在本进程中获取页面
+MONITOR_WORKERS = int(os.environ.get('MONITOR_WORKERS', '0'))
+# 分布式模式（环境变量 MONITOR_DISTRIBUTED=1）：同一台机器上的多个 app.py / worker.py 进程共享同一个本地数据库文件，
+# 通过租约表分配到期的URL，同一个URL不会被多个进程同时检查
+DISTRIBUTED_MODE = os.environ.get('MONITOR_DISTRIBUTED') == '1'
+
+# 全局对象（由 init_app() 创建）
+db = None
+# 监控日志批量写入
+log_writer = None
+# 日志保留策略（只保留最新5条，与界面上的说明一致）
+log_retention = None
+# Telegram通知派发（合并、限流重试，未送达的通知保存在数据库中）
+notification_dispatcher = None
+scheduler = None
+url_scheduler = None
+# 同一URL同时只允许一次检查，重叠的触发合并为完成后再检查一次
+run_coordinator = None
+loop_runner = None
+# 多进程模式：工作进程各自运行浏览器获取页面，结果由本进程统一写入数据库
+worker_pool = None
+# 分布式模式下的URL租约
+url_leases = None
 
-# 全局变量
 monitor = None
-scheduler = BackgroundScheduler()
 telegram_notifier = None
+# 已提交到后台事件循环、尚未完成的到期检查
+due_batches = set()
+
+
+def init_app():
+    """配置日志，创建数据库、调度器、后台事件循环等全局对象"""
+    global db, log_writer, log_retention, notification_dispatcher, scheduler, url_scheduler, \
+        run_coordinator, loop_runner, worker_pool, url_leases
+    
+    # 配置日志
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('monitor.log', encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
+    
+    # 建表并补齐旧数据库缺少的列（gunicorn 等导入本模块运行时同样需要）
+    db = Database()
+    db.init_db()
+    log_writer = LogWriter(db)
+    log_retention = LogRetention(db, keep_total=5)
+    notification_dispatcher = NotificationDispatcher(db)
+    
+    scheduler = BackgroundScheduler()
+    scheduler.add_listener(on_scheduler_event, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+    url_scheduler = DueScheduler()
+    run_coordinator = RunCoordinator()
+    loop_runner = AsyncLoopThread()
+    
+    if MONITOR_WORKERS > 0:
+        worker_pool = WorkerPool(db.db_path, MONITOR_WORKERS)
+    if DISTRIBUTED_MODE:
+        url_leases = LeaseManager(db, batch_size=20)
+    
+    # 队列长度指标
+    metrics.track_queue('log_writer', log_writer.pending)
+    metrics.track_queue('notifications', notification_dispatcher.pending)
+    metrics.track_queue('pending_checks', lambda: monitor.pending_checks if monitor else 0)
 
 
 def init_monitor():
@@ -67,20 +142,74 @@ def init_monitor():
             config.get('proxy_url')
         )
     
-    monitor = WebMonitor(db, telegram_notifier)
-
-
-def run_monitor_task():
-    """执行监控任务"""
+    # 关闭旧监控器持有的浏览器
+    if monitor:
+        loop_runner.run(monitor.close())
+    
+    notification_dispatcher.notifier = telegram_notifier
+    monitor = WebMonitor(db, telegram_notifier, log_writer=log_writer,
+                         notification_dispatcher=notification_dispatcher,
+                         worker_pool=worker_pool)
+
+
+def shutdown():
+    """关闭调度器、浏览器、HTTP会话、后台事件循环，写完剩余日志后关闭数据库连接"""
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    if loop_runner.is_running():
+        try:
+            if monitor:
+                loop_runner.run(monitor.close(), timeout=30)
+            loop_runner.run(notification_dispatcher.close(), timeout=30)
+            loop_runner.run(session_pool.close(), timeout=10)
+        except Exception as e:
+            logger.error(f"关闭监控器失败: {e}")
+    loop_runner.stop()
+    if worker_pool:
+        worker_pool.close()
+    if url_leases:
+        url_leases.close()
+    if HEALTH_MONITOR_AVAILABLE:
+        health_monitor.stop()
+    log_writer.close()
+    db.close()
+
+
+async def run_checks(url_ids=None):
+    """
+    执行监控任务（在后台事件循环中运行）
+    
+    Args:
+        url_ids: 需要检查的URL ID列表，为None时检查所有启用的URL
+    """
     try:
-        logger.info("开始执行监控任务...")
+        # 启用的URL及其关键词（缓存，URL或关键词被修改时失效）
+        urls = db.get_monitor_config()
+        if url_ids is not None:
+            wanted = set(url_ids)
+            urls = [url_data for url_data in urls if url_data['id'] in wanted]
         
-        # 执行监控
-        if monitor:
-            asyncio.run(monitor.check_all_urls())
+        # 已在排队或检查中的URL不再重复检查（由正在运行的任务完成后补查）
+        claimed = run_coordinator.claim([url_data['id'] for url_data in urls])
+        if not claimed:
+            logger.info("所有URL都在检查中，本次监控任务已合并")
+            return
         
-        # 自动清理旧日志（保留最新5条）
-        db.cleanup_old_logs(keep_count=5)
+        logger.info("开始执行监控任务...")
+        
+        while claimed:
+            wanted = set(claimed)
+            batch = [url_data for url_data in db.get_monitor_config() if url_data['id'] in wanted]
+            try:
+                # 执行监控
+                if monitor and batch:
+                    await monitor.check_urls(batch, run_coordinator.started)
+            finally:
+                # 检查期间再次被触发的URL，完成后立即再检查一次
+                claimed = run_coordinator.finish(claimed)
+            
+            # 监控会写日志、删除已命中的关键词
+            response_cache.invalidate('logs', 'keywords', 'status')
         
         # 健康检查（每次监控后）
         if HEALTH_MONITOR_AVAILABLE:
@@ -96,6 +225,63 @@ def run_monitor_task():
         logger.error(f"监控任务执行出错: {e}", exc_info=True)
 
 
+def run_monitor_task(url_ids=None):
+    """执行监控任务并等待完成（手动触发时在后台线程中调用）"""
+    loop_runner.run(run_checks(url_ids))
+
+
+async def run_due_batch(due_ids):
+    """检查一批到期的URL，完成后释放租约（分布式模式）"""
+    started = time.monotonic()
+    try:
+        await run_checks(due_ids)
+    finally:
+        if url_leases:
+            await asyncio.to_thread(url_leases.release, due_ids)
+    metrics.CYCLE_DURATION_SECONDS.observe(time.monotonic() - started)
+
+
+def run_due_checks():
+    """
+    调度器定时任务：把已到期的URL提交到后台事件循环，不等待检查完成
+    
+    慢的或卡住的URL不会阻塞调度器，之后到期的URL按时开始检查；
+    同一URL的检查由 run_coordinator 合并，不会重叠
+    """
+    if url_leases:
+        # 分布式模式：从租约表认领到期的URL
+        due_ids = url_leases.claim()
+    else:
+        due_ids = url_scheduler.pop_due()
+    
+    if due_ids:
+        future = loop_runner.submit(run_due_batch(due_ids))
+        due_batches.add(future)
+        future.add_done_callback(due_batches.discard)
+
+
+def on_scheduler_event(event):
+    """
+    调度器跳过监控任务时计数（上一次任务仍在运行，或错过了执行时间）
+    
+    任务耗时超过调度间隔本身很常见，只有真正被跳过的调度才说明到期URL被推迟；
+    每个URL的推迟时长见 SCHEDULE_LAG_SECONDS
+    """
+    if event.job_id != 'monitor_task':
+        return
+    reason = 'max_instances' if event.code == EVENT_JOB_MAX_INSTANCES else 'missed'
+    metrics.SCHEDULER_SKIPPED_RUNS_TOTAL.labels(reason).inc()
+
+
+def refresh_url_schedule(url_id):
+    """URL被修改后同步更新调度"""
+    url_data = db.get_url(url_id)
+    if url_data and url_data['enabled']:
+        url_scheduler.upsert(url_id, url_data['check_interval'])
+    else:
+        url_scheduler.remove(url_id)
+
+
 # ==================== API路由 ====================
 
 @app.route('/')
@@ -105,6 +291,7 @@ def index():
 
 
 @app.route('/api/urls', methods=['GET'])
+@response_cache.cached('urls', ttl=10)
 def get_urls():
     """获取所有监控URL"""
     try:
@@ -123,11 +310,29 @@ def add_url():
         url = data.get('url', '').strip()
         name = data.get('name', '').strip()
         check_interval = data.get('check_interval', 300)
+        block_resources = data.get('block_resources', True)
+        resource_allowlist = (data.get('resource_allowlist') or '').strip() or None
+        wait_strategy = data.get('wait_strategy') or 'networkidle'
+        wait_target = (data.get('wait_target') or '').strip() or None
+        wait_timeout = data.get('wait_timeout') or 10000
+        early_exit = data.get('early_exit', False)
+        content_selector = (data.get('content_selector') or '').strip() or None
+        fetch_mode = data.get('fetch_mode') or DEFAULT_FETCH_MODE
         
         if not url:
             return jsonify({'success': False, 'message': 'URL不能为空'}), 400
         
-        url_id = db.add_url(url, name, check_interval)
+        if wait_strategy not in READY_STRATEGIES:
+            return jsonify({'success': False, 'message': f'就绪策略应为: {", ".join(READY_STRATEGIES)}'}), 400
+        
+        if fetch_mode not in FETCH_MODES:
+            return jsonify({'success': False, 'message': f'获取方式应为: {", ".join(FETCH_MODES)}'}), 400
+        
+        url_id = db.add_url(url, name, check_interval, block_resources, resource_allowlist,
+                            wait_strategy, wait_target, wait_timeout, early_exit, content_selector,
+                            fetch_mode)
+        url_scheduler.upsert(url_id, check_interval)
+        response_cache.invalidate('urls')
         return jsonify({'success': True, 'data': {'id': url_id}})
     except Exception as e:
         logger.error(f"添加URL失败: {e}")
@@ -139,13 +344,30 @@ def update_url(url_id):
     """更新监控URL"""
     try:
         data = request.json
+        wait_strategy = data.get('wait_strategy')
+        if wait_strategy is not None and wait_strategy not in READY_STRATEGIES:
+            return jsonify({'success': False, 'message': f'就绪策略应为: {", ".join(READY_STRATEGIES)}'}), 400
+        fetch_mode = data.get('fetch_mode')
+        if fetch_mode is not None and fetch_mode not in FETCH_MODES:
+            return jsonify({'success': False, 'message': f'获取方式应为: {", ".join(FETCH_MODES)}'}), 400
+        
         db.update_url(
             url_id,
             data.get('url'),
             data.get('name'),
             data.get('check_interval'),
-            data.get('enabled')
+            data.get('enabled'),
+            data.get('block_resources'),
+            data.get('resource_allowlist'),
+            wait_strategy,
+            data.get('wait_target'),
+            data.get('wait_timeout'),
+            data.get('early_exit'),
+            data.get('content_selector'),
+            fetch_mode
         )
+        refresh_url_schedule(url_id)
+        response_cache.invalidate('urls', 'keywords', 'logs')
         return jsonify({'success': True})
     except Exception as e:
         logger.error(f"更新URL失败: {e}")
@@ -157,6 +379,8 @@ def delete_url(url_id):
     """删除监控URL"""
     try:
         db.delete_url(url_id)
+        url_scheduler.remove(url_id)
+        response_cache.invalidate('urls', 'keywords', 'logs')
         return jsonify({'success': True})
     except Exception as e:
         logger.error(f"删除URL失败: {e}")
@@ -164,6 +388,7 @@ def delete_url(url_id):
 
 
 @app.route('/api/keywords', methods=['GET'])
+@response_cache.cached('keywords', ttl=10)
 def get_keywords():
     """获取所有关键词"""
     try:
@@ -188,6 +413,7 @@ def add_keyword():
             return jsonify({'success': False, 'message': '关键词不能为空'}), 400
         
         keyword_id = db.add_keyword(url_id, keyword, fuzzy_match)
+        response_cache.invalidate('keywords')
         return jsonify({'success': True, 'data': {'id': keyword_id}})
     except Exception as e:
         logger.error(f"添加关键词失败: {e}")
@@ -199,6 +425,7 @@ def delete_keyword(keyword_id):
     """删除关键词"""
     try:
         db.delete_keyword(keyword_id)
+        response_cache.invalidate('keywords')
         return jsonify({'success': True})
     except Exception as e:
         logger.error(f"删除关键词失败: {e}")
@@ -206,6 +433,7 @@ def delete_keyword(keyword_id):
 
 
 @app.route('/api/logs', methods=['GET'])
+@response_cache.cached('logs', ttl=2)
 def get_logs():
     """获取监控日志"""
     try:
@@ -219,6 +447,7 @@ def get_logs():
 
 
 @app.route('/api/telegram/config', methods=['GET'])
+@response_cache.cached('telegram', ttl=30)
 def get_telegram_config():
     """获取Telegram配置"""
     try:
@@ -260,9 +489,11 @@ def update_telegram_config():
                 return jsonify({'success': False, 'message': '代理地址格式不正确，应为 http://、https:// 或 socks5:// 开头'}), 400
         
         db.update_telegram_config(bot_token, chat_id, proxy_url)
+        response_cache.invalidate('telegram')
         
         # 重新初始化Telegram通知器
         telegram_notifier = TelegramNotifier(bot_token, chat_id, proxy_url)
+        notification_dispatcher.notifier = telegram_notifier
         if monitor:
             monitor.telegram_notifier = telegram_notifier
         
@@ -279,7 +510,7 @@ def test_telegram():
         if not telegram_notifier:
             return jsonify({'success': False, 'message': '请先配置Telegram'}), 400
         
-        success = asyncio.run(telegram_notifier.send_message("✅ Telegram通知测试成功！"))
+        success = loop_runner.run(telegram_notifier.send_message("✅ Telegram通知测试成功！"), timeout=60)
         
         if success:
             return jsonify({'success': True, 'message': '测试消息已发送'})
@@ -297,18 +528,34 @@ def start_monitor():
         if not scheduler.running:
             init_monitor()
             
-            # 添加定时任务（每1分钟执行一次）
+            # 继续发送上次未送达的通知
+            loop_runner.run(notification_dispatcher.start())
+            
+            # 按每个URL的检查间隔调度
+            url_scheduler.load(db.get_monitor_config())
+            
+            # 添加定时任务（定期派发已到期的URL）
             scheduler.add_job(
-                func=run_monitor_task,
-                trigger=IntervalTrigger(seconds=60),
+                func=run_due_checks,
+                trigger=IntervalTrigger(seconds=SCHEDULER_TICK_SECONDS),
                 id='monitor_task',
                 name='网页监控任务',
                 replace_existing=True
             )
             
+            # 定期分批清理旧日志
+            scheduler.add_job(
+                func=log_retention.run_step,
+                trigger=IntervalTrigger(seconds=LOG_RETENTION_SECONDS),
+                id='log_retention',
+                name='日志清理任务',
+                replace_existing=True
+            )
+            
             scheduler.start()
             logger.info("监控调度器已启动")
-            
+            response_cache.invalidate('status')
+        
         return jsonify({'success': True, 'message': '监控已启动'})
     except Exception as e:
         logger.error(f"启动监控失败: {e}")
@@ -323,8 +570,17 @@ def stop_monitor():
             # 优雅关闭：先暂停，再关闭
             scheduler.pause()
             scheduler.shutdown(wait=True)
+            # 等待已提交的到期检查完成后再释放浏览器
+            concurrent.futures.wait(list(due_batches))
             logger.info("监控调度器已停止")
+            response_cache.invalidate('status')
             
+            # 释放浏览器资源
+            if monitor:
+                loop_runner.run(monitor.close())
+            if worker_pool:
+                worker_pool.close()
+        
         return jsonify({'success': True, 'message': '监控已停止'})
     except Exception as e:
         logger.error(f"停止监控失败: {e}")
@@ -332,18 +588,29 @@ def stop_monitor():
 
 
 @app.route('/api/monitor/status', methods=['GET'])
+@response_cache.cached('status', ttl=2)
 def get_monitor_status():
     """获取监控状态"""
     try:
         status = {
             'running': scheduler.running,
-            'next_run_time': None
+            'next_run_time': None,
+            # 排队、检查中、待补查的URL，以及被合并的触发次数
+            'runs': run_coordinator.status()
         }
+        if worker_pool:
+            status['workers'] = worker_pool.status()
+        
+        if url_leases:
+            status['leases'] = url_leases.status()
         
         if scheduler.running:
-            job = scheduler.get_job('monitor_task')
-            if job and job.next_run_time:
-                status['next_run_time'] = job.next_run_time.isoformat()
+            if url_leases:
+                next_due = db.get_next_lease_due_time()
+            else:
+                next_due = url_scheduler.next_due_time()
+            if next_due:
+                status['next_run_time'] = datetime.fromtimestamp(next_due).isoformat()
         
         return jsonify({'success': True, 'data': status})
     except Exception as e:
@@ -359,7 +626,6 @@ def run_monitor_now():
             init_monitor()
         
         # 在后台执行监控任务
-        import threading
         thread = threading.Thread(target=run_monitor_task)
         thread.daemon = True  # 设置为守护线程，程序退出时自动结束
         thread.start()
@@ -375,7 +641,9 @@ def cleanup_logs():
     """手动清理日志"""
     try:
         keep_count = request.json.get('keep_count', 5) if request.json else 5
+        log_writer.flush(timeout=30)
         cleaned = db.cleanup_old_logs(keep_count)
+        response_cache.invalidate('logs')
         
         if cleaned:
             return jsonify({'success': True, 'message': f'日志已清理，保留最新{keep_count}条'})
@@ -386,17 +654,25 @@ def cleanup_logs():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus指标"""
+    body, content_type = metrics.render_metrics()
+    return app.response_class(body, mimetype=None, content_type=content_type)
+
+
 @app.route('/api/health', methods=['GET'])
+@response_cache.cached('urls', 'telegram', 'status', ttl=5)
 def health_check():
     """健康检查接口"""
     try:
-        # 检查数据库连接
-        urls = db.get_all_urls()
+        # 检查数据库连接（只统计数量，不加载URL列表）
+        urls_count = db.count_urls()
         
         status = {
             'status': 'healthy',
             'monitor_running': scheduler.running,
-            'urls_count': len(urls),
+            'urls_count': urls_count,
             'telegram_configured': db.get_telegram_config() is not None
         }
         
@@ -416,6 +692,12 @@ def health_check():
         return jsonify({'success': False, 'message': str(e), 'status': 'unhealthy'}), 500
 
 
+# 多进程模式的检查工作进程以spawn方式启动，python app.py 启动时会以 __mp_main__ 的名义重新执行本文件；
+# 工作进程只需要 worker_pool 和 monitor 模块，不创建数据库、调度器、后台线程等全局对象
+if __name__ != '__mp_main__':
+    init_app()
+
+
 if __name__ == '__main__':
     import signal
     import sys
@@ -423,8 +705,7 @@ if __name__ == '__main__':
     # 优雅关闭处理
     def signal_handler(sig, frame):
         logger.info("收到关闭信号，正在优雅关闭...")
-        if scheduler.running:
-            scheduler.shutdown(wait=False)
+        shutdown()
         sys.exit(0)
     
     signal.signal(signal.SIGINT, signal_handler)
@@ -434,14 +715,14 @@ if __name__ == '__main__':
     Path('templates').mkdir(exist_ok=True)
     Path('static').mkdir(exist_ok=True)
     
-    # 初始化数据库
-    db.init_db()
+    # 后台采样系统状态，健康检查接口直接读取最新结果
+    if HEALTH_MONITOR_AVAILABLE:
+        health_monitor.start()
     
     # 启动Flask应用
     logger.info("启动Web服务器...")
     try:
         app.run(host='0.0.0.0', port=9527, debug=False)
     finally:
-        if scheduler.running:
-            scheduler.shutdown(wait=False)
+        shutdown()
 
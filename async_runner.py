@@ -0,0 +1,98 @@
+"""
+后台事件循环模块
+在独立线程中运行一个常驻的asyncio事件循环，
+浏览器、HTTP会话等异步资源可以在多次监控之间保持存活
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Coroutine, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLoopThread:
+    """
+    常驻事件循环线程
+    
+    Flask路由和调度器线程通过 submit()/run() 把协程提交到同一个事件循环中执行
+    """
+    
+    def __init__(self, name: str = 'monitor-loop'):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+    
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        self.start()
+        return self._loop
+    
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        """启动事件循环线程（已启动则直接返回）"""
+        with self._lock:
+            if self.is_running():
+                return
+            
+            self._started.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        
+        self._started.wait()
+        logger.info("后台事件循环已启动")
+    
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._started.set()
+        
+        try:
+            loop.run_forever()
+        finally:
+            # 取消尚未完成的任务后关闭循环
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+    
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        """提交协程（线程安全），返回 concurrent.futures.Future"""
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("不能在事件循环线程内同步提交协程，请直接 await")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """提交协程并阻塞等待结果"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+    
+    def call_soon(self, callback, *args):
+        """在事件循环线程中调用普通函数（线程安全）"""
+        self.loop.call_soon_threadsafe(callback, *args)
+    
+    def stop(self, timeout: float = 10):
+        """停止事件循环并等待线程退出"""
+        with self._lock:
+            if not self.is_running():
+                return
+            
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._thread = None
+        
+        logger.info("后台事件循环已停止")
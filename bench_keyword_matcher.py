@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+关键词匹配性能对比
+逐个关键词调用 check_keyword 的旧实现 vs Aho–Corasick 自动机（KeywordMatcher）
+
+用法:
+    python bench_keyword_matcher.py [关键词数量] [页面大小KB]
+"""
+import random
+import re
+import string
+import sys
+import time
+
+from keyword_matcher import KeywordMatcher
+
+
+def check_keyword(content: str, keyword: str, fuzzy_match: bool = True) -> bool:
+    """旧实现（与 WebMonitor.check_keyword 相同）"""
+    if not content or not keyword:
+        return False
+    
+    content_lower = content.lower()
+    keyword_lower = keyword.lower()
+    
+    if fuzzy_match:
+        return keyword_lower in content_lower
+    else:
+        pattern = r'\b' + re.escape(keyword_lower) + r'\b'
+        return bool(re.search(pattern, content_lower))
+
+
+def random_word(rng: random.Random) -> str:
+    if rng.random() < 0.5:
+        return ''.join(rng.choice(string.ascii_letters) for _ in range(rng.randint(3, 10)))
+    return ''.join(chr(rng.randint(0x4e00, 0x4fff)) for _ in range(rng.randint(2, 4)))
+
+
+def build_page(rng: random.Random, size_kb: int) -> str:
+    parts = []
+    length = 0
+    while length < size_kb * 1024:
+        word = random_word(rng)
+        tag = rng.choice(['<div>', '</div>', ' ', ' ', ', ', '<p class="x">', '</p>\n'])
+        parts.append(word + tag)
+        length += len(word) + len(tag)
+    return ''.join(parts)
+
+
+def build_keywords(rng: random.Random, page: str, count: int):
+    keywords = []
+    for i in range(count):
+        if i % 4 == 0:
+            # 部分关键词取自页面内容，保证有命中
+            start = rng.randint(0, len(page) - 20)
+            keyword = page[start:start + rng.randint(3, 8)].strip() or random_word(rng)
+        else:
+            keyword = random_word(rng)
+        keywords.append({'id': i, 'keyword': keyword, 'fuzzy_match': 1 if i % 3 else 0})
+    return keywords
+
+
+def bench(func, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    keyword_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    page_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    
+    rng = random.Random(42)
+    page = build_page(rng, page_kb)
+    keywords = build_keywords(rng, page, keyword_count)
+    
+    def old_loop():
+        return [kw for kw in keywords if check_keyword(page, kw['keyword'], bool(kw['fuzzy_match']))]
+    
+    matcher = KeywordMatcher(keywords)
+    
+    def new_matcher():
+        return matcher.find(page)
+    
+    expected = old_loop()
+    actual = new_matcher()
+    assert [kw['id'] for kw in expected] == [kw['id'] for kw in actual], "匹配结果不一致"
+    
+    build_time = bench(lambda: KeywordMatcher(keywords))
+    old_time = bench(old_loop)
+    new_time = bench(new_matcher)
+    
+    print(f"关键词: {keyword_count}, 页面: {page_kb}KB, 命中: {len(expected)}")
+    print(f"逐个关键词扫描:    {old_time * 1000:8.1f} ms")
+    print(f"Aho–Corasick 匹配: {new_time * 1000:8.1f} ms（构建自动机 {build_time * 1000:.1f} ms，按URL缓存）")
+    print(f"加速比: {old_time / new_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""
+浏览器池模块
+长期持有一个Chromium实例，并维护一组可复用的BrowserContext
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+
+import metrics
+
+# 尝试导入psutil（用于浏览器内存检测，可选）
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+# 浏览器启动参数（反检测配置）
+LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',  # 禁用自动化控制特征
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-web-security',
+    '--disable-features=IsolateOrigins,site-per-process',
+    '--no-proxy-server',  # 禁用代理服务器
+]
+
+# 上下文配置
+CONTEXT_OPTIONS = {
+    'viewport': {'width': 1920, 'height': 1080},
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'locale': 'zh-CN',
+    'timezone_id': 'Asia/Shanghai',
+}
+
+# 反检测脚本（每个上下文注入一次）
+STEALTH_SCRIPT = """
+    // 覆盖 navigator.webdriver
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+    
+    // 覆盖 navigator.plugins
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5]
+    });
+    
+    // 覆盖 navigator.languages
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['zh-CN', 'zh', 'en-US', 'en']
+    });
+    
+    // 覆盖 chrome 对象
+    window.chrome = {
+        runtime: {}
+    };
+    
+    // 覆盖权限查询
+    const originalQuery = window.navigator.permissions.query;
+    window.navigator.permissions.query = (parameters) => (
+        parameters.name === 'notifications' ?
+            Promise.resolve({ state: Notification.permission }) :
+            originalQuery(parameters)
+    );
+"""
+
+
+class _PooledContext:
+    """池中的上下文及其使用统计"""
+    
+    def __init__(self, context: BrowserContext, browser: Browser):
+        self.context = context
+        self.browser = browser
+        self.uses = 0
+        self.created_at = time.monotonic()
+
+
+class BrowserPool:
+    """
+    共享浏览器池
+    
+    - 浏览器在多次监控之间保持运行，崩溃后自动重启
+    - 上下文预先注入反检测脚本，用完归还到池中复用
+    - 上下文使用次数超过上限，或浏览器内存超过阈值时回收重建
+    """
+    
+    def __init__(self, max_contexts: int = 3, max_context_uses: int = 50,
+                 memory_limit_mb: int = 1024, memory_check_interval: float = 10.0):
+        self.max_contexts = max_contexts
+        self.max_context_uses = max_context_uses
+        self.memory_limit_mb = memory_limit_mb
+        self.memory_check_interval = memory_check_interval
+        
+        self.playwright = None
+        self.browser: Optional[Browser] = None
+        self.restarts = 0
+        
+        self._idle: List[_PooledContext] = []
+        self._loop = None
+        self._lock = None
+        self._slots = None
+        self._last_memory_check = 0.0
+    
+    def _bind_loop(self):
+        """绑定当前事件循环（Playwright对象不能跨事件循环使用）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        
+        if self._loop is not None:
+            logger.warning("事件循环已变更，丢弃旧的浏览器实例")
+        self.playwright = None
+        self.browser = None
+        self._idle = []
+        self._loop = loop
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(self.max_contexts)
+    
+    async def start(self):
+        """启动浏览器（已运行则直接返回）"""
+        self._bind_loop()
+        async with self._lock:
+            if self.browser and self.browser.is_connected():
+                return
+            
+            if self.browser:
+                # 浏览器已断开（崩溃），重新启动
+                self.restarts += 1
+                metrics.BROWSER_RESTARTS_TOTAL.inc()
+                logger.warning(f"浏览器连接已断开，正在重启（第 {self.restarts} 次）")
+                self._idle = []
+                self.browser = None
+            
+            try:
+                if not self.playwright:
+                    self.playwright = await async_playwright().start()
+                
+                # 启动浏览器，配置反检测参数
+                self.browser = await self.playwright.chromium.launch(
+                    headless=True,
+                    args=LAUNCH_ARGS
+                )
+                self.browser.on('disconnected', lambda _: logger.warning("浏览器已断开连接"))
+                
+                logger.info("浏览器初始化成功")
+            except Exception as e:
+                logger.error(f"浏览器初始化失败: {e}")
+                raise
+    
+    async def _new_context(self) -> _PooledContext:
+        """创建注入了反检测脚本的上下文"""
+        context = await self.browser.new_context(**CONTEXT_OPTIONS)
+        await context.add_init_script(STEALTH_SCRIPT)
+        return _PooledContext(context, self.browser)
+    
+    async def _acquire_context(self) -> _PooledContext:
+        """从池中取出一个可用上下文，没有则新建"""
+        await self.start()
+        
+        while self._idle:
+            pooled = self._idle.pop()
+            if pooled.browser is self.browser and self.browser.is_connected():
+                return pooled
+        
+        return await self._new_context()
+    
+    async def _release_context(self, pooled: _PooledContext):
+        """归还上下文，必要时回收"""
+        pooled.uses += 1
+        
+        retire = False
+        if pooled.browser is not self.browser or not pooled.browser.is_connected():
+            retire = True
+        elif pooled.uses >= self.max_context_uses:
+            logger.info(f"上下文已使用 {pooled.uses} 次，回收重建")
+            retire = True
+        elif self._memory_exceeded():
+            logger.info("浏览器内存超过阈值，回收空闲上下文")
+            retire = True
+            await self._retire_idle()
+        
+        if retire:
+            await self._close_context(pooled)
+        else:
+            self._idle.append(pooled)
+    
+    def _memory_exceeded(self) -> bool:
+        """检测浏览器进程树内存是否超过阈值（需要psutil，按间隔采样）"""
+        if not PSUTIL_AVAILABLE or not self.memory_limit_mb:
+            return False
+        
+        now = time.monotonic()
+        if now - self._last_memory_check < self.memory_check_interval:
+            return False
+        self._last_memory_check = now
+        
+        try:
+            total = 0
+            for child in psutil.Process(os.getpid()).children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+            return total / 1024 / 1024 > self.memory_limit_mb
+        except Exception as e:
+            logger.debug(f"获取浏览器内存失败: {e}")
+            return False
+    
+    async def _retire_idle(self):
+        """关闭所有空闲上下文"""
+        idle, self._idle = self._idle, []
+        for pooled in idle:
+            await self._close_context(pooled)
+    
+    async def _close_context(self, pooled: _PooledContext):
+        try:
+            await pooled.context.close()
+        except Exception as e:
+            logger.debug(f"关闭上下文失败: {e}")
+    
+    @asynccontextmanager
+    async def page(self):
+        """
+        从池中借出一个页面
+        
+        用法:
+            async with pool.page() as page:
+                await page.goto(url)
+        """
+        self._bind_loop()
+        async with self._slots:
+            pooled = await self._acquire_context()
+            page: Optional[Page] = None
+            try:
+                page = await pooled.context.new_page()
+                yield page
+            finally:
+                if page:
+                    try:
+                        await page.close()
+                    except Exception as e:
+                        logger.debug(f"关闭页面失败: {e}")
+                await self._release_context(pooled)
+    
+    async def close(self):
+        """关闭所有上下文、浏览器及Playwright"""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        
+        await self._retire_idle()
+        
+        if self.browser:
+            try:
+                await self.browser.close()
+            except Exception as e:
+                logger.debug(f"关闭浏览器失败: {e}")
+            self.browser = None
+        
+        if self.playwright:
+            try:
+                await self.playwright.stop()
+            except Exception as e:
+                logger.debug(f"停止Playwright失败: {e}")
+            self.playwright = None
+        
+        logger.info("浏览器已关闭")
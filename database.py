@@ -4,22 +4,111 @@
 """
 import sqlite3
 import logging
+import threading
+import time
+from collections import deque
 from datetime import datetime
 from typing import List, Dict, Optional
 
 logger = logging.getLogger(__name__)
 
 
+class _PooledConnection:
+    """连接池中的连接：用法与sqlite3连接相同，close() 时归还到连接池而不是真正关闭"""
+    
+    __slots__ = ('_conn', '_db')
+    
+    def __init__(self, conn: sqlite3.Connection, db: 'Database'):
+        self._conn = conn
+        self._db = db
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+    
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+    
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._db._release_connection(conn)
+
+
 class Database:
-    def __init__(self, db_path='monitor.db'):
+    def __init__(self, db_path='monitor.db', pool_size: int = 8, busy_timeout: int = 5000,
+                 config_ttl: float = 60):
+        """
+        Args:
+            db_path: 数据库文件路径
+            pool_size: 连接池保留的空闲连接数
+            busy_timeout: 数据库被锁定时的等待时间（毫秒）
+            config_ttl: 监控配置缓存的最长有效期（秒），用于兜底其他进程对数据库的修改
+        """
         self.db_path = db_path
+        self.pool_size = pool_size
+        self.busy_timeout = busy_timeout
+        # 空闲连接（deque的append/pop是线程安全的）
+        self._idle = deque()
+        
+        # 监控配置缓存（启用的URL及其关键词），URL或关键词被修改时失效
+        self.config_ttl = config_ttl
+        self._config_lock = threading.Lock()
+        self._config_cache: Optional[List[Dict]] = None
+        self._config_loaded_at = 0.0
+        self._config_version = 0
     
-    def get_connection(self):
-        """获取数据库连接"""
-        conn = sqlite3.connect(self.db_path)
+    def _connect(self) -> sqlite3.Connection:
+        """创建新连接并设置PRAGMA"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout / 1000,
+            check_same_thread=False,  # 连接在池中跨线程复用，但同一时刻只被一个线程持有
+            cached_statements=256     # 预编译语句缓存
+        )
         conn.row_factory = sqlite3.Row
+        
+        # WAL模式下读写互不阻塞（Web界面轮询不会与监控写日志互相等待）
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout)}')
+        conn.execute('PRAGMA foreign_keys=ON')
         return conn
     
+    def get_connection(self):
+        """从连接池获取数据库连接（调用 close() 归还）"""
+        try:
+            conn = self._idle.pop()
+        except IndexError:
+            conn = self._connect()
+        return _PooledConnection(conn, self)
+    
+    def _release_connection(self, conn: sqlite3.Connection):
+        """归还连接，未提交的事务会被回滚"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        
+        if len(self._idle) < self.pool_size:
+            self._idle.append(conn)
+        else:
+            conn.close()
+    
+    def close(self):
+        """关闭连接池中的所有空闲连接"""
+        while True:
+            try:
+                conn = self._idle.pop()
+            except IndexError:
+                break
+            conn.close()
+    
     def init_db(self):
         """初始化数据库"""
         conn = self.get_connection()
@@ -33,11 +122,33 @@ class Database:
                 name TEXT,
                 check_interval INTEGER DEFAULT 300,
                 enabled BOOLEAN DEFAULT 1,
+                block_resources BOOLEAN DEFAULT 1,
+                resource_allowlist TEXT,
+                wait_strategy TEXT DEFAULT 'networkidle',
+                wait_target TEXT,
+                wait_timeout INTEGER DEFAULT 10000,
+                early_exit BOOLEAN DEFAULT 0,
+                content_selector TEXT,
+                fetch_mode TEXT DEFAULT 'auto',
+                learned_fetch_mode TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
         
+        # 旧版本数据库升级：补充新增字段
+        self._ensure_columns(cursor, 'monitor_urls', {
+            'block_resources': 'BOOLEAN DEFAULT 1',
+            'resource_allowlist': 'TEXT',
+            'wait_strategy': "TEXT DEFAULT 'networkidle'",
+            'wait_target': 'TEXT',
+            'wait_timeout': 'INTEGER DEFAULT 10000',
+            'early_exit': 'BOOLEAN DEFAULT 0',
+            'content_selector': 'TEXT',
+            'fetch_mode': "TEXT DEFAULT 'auto'",
+            'learned_fetch_mode': 'TEXT',
+        })
+        
         # 创建关键词表
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS keywords (
@@ -74,26 +185,105 @@ class Database:
             )
         ''')
         
+        # 创建页面快照表（记录上次检查时的内容指纹）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS page_snapshots (
+                url_id INTEGER PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                keywords_hash TEXT,
+                content_length INTEGER DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (url_id) REFERENCES monitor_urls (id) ON DELETE CASCADE
+            )
+        ''')
+        
+        # 创建HTTP缓存表（条件请求验证器，用于简化版HTTP监控）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url_id INTEGER PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                expires_at REAL DEFAULT 0,
+                keywords_hash TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (url_id) REFERENCES monitor_urls (id) ON DELETE CASCADE
+            )
+        ''')
+        
+        # 创建通知发件箱（未送达的Telegram通知，重启后继续发送）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url_id INTEGER,
+                url_name TEXT,
+                url TEXT,
+                keyword TEXT,
+                note TEXT,
+                attempts INTEGER DEFAULT 0,
+                next_attempt_at REAL DEFAULT 0,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # 创建URL租约表（多个进程共享数据库时，按租约分配到期的URL）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS url_leases (
+                url_id INTEGER PRIMARY KEY,
+                worker_id TEXT,
+                lease_until REAL DEFAULT 0,
+                next_due_at REAL DEFAULT 0,
+                last_run_at REAL,
+                FOREIGN KEY (url_id) REFERENCES monitor_urls (id) ON DELETE CASCADE
+            )
+        ''')
+        
+        # 索引：日志按ID倒序分页/清理、按URL查询日志、按URL查询关键词
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_monitor_logs_url_id ON monitor_logs (url_id, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_monitor_logs_created_at ON monitor_logs (created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_keywords_url_id ON keywords (url_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_notification_outbox_next ON notification_outbox (next_attempt_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_url_leases_due ON url_leases (next_due_at)')
+        
         conn.commit()
         conn.close()
         logger.info("数据库初始化完成")
     
+    def _ensure_columns(self, cursor, table: str, columns: Dict[str, str]):
+        """为已存在的表补充缺少的字段"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        existing = {row['name'] for row in cursor.fetchall()}
+        
+        for name, definition in columns.items():
+            if name not in existing:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+                logger.info(f"数据库升级: {table} 表新增字段 {name}")
+    
     # ==================== URL管理 ====================
     
-    def add_url(self, url: str, name: str = None, check_interval: int = 300) -> int:
+    def add_url(self, url: str, name: str = None, check_interval: int = 300,
+                block_resources: bool = True, resource_allowlist: str = None,
+                wait_strategy: str = 'networkidle', wait_target: str = None,
+                wait_timeout: int = 10000, early_exit: bool = False,
+                content_selector: str = None, fetch_mode: str = 'auto') -> int:
         """添加监控URL"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-            INSERT INTO monitor_urls (url, name, check_interval)
-            VALUES (?, ?, ?)
-        ''', (url, name or url, check_interval))
+            INSERT INTO monitor_urls (url, name, check_interval, block_resources, resource_allowlist,
+                                      wait_strategy, wait_target, wait_timeout, early_exit,
+                                      content_selector, fetch_mode)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (url, name or url, check_interval, 1 if block_resources else 0, resource_allowlist,
+              wait_strategy, wait_target, wait_timeout, 1 if early_exit else 0, content_selector,
+              fetch_mode))
         
         url_id = cursor.lastrowid
         conn.commit()
         conn.close()
         
+        self.invalidate_config()
         logger.info(f"添加监控URL: {url} (ID: {url_id})")
         return url_id
     
@@ -103,7 +293,9 @@ class Database:
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT id, url, name, check_interval, enabled, created_at, updated_at
+            SELECT id, url, name, check_interval, enabled, block_resources, resource_allowlist,
+                   wait_strategy, wait_target, wait_timeout, early_exit, content_selector,
+                   fetch_mode, learned_fetch_mode, created_at, updated_at
             FROM monitor_urls
             ORDER BY created_at DESC
         ''')
@@ -113,13 +305,44 @@ class Database:
         
         return urls
     
+    def count_urls(self) -> int:
+        """获取监控URL数量"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT COUNT(*) FROM monitor_urls')
+        count = cursor.fetchone()[0]
+        conn.close()
+        
+        return count
+    
+    def get_url(self, url_id: int) -> Optional[Dict]:
+        """获取单个监控URL"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, url, name, check_interval, enabled, block_resources, resource_allowlist,
+                   wait_strategy, wait_target, wait_timeout, early_exit, content_selector,
+                   fetch_mode, learned_fetch_mode, created_at, updated_at
+            FROM monitor_urls
+            WHERE id = ?
+        ''', (url_id,))
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        return dict(row) if row else None
+    
     def get_enabled_urls(self) -> List[Dict]:
         """获取启用的监控URL"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT id, url, name, check_interval
+            SELECT id, url, name, check_interval, block_resources, resource_allowlist,
+                   wait_strategy, wait_target, wait_timeout, early_exit, content_selector,
+                   fetch_mode, learned_fetch_mode
             FROM monitor_urls
             WHERE enabled = 1
             ORDER BY created_at DESC
@@ -130,8 +353,94 @@ class Database:
         
         return urls
     
+    def get_monitor_snapshot(self) -> List[Dict]:
+        """
+        一次查询获取所有启用的URL及其关键词
+        
+        Returns:
+            URL列表，每项与 get_enabled_urls() 相同，另有 keywords 字段（与 get_keywords_by_url() 相同）
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT u.id, u.url, u.name, u.check_interval, u.block_resources, u.resource_allowlist,
+                   u.wait_strategy, u.wait_target, u.wait_timeout, u.early_exit, u.content_selector,
+                   u.fetch_mode, u.learned_fetch_mode,
+                   k.id AS keyword_id, k.keyword, k.fuzzy_match
+            FROM monitor_urls u
+            LEFT JOIN keywords k ON k.url_id = u.id
+            WHERE u.enabled = 1
+            ORDER BY u.created_at DESC, u.id, k.id
+        ''')
+        rows = cursor.fetchall()
+        conn.close()
+        
+        urls = []
+        by_id = {}
+        for row in rows:
+            url_data = by_id.get(row['id'])
+            if url_data is None:
+                url_data = {
+                    'id': row['id'],
+                    'url': row['url'],
+                    'name': row['name'],
+                    'check_interval': row['check_interval'],
+                    'block_resources': row['block_resources'],
+                    'resource_allowlist': row['resource_allowlist'],
+                    'wait_strategy': row['wait_strategy'],
+                    'wait_target': row['wait_target'],
+                    'wait_timeout': row['wait_timeout'],
+                    'early_exit': row['early_exit'],
+                    'content_selector': row['content_selector'],
+                    'fetch_mode': row['fetch_mode'],
+                    'learned_fetch_mode': row['learned_fetch_mode'],
+                    'keywords': []
+                }
+                by_id[row['id']] = url_data
+                urls.append(url_data)
+            
+            if row['keyword_id'] is not None:
+                url_data['keywords'].append({
+                    'id': row['keyword_id'],
+                    'keyword': row['keyword'],
+                    'fuzzy_match': row['fuzzy_match']
+                })
+        
+        return urls
+    
+    def get_monitor_config(self) -> List[Dict]:
+        """
+        获取监控配置（带缓存的 get_monitor_snapshot()）
+        
+        返回的数据在多个线程间共享，调用方不要修改
+        """
+        with self._config_lock:
+            if self._config_cache is not None and time.monotonic() - self._config_loaded_at < self.config_ttl:
+                return self._config_cache
+            version = self._config_version
+        
+        urls = self.get_monitor_snapshot()
+        
+        with self._config_lock:
+            # 加载期间配置被修改时不写入缓存，下次重新加载
+            if version == self._config_version:
+                self._config_cache = urls
+                self._config_loaded_at = time.monotonic()
+        return urls
+    
+    def invalidate_config(self):
+        """使监控配置缓存失效（URL或关键词被修改后调用）"""
+        with self._config_lock:
+            self._config_version += 1
+            self._config_cache = None
+    
     def update_url(self, url_id: int, url: str = None, name: str = None, 
-                   check_interval: int = None, enabled: bool = None):
+                   check_interval: int = None, enabled: bool = None,
+                   block_resources: bool = None, resource_allowlist: str = None,
+                   wait_strategy: str = None, wait_target: str = None,
+                   wait_timeout: int = None, early_exit: bool = None,
+                   content_selector: str = None, fetch_mode: str = None):
         """更新监控URL"""
         conn = self.get_connection()
         cursor = conn.cursor()
@@ -151,6 +460,34 @@ class Database:
         if enabled is not None:
             updates.append('enabled = ?')
             params.append(1 if enabled else 0)
+        if block_resources is not None:
+            updates.append('block_resources = ?')
+            params.append(1 if block_resources else 0)
+        if resource_allowlist is not None:
+            updates.append('resource_allowlist = ?')
+            params.append(resource_allowlist)
+        if wait_strategy is not None:
+            updates.append('wait_strategy = ?')
+            params.append(wait_strategy)
+        if wait_target is not None:
+            updates.append('wait_target = ?')
+            params.append(wait_target)
+        if wait_timeout is not None:
+            updates.append('wait_timeout = ?')
+            params.append(wait_timeout)
+        if early_exit is not None:
+            updates.append('early_exit = ?')
+            params.append(1 if early_exit else 0)
+        if content_selector is not None:
+            # 空字符串表示清除选择器（匹配整个页面）
+            updates.append('content_selector = ?')
+            params.append(content_selector.strip() or None)
+        if fetch_mode is not None:
+            updates.append('fetch_mode = ?')
+            params.append(fetch_mode)
+        if url is not None or content_selector is not None or fetch_mode is not None:
+            # 页面或获取方式变化后重新学习（auto模式）
+            updates.append('learned_fetch_mode = NULL')
         
         if updates:
             updates.append('updated_at = CURRENT_TIMESTAMP')
@@ -166,19 +503,146 @@ class Database:
             conn.commit()
         
         conn.close()
+        self.invalidate_config()
         logger.info(f"更新监控URL: {url_id}")
     
+    def set_learned_fetch_mode(self, url_id: int, fetch_mode: str):
+        """记录auto模式下学习到的获取方式（http / browser）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('UPDATE monitor_urls SET learned_fetch_mode = ? WHERE id = ?', (fetch_mode, url_id))
+        
+        conn.commit()
+        conn.close()
+        self.invalidate_config()
+    
     def delete_url(self, url_id: int):
         """删除监控URL"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('DELETE FROM monitor_urls WHERE id = ?', (url_id,))
+        cursor.execute('DELETE FROM page_snapshots WHERE url_id = ?', (url_id,))
+        cursor.execute('DELETE FROM http_cache WHERE url_id = ?', (url_id,))
+        cursor.execute('DELETE FROM url_leases WHERE url_id = ?', (url_id,))
         conn.commit()
         conn.close()
         
+        self.invalidate_config()
         logger.info(f"删除监控URL: {url_id}")
     
+    # ==================== URL租约 ====================
+    
+    def claim_due_urls(self, worker_id: str, limit: int = 10, lease_seconds: float = 120,
+                       now: float = None) -> List[int]:
+        """
+        认领已到期且未被其他进程持有租约的URL
+        
+        在写事务（BEGIN IMMEDIATE）中完成查询和认领，多个进程同时调用时不会认领到同一个URL；
+        持有者崩溃后租约到期，URL会被其他进程重新认领
+        
+        Args:
+            worker_id: 认领者标识
+            limit: 最多认领的URL数
+            lease_seconds: 租约时长（秒），检查时间较长时需调用 renew_leases() 续约
+            now: 当前时间戳（默认 time.time()）
+        
+        Returns:
+            认领成功的URL ID列表
+        """
+        now = now or time.time()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('BEGIN IMMEDIATE')
+        
+        # 新增的URL补充租约记录（立即到期）
+        cursor.execute('''
+            INSERT INTO url_leases (url_id)
+            SELECT u.id FROM monitor_urls u
+            WHERE u.enabled = 1 AND NOT EXISTS (SELECT 1 FROM url_leases l WHERE l.url_id = u.id)
+        ''')
+        
+        cursor.execute('''
+            SELECT l.url_id FROM url_leases l
+            JOIN monitor_urls u ON u.id = l.url_id
+            WHERE u.enabled = 1 AND l.next_due_at <= ? AND l.lease_until <= ?
+            ORDER BY l.next_due_at
+            LIMIT ?
+        ''', (now, now, limit))
+        url_ids = [row['url_id'] for row in cursor.fetchall()]
+        
+        cursor.executemany('''
+            UPDATE url_leases SET worker_id = ?, lease_until = ? WHERE url_id = ?
+        ''', [(worker_id, now + lease_seconds, url_id) for url_id in url_ids])
+        
+        conn.commit()
+        conn.close()
+        
+        return url_ids
+    
+    def renew_leases(self, worker_id: str, url_ids: List[int], lease_seconds: float = 120) -> List[int]:
+        """
+        续约仍由 worker_id 持有的URL
+        
+        Returns:
+            续约成功的URL ID（租约已过期并被其他进程认领的URL不在其中）
+        """
+        lease_until = time.time() + lease_seconds
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        renewed = []
+        for url_id in url_ids:
+            cursor.execute('''
+                UPDATE url_leases SET lease_until = ? WHERE url_id = ? AND worker_id = ?
+            ''', (lease_until, url_id, worker_id))
+            if cursor.rowcount == 1:
+                renewed.append(url_id)
+        
+        conn.commit()
+        conn.close()
+        
+        return renewed
+    
+    def release_lease(self, url_id: int, worker_id: str, next_due_at: float) -> bool:
+        """
+        检查完成后释放租约，并设置下次检查时间
+        
+        Returns:
+            租约是否仍由 worker_id 持有（已被其他进程接管时不修改）
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE url_leases
+            SET worker_id = NULL, lease_until = 0, next_due_at = ?, last_run_at = ?
+            WHERE url_id = ? AND worker_id = ?
+        ''', (next_due_at, time.time(), url_id, worker_id))
+        released = cursor.rowcount == 1
+        
+        conn.commit()
+        conn.close()
+        
+        return released
+    
+    def get_next_lease_due_time(self) -> Optional[float]:
+        """未被认领的启用URL中最近的下次检查时间"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT MIN(l.next_due_at) FROM url_leases l
+            JOIN monitor_urls u ON u.id = l.url_id
+            WHERE u.enabled = 1 AND l.worker_id IS NULL
+        ''')
+        row = cursor.fetchone()
+        conn.close()
+        
+        return row[0]
+    
     # ==================== 关键词管理 ====================
     
     def add_keyword(self, url_id: int, keyword: str, fuzzy_match: bool = True) -> int:
@@ -195,6 +659,7 @@ class Database:
         conn.commit()
         conn.close()
         
+        self.invalidate_config()
         logger.info(f"添加关键词: {keyword} (URL ID: {url_id})")
         return keyword_id
     
@@ -251,8 +716,43 @@ class Database:
         conn.commit()
         conn.close()
         
+        self.invalidate_config()
         logger.info(f"删除关键词: {keyword_id}")
     
+    def claim_keyword(self, keyword_id: int, notification: Dict = None) -> bool:
+        """
+        认领（删除）已命中的关键词
+        
+        删除成功说明本次检查是第一个处理它的，只有认领成功的一方发送通知。
+        传入 notification 时在同一事务中写入通知发件箱，认领和通知要么都生效，要么都不生效
+        
+        Args:
+            keyword_id: 关键词ID
+            notification: 通知内容（url_id, url_name, url, keyword, note）
+        
+        Returns:
+            是否认领成功
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM keywords WHERE id = ?', (keyword_id,))
+        claimed = cursor.rowcount == 1
+        
+        if claimed and notification:
+            cursor.execute('''
+                INSERT INTO notification_outbox (url_id, url_name, url, keyword, note)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (notification.get('url_id'), notification.get('url_name'), notification.get('url'),
+                  notification.get('keyword'), notification.get('note')))
+        
+        conn.commit()
+        conn.close()
+        
+        if claimed:
+            self.invalidate_config()
+        return claimed
+    
     # ==================== 日志管理 ====================
     
     def add_log(self, url_id: int, keyword: str = None, found: bool = False, message: str = None):
@@ -267,7 +767,31 @@ class Database:
         
         conn.commit()
         conn.close()
-    
+
+    def add_logs(self, records: List[tuple]):
+        """
+        批量添加监控日志（单个事务）
+
+        Args:
+            records: (url_id, keyword, found, message, created_at) 元组列表，
+                     所属URL已被删除的日志会被忽略
+        """
+        if not records:
+            return
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.executemany('''
+            INSERT INTO monitor_logs (url_id, keyword, found, message, created_at)
+            SELECT ?, ?, ?, ?, ?
+            WHERE EXISTS (SELECT 1 FROM monitor_urls WHERE id = ?)
+        ''', [(url_id, keyword, 1 if found else 0, message, created_at, url_id)
+              for url_id, keyword, found, message, created_at in records])
+
+        conn.commit()
+        conn.close()
+
     def get_logs(self, limit: int = 100, url_id: int = None) -> List[Dict]:
         """获取监控日志"""
         conn = self.get_connection()
@@ -280,7 +804,7 @@ class Database:
                 FROM monitor_logs l
                 JOIN monitor_urls u ON l.url_id = u.id
                 WHERE l.url_id = ?
-                ORDER BY l.created_at DESC
+                ORDER BY l.id DESC
                 LIMIT ?
             ''', (url_id, limit))
         else:
@@ -289,7 +813,7 @@ class Database:
                        u.name as url_name, u.url
                 FROM monitor_logs l
                 JOIN monitor_urls u ON l.url_id = u.id
-                ORDER BY l.created_at DESC
+                ORDER BY l.id DESC
                 LIMIT ?
             ''', (limit,))
         
@@ -336,32 +860,276 @@ class Database:
         
         return dict(row) if row else None
     
+    # ==================== 页面快照 ====================
+    
+    def get_page_snapshot(self, url_id: int) -> Optional[Dict]:
+        """获取URL上次检查时的页面指纹"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT url_id, content_hash, keywords_hash, content_length, updated_at
+            FROM page_snapshots
+            WHERE url_id = ?
+        ''', (url_id,))
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        return dict(row) if row else None
+    
+    def save_page_snapshot(self, url_id: int, content_hash: str, keywords_hash: str = None,
+                           content_length: int = 0):
+        """保存URL本次检查时的页面指纹"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO page_snapshots (url_id, content_hash, keywords_hash, content_length, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (url_id, content_hash, keywords_hash, content_length))
+        
+        conn.commit()
+        conn.close()
+    
+    # ==================== HTTP缓存 ====================
+    
+    def get_http_cache(self, url_id: int) -> Optional[Dict]:
+        """获取URL的HTTP缓存验证器"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT url_id, etag, last_modified, expires_at, keywords_hash, updated_at
+            FROM http_cache
+            WHERE url_id = ?
+        ''', (url_id,))
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        return dict(row) if row else None
+    
+    def save_http_cache(self, url_id: int, etag: str = None, last_modified: str = None,
+                        expires_at: float = 0, keywords_hash: str = None):
+        """保存URL的HTTP缓存验证器"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO http_cache (url_id, etag, last_modified, expires_at, keywords_hash, updated_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (url_id, etag, last_modified, expires_at, keywords_hash))
+        
+        conn.commit()
+        conn.close()
+    
     # ==================== 日志清理 ====================
     
     def cleanup_old_logs(self, keep_count: int = 5):
         """清理旧日志，只保留最新的N条"""
+        threshold = self.get_log_keep_threshold(keep_count)
+        if threshold is None:
+            return False
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        # 日志ID随写入时间递增，按主键范围删除，不需要排序
+        cursor.execute('DELETE FROM monitor_logs WHERE id < ?', (threshold,))
+        deleted = cursor.rowcount
+        
+        conn.commit()
+        conn.close()
+        
+        if deleted:
+            logger.info(f"清理旧日志：删除了 {deleted} 条记录，保留最新 {keep_count} 条")
+        return deleted > 0
+    
+    # ==================== 通知发件箱 ====================
+    
+    def add_notifications(self, notifications: List[Dict]) -> List[int]:
+        """
+        批量写入待发送的通知
+        
+        Args:
+            notifications: 通知列表，每项包含 url_id, url_name, url, keyword, note
+        
+        Returns:
+            通知ID列表
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        ids = []
+        for item in notifications:
+            cursor.execute('''
+                INSERT INTO notification_outbox (url_id, url_name, url, keyword, note)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (item.get('url_id'), item.get('url_name'), item.get('url'),
+                  item.get('keyword'), item.get('note')))
+            ids.append(cursor.lastrowid)
+        
+        conn.commit()
+        conn.close()
+        return ids
+    
+    def claim_due_notifications(self, now: float, lease_seconds: float = 60,
+                                limit: int = 200) -> List[Dict]:
+        """
+        认领已到发送时间的通知（按写入顺序）
+        
+        认领的通知推迟 lease_seconds 秒，多个进程共享数据库时不会重复发送；
+        发送成功后删除，失败时重新安排，进程崩溃则到期后由其他进程发送
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('''
+            SELECT id, url_id, url_name, url, keyword, note, attempts, next_attempt_at, created_at
+            FROM notification_outbox
+            WHERE next_attempt_at <= ?
+            ORDER BY id
+            LIMIT ?
+        ''', (now, limit))
+        
+        notifications = [dict(row) for row in cursor.fetchall()]
+        cursor.executemany('UPDATE notification_outbox SET next_attempt_at = ? WHERE id = ?',
+                           [(now + lease_seconds, item['id']) for item in notifications])
+        
+        conn.commit()
+        conn.close()
+        
+        return notifications
+    
+    def get_next_notification_time(self) -> Optional[float]:
+        """最近一条待发送通知的发送时间"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT MIN(next_attempt_at) FROM notification_outbox')
+        row = cursor.fetchone()
+        conn.close()
+        
+        return row[0]
+    
+    def delete_notifications(self, notification_ids: List[int]):
+        """删除已送达（或放弃）的通知"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # 获取日志总数
-        cursor.execute('SELECT COUNT(*) as count FROM monitor_logs')
-        total = cursor.fetchone()['count']
+        cursor.executemany('DELETE FROM notification_outbox WHERE id = ?',
+                           [(notification_id,) for notification_id in notification_ids])
         
-        if total > keep_count:
-            # 删除旧日志
+        conn.commit()
+        conn.close()
+    
+    def reschedule_notifications(self, notification_ids: List[int], next_attempt_at: float,
+                                 error: str = None):
+        """发送失败，推迟到指定时间重试"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            UPDATE notification_outbox
+            SET attempts = attempts + 1, next_attempt_at = ?, last_error = ?
+            WHERE id = ?
+        ''', [(next_attempt_at, error, notification_id) for notification_id in notification_ids])
+        
+        conn.commit()
+        conn.close()
+    
+    # ==================== 日志保留 ====================
+    
+    def get_log_keep_threshold(self, keep_count: int, url_id: int = None) -> Optional[int]:
+        """
+        获取需要保留的最旧一条日志的ID（更小的ID可以删除）
+        
+        Returns:
+            日志数量未超过 keep_count 时返回None
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        # OFFSET keep_count 取到的是最新一条需要删除的日志
+        if url_id:
+            cursor.execute('''
+                SELECT id FROM monitor_logs
+                WHERE url_id = ?
+                ORDER BY id DESC
+                LIMIT 1 OFFSET ?
+            ''', (url_id, max(keep_count, 0)))
+        else:
             cursor.execute('''
-                DELETE FROM monitor_logs
-                WHERE id NOT IN (
+                SELECT id FROM monitor_logs
+                ORDER BY id DESC
+                LIMIT 1 OFFSET ?
+            ''', (max(keep_count, 0),))
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        return row['id'] + 1 if row else None
+    
+    def get_first_log_id_since(self, since: str) -> Optional[int]:
+        """获取指定时间（UTC，YYYY-MM-DD HH:MM:SS）之后的第一条日志ID"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT MIN(id) FROM monitor_logs WHERE created_at >= ?', (since,))
+        row = cursor.fetchone()
+        
+        if row[0] is None:
+            # 全部日志都早于该时间
+            cursor.execute('SELECT MAX(id) + 1 FROM monitor_logs')
+            row = cursor.fetchone()
+        
+        conn.close()
+        return row[0]
+    
+    def get_log_url_ids(self) -> List[int]:
+        """获取有日志的URL ID列表"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT DISTINCT url_id FROM monitor_logs')
+        url_ids = [row[0] for row in cursor.fetchall()]
+        
+        conn.close()
+        return url_ids
+    
+    def delete_logs_before(self, before_id: int, url_id: int = None, limit: int = 500) -> int:
+        """
+        删除ID小于 before_id 的日志，每次最多删除 limit 条（按主键范围，事务很短）
+        
+        Returns:
+            删除的日志数
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        if url_id:
+            cursor.execute('''
+                DELETE FROM monitor_logs WHERE id IN (
                     SELECT id FROM monitor_logs
-                    ORDER BY created_at DESC
+                    WHERE url_id = ? AND id < ?
+                    ORDER BY id
                     LIMIT ?
                 )
-            ''', (keep_count,))
-            
-            deleted = cursor.rowcount
-            conn.commit()
-            logger.info(f"清理旧日志：删除了 {deleted} 条记录，保留最新 {keep_count} 条")
+            ''', (url_id, before_id, limit))
+        else:
+            cursor.execute('''
+                DELETE FROM monitor_logs WHERE id IN (
+                    SELECT id FROM monitor_logs
+                    WHERE id < ?
+                    ORDER BY id
+                    LIMIT ?
+                )
+            ''', (before_id, limit))
         
+        deleted = cursor.rowcount
+        conn.commit()
         conn.close()
-        return total > keep_count
-
+        
+        return deleted
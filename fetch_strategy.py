@@ -0,0 +1,83 @@
+"""
+页面获取策略模块
+按URL配置选择获取方式：
+- http:     只用HTTP请求（不启动浏览器）
+- browser:  只用Playwright浏览器
+- auto:     先用HTTP请求，响应像JS外壳页或反爬验证页时改用浏览器；
+            首次检查时与浏览器结果对比，学习该URL以后使用哪种方式
+"""
+import re
+from typing import Mapping, Optional
+
+FETCH_MODES = ('http', 'browser', 'auto')
+DEFAULT_FETCH_MODE = 'auto'
+
+# HTTP文本覆盖浏览器文本的比例达到该值时，认为HTTP请求足以代替浏览器
+MIN_TEXT_COVERAGE = 0.9
+
+# 反爬验证页（Cloudflare等）的特征
+_CHALLENGE_MARKERS = (
+    'cf-chl', 'challenge-platform', 'cf-browser-verification', '__cf_chl',
+    'just a moment...', 'attention required!', 'ddos protection by',
+    'checking your browser', 'g-recaptcha', 'h-captcha', 'hcaptcha.com', 'geetest',
+)
+# 提示需要启用JavaScript的文本
+_JS_REQUIRED_MARKERS = (
+    'enable javascript', 'javascript is required', 'javascript is disabled',
+    'requires javascript', '启用javascript', '开启javascript', '需要javascript',
+)
+# 单页应用的空挂载点
+_SPA_ROOT_RE = re.compile(
+    r'<div[^>]+id=["\'](?:root|app|__next|__nuxt|svelte)["\'][^>]*>\s*</div>', re.IGNORECASE)
+_SCRIPT_RE = re.compile(r'<script\b', re.IGNORECASE)
+
+# 可见文本少于该字符数、同时页面包含脚本时视为JS外壳页
+_MIN_TEXT_LENGTH = 200
+
+
+def detect_browser_required(status: int, headers: Mapping, html: str, text: str) -> Optional[str]:
+    """
+    判断HTTP响应是否需要浏览器渲染
+    
+    Args:
+        status: 状态码
+        headers: 响应头
+        html: 响应正文
+        text: 从正文中提取的可见文本（为None时不按文本判断，如只提取了选择器限定的区域）
+    
+    Returns:
+        需要浏览器的原因，不需要时返回None
+    """
+    lowered = (html or '')[:50000].lower()
+    
+    if headers.get('cf-mitigated', '').lower() == 'challenge':
+        return '反爬验证页'
+    if status in (403, 429, 503) and any(marker in lowered for marker in _CHALLENGE_MARKERS):
+        return '反爬验证页'
+    if status != 200 or text is None:
+        return None
+    
+    text_lower = text.lower()
+    if len(text_lower) < _MIN_TEXT_LENGTH and any(marker in text_lower for marker in _JS_REQUIRED_MARKERS):
+        return '页面要求启用JavaScript'
+    if len(text_lower) < _MIN_TEXT_LENGTH and _SCRIPT_RE.search(lowered):
+        if _SPA_ROOT_RE.search(lowered):
+            return '单页应用外壳页'
+        return '可见文本过少'
+    return None
+
+
+def text_coverage(http_text: str, browser_text: str) -> float:
+    """
+    HTTP文本覆盖浏览器文本的比例（按词计，长词权重大）
+    
+    两种方式的分行规则略有不同，按空白分词后比较，不受换行位置影响
+    """
+    browser_words = browser_text.split()
+    total = sum(len(word) for word in browser_words)
+    if not total:
+        return 1.0
+    
+    http_words = set(http_text.split())
+    covered = sum(len(word) for word in browser_words if word in http_words)
+    return covered / total
@@ -5,19 +5,70 @@
 import psutil
 import logging
 import os
+import threading
 import time
+from collections import deque
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Optional
 
 logger = logging.getLogger(__name__)
 
 
+# 历史统计的时间窗口（秒）
+HISTORY_WINDOWS = {'1m': 60, '5m': 300, '15m': 900}
+
+
 class HealthMonitor:
-    """系统健康监控器"""
+    """
+    系统健康监控器
+    
+    后台线程按固定间隔采样并保存最近一段时间的历史（环形缓冲区），
+    get_health_status() 直接返回最新快照，不会阻塞调用方；
+    采样线程在第一次查询时自动启动（gunicorn 不执行 app.py 的 __main__ 部分）
+    """
     
-    def __init__(self):
+    def __init__(self, sample_interval: float = 10, history_seconds: int = 900):
         self.process = psutil.Process(os.getpid())
         self.start_time = time.time()
+        self.sample_interval = sample_interval
+        
+        # 历史采样: (时间戳, 进程内存MB, 进程CPU%, 系统CPU%)
+        self._history = deque(maxlen=max(1, int(history_seconds / sample_interval)))
+        self._latest: Optional[Dict] = None
+        self._latest_time = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        # 初始化CPU计数基准，之后的 cpu_percent(None) 返回两次调用之间的使用率
+        self.process.cpu_percent(None)
+        psutil.cpu_percent(None)
+    
+    def start(self):
+        """启动后台采样线程（已启动则直接返回）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='health-sampler', daemon=True)
+            self._thread.start()
+        logger.info(f"健康监控采样已启动（间隔 {self.sample_interval} 秒）")
+    
+    def stop(self):
+        """停止后台采样线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"健康监控采样失败: {e}")
+            self._stop.wait(self.sample_interval)
     
     def get_memory_usage(self) -> Dict:
         """获取内存使用情况"""
@@ -38,13 +89,14 @@ class HealthMonitor:
     def get_cpu_usage(self) -> Dict:
         """获取CPU使用情况"""
         try:
-            cpu_percent = self.process.cpu_percent(interval=1)
+            # 不阻塞：返回距上次调用以来的使用率
+            cpu_percent = self.process.cpu_percent(None)
             cpu_count = psutil.cpu_count()
             
             return {
                 'percent': cpu_percent,
                 'count': cpu_count,
-                'system_percent': psutil.cpu_percent(interval=1)
+                'system_percent': psutil.cpu_percent(None)
             }
         except Exception as e:
             logger.error(f"获取CPU信息失败: {e}")
@@ -89,13 +141,16 @@ class HealthMonitor:
     def get_open_files_count(self) -> int:
         """获取打开的文件数"""
         try:
+            # num_fds 只读取计数，比逐个列出文件的 open_files() 快得多（仅POSIX）
+            if hasattr(self.process, 'num_fds'):
+                return self.process.num_fds()
             return len(self.process.open_files())
         except Exception as e:
             # 某些系统可能没有权限获取此信息
             return 0
     
-    def get_health_status(self) -> Dict:
-        """获取完整的健康状态"""
+    def sample(self) -> Dict:
+        """采集一次健康状态，更新最新快照和历史"""
         memory = self.get_memory_usage()
         cpu = self.get_cpu_usage()
         disk = self.get_disk_usage()
@@ -119,7 +174,7 @@ class HealthMonitor:
             is_healthy = False
             warnings.append(f"磁盘使用率过高: {disk['percent']:.1f}%")
         
-        return {
+        status = {
             'healthy': is_healthy,
             'warnings': warnings,
             'memory': memory,
@@ -130,6 +185,59 @@ class HealthMonitor:
             'open_files': self.get_open_files_count(),
             'timestamp': datetime.now().isoformat()
         }
+        
+        now = time.time()
+        with self._lock:
+            self._latest = status
+            self._latest_time = now
+            self._history.append((
+                now,
+                memory.get('rss_mb', 0),
+                cpu.get('percent', 0),
+                cpu.get('system_percent', 0)
+            ))
+        return status
+    
+    def get_history(self) -> Dict:
+        """最近1/5/15分钟的内存与CPU统计（最小/平均/最大）"""
+        with self._lock:
+            samples = list(self._history)
+        
+        now = time.time()
+        history = {}
+        for name, seconds in HISTORY_WINDOWS.items():
+            window = [s for s in samples if now - s[0] <= seconds]
+            if not window:
+                continue
+            
+            stats = {'samples': len(window)}
+            for index, key in ((1, 'memory_mb'), (2, 'cpu_percent'), (3, 'system_cpu_percent')):
+                values = [s[index] for s in window]
+                stats[key] = {
+                    'min': min(values),
+                    'avg': sum(values) / len(values),
+                    'max': max(values)
+                }
+            history[name] = stats
+        return history
+    
+    def get_health_status(self) -> Dict:
+        """获取完整的健康状态（最新采样快照，附带历史统计）"""
+        if not self._stop.is_set():
+            self.start()
+        
+        with self._lock:
+            latest = self._latest
+            latest_time = self._latest_time
+        
+        if latest is None or time.time() - latest_time > self.sample_interval * 2:
+            # 采样线程刚启动还没有结果，或已停止：立即采集一次（不阻塞）
+            latest = self.sample()
+        
+        status = dict(latest)
+        status['uptime'] = self.get_uptime()
+        status['history'] = self.get_history()
+        return status
     
     def log_health_status(self):
         """记录健康状态到日志"""
@@ -150,7 +258,9 @@ class HealthMonitor:
     
     def should_restart(self) -> bool:
         """判断是否需要重启（内存泄漏检测）"""
-        memory = self.get_memory_usage()
+        with self._lock:
+            latest = self._latest
+        memory = latest['memory'] if latest else self.get_memory_usage()
         
         # 如果内存使用超过500MB，建议重启
         if memory.get('rss_mb', 0) > 500:
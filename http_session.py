@@ -0,0 +1,199 @@
+"""
+HTTP会话池模块
+按代理配置复用 aiohttp.ClientSession，保持长连接并缓存DNS，
+避免每次请求都重新建立TCP/TLS连接（经SOCKS代理时尤为明显）；
+同时提供两种监控器共用的页面请求函数（请求头、正文大小上限、编码识别）
+"""
+import asyncio
+import codecs
+import logging
+import re
+from typing import Dict, Mapping, NamedTuple, Optional
+
+import aiohttp
+
+# 尝试导入SOCKS5支持
+try:
+    from aiohttp_socks import ProxyConnector
+    SOCKS_AVAILABLE = True
+except ImportError:
+    SOCKS_AVAILABLE = False
+    logging.warning("aiohttp-socks未安装，SOCKS5代理功能不可用")
+
+logger = logging.getLogger(__name__)
+
+# 默认请求头
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+# 读取正文时每块的字节数
+CHUNK_SIZE = 64 * 1024
+# 默认最多读取的正文字节数（超过后截断，只处理已读取的部分）
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+
+# 响应头未声明编码时，从正文开头的 <meta charset> 中识别
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+SNIFF_BYTES = 2048
+
+
+def is_socks_proxy(proxy_url: Optional[str]) -> bool:
+    """是否为SOCKS代理（需要专用连接器）"""
+    return bool(proxy_url) and proxy_url.startswith(('socks5://', 'socks4://'))
+
+
+class SessionPool:
+    """
+    aiohttp会话池
+    
+    - 每种代理配置（直连 / 各SOCKS代理）一个长期会话
+    - HTTP/HTTPS代理走直连会话，请求时通过 proxy 参数指定
+    - 会话与事件循环绑定，事件循环变化时关闭旧会话并重新创建
+    """
+    
+    def __init__(self, limit: int = 100, limit_per_host: int = 10, dns_ttl: int = 300,
+                 keepalive_timeout: float = 60, timeout: float = 30):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._loop = None
+    
+    def _make_connector(self, proxy_url: Optional[str]) -> aiohttp.TCPConnector:
+        options = {
+            'limit': self.limit,
+            'limit_per_host': self.limit_per_host,
+            'ttl_dns_cache': self.dns_ttl,
+            'keepalive_timeout': self.keepalive_timeout,
+        }
+        
+        if is_socks_proxy(proxy_url):
+            if not SOCKS_AVAILABLE:
+                raise RuntimeError("SOCKS5代理需要安装 aiohttp-socks: pip install aiohttp-socks")
+            logger.info(f"使用SOCKS代理: {proxy_url.split('@')[-1]}")
+            return ProxyConnector.from_url(proxy_url, **options)
+        
+        return aiohttp.TCPConnector(**options)
+    
+    async def _discard_sessions(self):
+        """
+        关闭绑定在旧事件循环上的会话
+        
+        旧事件循环未关闭（如在其他线程中运行）时提交到该循环中关闭；
+        已关闭时连接器不会再向旧循环提交任务，直接在当前循环中等待关闭完成
+        """
+        old_loop, sessions = self._loop, self._sessions
+        self._sessions = {}
+        for session in sessions.values():
+            if session.closed:
+                continue
+            if old_loop is not None and not old_loop.is_closed():
+                asyncio.run_coroutine_threadsafe(session.close(), old_loop)
+            else:
+                await session.close()
+    
+    async def get(self, proxy_url: Optional[str] = None) -> aiohttp.ClientSession:
+        """
+        获取会话
+        
+        Args:
+            proxy_url: SOCKS代理地址；HTTP代理或直连时传None
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            await self._discard_sessions()
+            self._loop = loop
+        
+        key = proxy_url if is_socks_proxy(proxy_url) else ''
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=self._make_connector(key or None),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._sessions[key] = session
+        return session
+    
+    async def close(self):
+        """关闭所有会话"""
+        if self._loop is not asyncio.get_running_loop():
+            await self._discard_sessions()
+            self._loop = None
+            return
+        
+        sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            if not session.closed:
+                await session.close()
+        
+        if sessions:
+            logger.info(f"已关闭 {len(sessions)} 个HTTP会话")
+
+
+# 全局会话池实例
+session_pool = SessionPool()
+
+
+def _lookup_charset(charset: Optional[str]) -> Optional[str]:
+    """规范化编码名称，不支持的编码返回None"""
+    if not charset:
+        return None
+    try:
+        return codecs.lookup(charset).name
+    except LookupError:
+        return None
+
+
+def resolve_charset(declared: Optional[str], head: bytes) -> str:
+    """
+    确定正文编码：响应头声明的编码，其次是正文开头 <meta charset> /
+    <meta http-equiv="Content-Type"> 中的编码，都没有时使用UTF-8
+    
+    Args:
+        declared: 响应头声明的编码（response.charset）
+        head: 正文开头的字节（至少 SNIFF_BYTES 字节，正文更短时为全部正文）
+    """
+    encoding = _lookup_charset(declared)
+    if encoding:
+        return encoding
+    match = _META_CHARSET_RE.search(head[:SNIFF_BYTES])
+    return (match and _lookup_charset(match.group(1).decode('ascii'))) or 'utf-8'
+
+
+class HttpPage(NamedTuple):
+    """HTTP请求结果"""
+    status: int
+    headers: Mapping
+    content: str             # 304时为空
+    truncated: bool = False  # 正文超过字节上限，只保留了前面的部分
+
+
+async def fetch_http(session: aiohttp.ClientSession, url: str, headers: dict = None, timeout: float = 30,
+                     max_bytes: int = DEFAULT_MAX_BYTES) -> HttpPage:
+    """
+    用HTTP GET获取页面（浏览器版监控的HTTP快速路径使用）
+    
+    Args:
+        session: aiohttp会话
+        url: 网址
+        headers: 附加请求头（如条件请求头）
+        timeout: 超时时间（秒）
+        max_bytes: 最多读取的正文字节数，超过后不再读取
+    """
+    async with session.get(url, headers={**DEFAULT_HEADERS, **(headers or {})}, timeout=timeout) as response:
+        if response.status == 304:
+            return HttpPage(response.status, response.headers, '')
+        
+        body = bytearray()
+        truncated = False
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            body += chunk
+            if len(body) >= max_bytes:
+                truncated = len(body) > max_bytes or not response.content.at_eof()
+                del body[max_bytes:]
+                break
+        
+        content = bytes(body).decode(resolve_charset(response.charset, bytes(body[:SNIFF_BYTES])), errors='replace')
+        return HttpPage(response.status, response.headers, content, truncated)
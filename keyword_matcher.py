@@ -0,0 +1,259 @@
+"""
+关键词匹配模块
+基于 Aho–Corasick 自动机，一次扫描即可找出所有模糊匹配和整词匹配的关键词
+"""
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+# 精确匹配的语义：
+# - word: 忽略大小写，按整词边界匹配（浏览器版监控）
+# - case: 区分大小写的子串匹配（简化版监控）
+EXACT_MODES = ('word', 'case')
+
+
+def keyword_signature(keywords: Iterable[Dict]) -> tuple:
+    """关键词集合的签名，关键词增删改后签名随之变化"""
+    return tuple((kw['id'], kw['keyword'], bool(kw['fuzzy_match'])) for kw in keywords)
+
+
+def _is_word_char(ch: str) -> bool:
+    """与正则 \\w 保持一致：Unicode 字母、数字及下划线（空字符串视为非单词字符）"""
+    return ch.isalnum() or ch == '_'
+
+
+def _lower_aligned(text: str) -> str:
+    """
+    转为小写并保持长度不变，使小写文本与原文逐字符对应（区分大小写的精确匹配按位置核对原文）
+    
+    个别字符（如 'İ'）转小写后变成多个字符，这些字符保持原样
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(ch if len(ch.lower()) != 1 else ch.lower() for ch in text)
+
+
+class KeywordMatcher:
+    """
+    多关键词匹配器
+    
+    - 模糊匹配：忽略大小写，内容中包含关键词即可
+    - 精确匹配（exact_mode='word'）：与 WebMonitor.check_keyword 一致，
+      等价于忽略大小写的 re.search(r'\\b' + 关键词 + r'\\b')，按整词边界匹配
+    - 精确匹配（exact_mode='case'）：与简化版监控原有语义一致，等价于 关键词 in 内容（区分大小写）
+    
+    构建一次后可重复使用，直到该URL的关键词发生变化
+    """
+    
+    def __init__(self, keywords: Iterable[Dict], exact_mode: str = 'word'):
+        """
+        Args:
+            keywords: 关键词记录列表，包含 keyword、fuzzy_match 字段（通常来自 keywords 表）
+            exact_mode: 精确匹配的语义，见 EXACT_MODES
+        """
+        if exact_mode not in EXACT_MODES:
+            raise ValueError(f"不支持的精确匹配方式: {exact_mode}")
+        self.exact_mode = exact_mode
+        self._lower = _lower_aligned if exact_mode == 'case' else str.lower
+        self.keywords: List[Dict] = [kw for kw in keywords if kw.get('keyword')]
+        
+        # 相同的小写关键词共用一个模式
+        # 模式信息: [长度, 模糊匹配的记录下标, 精确匹配的记录下标, 首字符是否单词字符, 末字符是否单词字符]
+        self._patterns: List[list] = []
+        pattern_ids: Dict[str, int] = {}
+        
+        for index, kw in enumerate(self.keywords):
+            text = self._lower(kw['keyword'])
+            pid = pattern_ids.get(text)
+            if pid is None:
+                pid = len(self._patterns)
+                pattern_ids[text] = pid
+                self._patterns.append([len(text), [], [], _is_word_char(text[0]), _is_word_char(text[-1])])
+            if kw.get('fuzzy_match', True):
+                self._patterns[pid][1].append(index)
+            else:
+                self._patterns[pid][2].append(index)
+        
+        self._build(list(pattern_ids))
+    
+    def _build(self, patterns: List[str]):
+        """构建 goto / fail / output 表"""
+        goto: List[Dict[str, int]] = [{}]
+        output: List[List[int]] = [[]]
+        
+        for pid, text in enumerate(patterns):
+            state = 0
+            for ch in text:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    output.append([])
+                state = nxt
+            output[state].append(pid)
+        
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                output[nxt] = output[nxt] + output[fail[nxt]]
+        
+        self._goto = goto
+        self._fail = fail
+        self._output = [tuple(out) for out in output]
+        
+        # 根状态下用正则快速跳到可能的关键词首字符，跳过大段无关内容
+        first_chars = sorted(goto[0])
+        self._skip_re = re.compile('[' + ''.join(re.escape(ch) for ch in first_chars) + ']') if first_chars else None
+    
+    def find(self, content: str) -> List[Dict]:
+        """
+        扫描内容，返回命中的关键词记录（保持原有顺序）
+        
+        Args:
+            content: 网页内容
+        
+        Returns:
+            命中的关键词记录列表
+        """
+        if not content or not self._patterns:
+            return []
+        
+        stream = self.stream()
+        stream.feed(content)
+        return stream.finish()
+    
+    def stream(self) -> 'KeywordStream':
+        """创建增量匹配器（内容分块输入）"""
+        return KeywordStream(self)
+
+
+class KeywordStream:
+    """
+    增量关键词匹配
+    
+    内容可以分成任意多块依次输入，自动机状态跨块延续；
+    整词边界需要的前一个字符保存在上一块的末尾，后一个字符在块尾时留到下一块（或结束时）判断；
+    区分大小写的精确匹配用上一块末尾的原文核对跨块的命中。
+    所有关键词都已命中时 done 为True，调用方可以停止读取
+    """
+    
+    def __init__(self, matcher: KeywordMatcher):
+        self._matcher = matcher
+        self._case_sensitive = matcher.exact_mode == 'case'
+        self._state = 0
+        self._tail = ''          # 上一块末尾的若干字符（小写，整词边界判断用）
+        self._original_tail = '' # 同一段原文（区分大小写时使用）
+        # 区分大小写时，每个模式尚未命中的精确匹配记录（大小写不同的关键词共用一个模式）
+        self._open_rows: Dict[int, Set[int]] = {
+            pid: set(pattern[2]) for pid, pattern in enumerate(matcher._patterns) if pattern[2]
+        } if self._case_sensitive else {}
+        self._keep = max((pattern[0] for pattern in matcher._patterns), default=0) + 1
+        self._pending: List[int] = []  # 末字符在块尾、等待下一个字符判断整词边界的模式
+        self._matched: Set[int] = set()
+        self._resolved: Set[int] = set()
+        self.remaining = len(matcher._patterns)
+    
+    @property
+    def done(self) -> bool:
+        """所有关键词都已命中"""
+        return self.remaining == 0
+    
+    def _resolve_pending(self, after: str):
+        patterns = self._matcher._patterns
+        for pid in self._pending:
+            if pid in self._resolved:
+                continue
+            exact_rows, last_word = patterns[pid][2], patterns[pid][4]
+            if _is_word_char(after) != last_word:
+                self._matched.update(exact_rows)
+                self._resolved.add(pid)
+                self.remaining -= 1
+        self._pending = []
+    
+    def feed(self, chunk: str):
+        """输入下一块内容"""
+        if not chunk or self.done:
+            return
+        
+        text = self._tail + self._matcher._lower(chunk)
+        begin = len(self._tail)
+        original = self._original_tail + chunk if self._case_sensitive else None
+        if self._pending:
+            self._resolve_pending(text[begin])
+        
+        goto, fail, output = self._matcher._goto, self._matcher._fail, self._matcher._output
+        patterns = self._matcher._patterns
+        keywords = self._matcher.keywords
+        skip = self._matcher._skip_re.search
+        matched, resolved = self._matched, self._resolved
+        
+        n = len(text)
+        state = self._state
+        i = begin
+        while i < n and self.remaining:
+            if state == 0:
+                m = skip(text, i)
+                if m is None:
+                    break
+                i = m.start()
+            
+            ch = text[i]
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            
+            for pid in output[state]:
+                if pid in resolved:
+                    continue
+                
+                length, fuzzy_rows, exact_rows, first_word, last_word = patterns[pid]
+                if fuzzy_rows:
+                    matched.update(fuzzy_rows)
+                
+                if exact_rows and self._case_sensitive:
+                    # 按原文核对大小写，所有精确匹配记录都命中后该模式才算完成
+                    segment = original[i - length + 1:i + 1]
+                    open_rows = self._open_rows[pid]
+                    for row in [row for row in open_rows if keywords[row]['keyword'] == segment]:
+                        open_rows.discard(row)
+                        matched.add(row)
+                    if open_rows:
+                        continue
+                elif exact_rows:
+                    # 整词边界：关键词首尾字符与相邻字符的“单词字符”属性必须不同
+                    start = i - length + 1
+                    before = text[start - 1] if start > 0 else ''
+                    if _is_word_char(before) == first_word:
+                        continue
+                    if i + 1 == n:
+                        # 后一个字符在下一块中
+                        self._pending.append(pid)
+                        continue
+                    if _is_word_char(text[i + 1]) == last_word:
+                        continue
+                    matched.update(exact_rows)
+                
+                resolved.add(pid)
+                self.remaining -= 1
+            
+            i += 1
+        
+        self._state = state
+        self._tail = text[-self._keep:]
+        if self._case_sensitive:
+            self._original_tail = original[-self._keep:]
+    
+    def finish(self) -> List[Dict]:
+        """内容结束，返回命中的关键词记录（保持原有顺序）"""
+        if self._pending:
+            self._resolve_pending('')
+        return [kw for index, kw in enumerate(self._matcher.keywords) if index in self._matched]
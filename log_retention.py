@@ -0,0 +1,89 @@
+"""
+日志保留策略模块
+按总数、每个URL的条数、保留天数清理 monitor_logs，
+每次只按主键范围删除一小批，由调度器定期执行，不再在每次监控后整表扫描
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LogRetention:
+    """
+    监控日志保留策略
+    
+    各项策略可以同时配置（None表示不限制），日志满足任一删除条件即被删除：
+    - keep_total:   全部URL合计只保留最新的N条
+    - keep_per_url: 每个URL只保留最新的N条
+    - keep_days:    只保留最近D天的日志
+    """
+    
+    def __init__(self, db, keep_total: Optional[int] = None, keep_per_url: Optional[int] = None,
+                 keep_days: Optional[float] = None, chunk_size: int = 500, max_chunks: int = 20):
+        """
+        Args:
+            db: 数据库实例
+            chunk_size: 每个删除事务最多删除的条数
+            max_chunks: 每次 run_step() 最多执行的删除事务数
+        """
+        self.db = db
+        self.keep_total = keep_total
+        self.keep_per_url = keep_per_url
+        self.keep_days = keep_days
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+    
+    def _delete_before(self, before_id: int, url_id: int = None, budget: int = 0) -> Tuple[int, int]:
+        """分批删除ID小于 before_id 的日志，返回 (删除条数, 剩余事务数)"""
+        deleted = 0
+        while budget > 0:
+            count = self.db.delete_logs_before(before_id, url_id, self.chunk_size)
+            budget -= 1
+            deleted += count
+            if count < self.chunk_size:
+                break
+        return deleted, budget
+    
+    def run_step(self) -> int:
+        """
+        执行一轮清理（最多 max_chunks 个小事务），未清理完的部分留到下一轮
+        
+        Returns:
+            本轮删除的日志数
+        """
+        budget = self.max_chunks
+        deleted = 0
+        
+        try:
+            # 按天数：日志ID随时间递增，早于截止时间的日志对应一段连续的ID范围
+            if self.keep_days is not None and budget > 0:
+                cutoff = datetime.now(timezone.utc) - timedelta(days=self.keep_days)
+                threshold = self.db.get_first_log_id_since(cutoff.strftime('%Y-%m-%d %H:%M:%S'))
+                if threshold is not None:
+                    count, budget = self._delete_before(threshold, budget=budget)
+                    deleted += count
+            
+            # 按总数
+            if self.keep_total is not None and budget > 0:
+                threshold = self.db.get_log_keep_threshold(self.keep_total)
+                if threshold is not None:
+                    count, budget = self._delete_before(threshold, budget=budget)
+                    deleted += count
+            
+            # 按URL
+            if self.keep_per_url is not None and budget > 0:
+                for url_id in self.db.get_log_url_ids():
+                    if budget <= 0:
+                        break
+                    threshold = self.db.get_log_keep_threshold(self.keep_per_url, url_id)
+                    if threshold is not None:
+                        count, budget = self._delete_before(threshold, url_id, budget)
+                        deleted += count
+        except Exception as e:
+            logger.error(f"清理日志失败: {e}")
+        
+        if deleted:
+            logger.info(f"日志保留策略：删除了 {deleted} 条旧日志")
+        return deleted
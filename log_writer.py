@@ -0,0 +1,180 @@
+"""
+批量日志写入模块
+监控协程只把日志放入内存队列，由后台线程按批次（或时间窗口）合并成一个事务写入数据库，
+事件循环不会因为逐条提交日志而阻塞在磁盘IO上
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 队列中的停止标记
+_STOP = object()
+
+
+class LogWriter:
+    """
+    监控日志批量写入器
+    
+    - add()/aadd() 只入队，不访问数据库
+    - 后台线程每攒够 batch_size 条或每隔 flush_interval 秒写入一次（executemany，单个事务）
+    - 队列达到 max_queue 时形成背压：add() 阻塞等待，aadd() 在线程中等待而不阻塞事件循环
+    - close() 会先写完队列中剩余的日志
+    """
+    
+    def __init__(self, db, batch_size: int = 200, flush_interval: float = 1.0,
+                 max_queue: int = 10000):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+        
+        # 统计
+        self.written = 0
+        self.failed = 0
+    
+    def start(self):
+        """启动写入线程（已启动则直接返回）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._closed = False
+            self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+            self._thread.start()
+    
+    @staticmethod
+    def _make_record(url_id: int, keyword: str = None, found: bool = False,
+                     message: str = None) -> Tuple:
+        # 入队时记录时间（与 CURRENT_TIMESTAMP 相同的UTC格式），批量写入不会改变日志时间
+        created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        return (url_id, keyword, 1 if found else 0, message, created_at)
+    
+    def add(self, url_id: int, keyword: str = None, found: bool = False, message: str = None):
+        """添加日志（队列已满时阻塞等待，仅供非事件循环线程调用）"""
+        record = self._make_record(url_id, keyword, found, message)
+        if self._closed:
+            # 已关闭时直接写入，避免丢失
+            self._write([record])
+            return
+        
+        self.start()
+        self._queue.put(record)
+    
+    async def aadd(self, url_id: int, keyword: str = None, found: bool = False,
+                   message: str = None):
+        """添加日志（协程版本，队列已满时在线程中等待，不阻塞事件循环）"""
+        record = self._make_record(url_id, keyword, found, message)
+        if self._closed:
+            await asyncio.to_thread(self._write, [record])
+            return
+        
+        self.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            await asyncio.to_thread(self._queue.put, record)
+    
+    def pending(self) -> int:
+        """队列中等待写入的日志数"""
+        return self._queue.qsize()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待队列中已有的日志全部写入
+        
+        Returns:
+            是否在超时前写完
+        """
+        if self._thread is None or not self._thread.is_alive():
+            # 写入线程未运行，在当前线程中写完
+            self._drain()
+            return True
+        
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+    
+    def close(self, timeout: float = 10):
+        """停止写入线程，并写完剩余日志"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        
+        # 线程退出后仍可能有少量日志入队
+        self._drain()
+        logger.info(f"日志写入器已关闭，共写入 {self.written} 条日志")
+    
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is not _STOP:
+                batch.append(item)
+        if batch:
+            self._write(batch)
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            
+            batch: List[Tuple] = []
+            waiters: List[threading.Event] = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            
+            # 攒一批：直到 batch_size 条、时间窗口结束，或有 flush()/close() 请求
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                
+                if stop or waiters or len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+            
+            if stop:
+                break
+    
+    def _write(self, batch: List[Tuple]):
+        try:
+            with metrics.observe_seconds(metrics.DB_WRITE_SECONDS, 'logs'):
+                self.db.add_logs(batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"批量写入日志失败（{len(batch)}条）: {e}")
@@ -0,0 +1,129 @@
+"""
+监控指标模块
+通过 /metrics 接口以Prometheus格式输出页面访问耗时、内容大小、关键词匹配耗时、
+数据库写入耗时、Telegram发送耗时、监控周期耗时、被跳过的调度次数、浏览器重启次数和队列长度等指标
+
+prometheus-client 未安装时所有指标都是空操作，不影响监控功能
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional, Tuple
+from urllib.parse import urlparse
+
+# 尝试导入Prometheus客户端
+try:
+    from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = 'text/plain; charset=utf-8'
+    logging.warning("prometheus-client未安装，/metrics 指标不可用")
+
+logger = logging.getLogger(__name__)
+
+
+class _NoopMetric:
+    """prometheus-client 未安装时使用的空指标"""
+    
+    def labels(self, *args, **kwargs):
+        return self
+    
+    def observe(self, value):
+        pass
+    
+    def inc(self, amount=1):
+        pass
+    
+    def set(self, value):
+        pass
+    
+    def set_function(self, func):
+        pass
+
+
+def _histogram(name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+               buckets: Optional[Tuple[float, ...]] = None):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    if buckets:
+        return Histogram(name, documentation, labelnames, buckets=buckets)
+    return Histogram(name, documentation, labelnames)
+
+
+def _counter(name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Counter(name, documentation, labelnames)
+
+
+def _gauge(name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Gauge(name, documentation, labelnames)
+
+
+# 耗时分桶（秒）：页面访问通常在数秒到数十秒之间
+_SLOW_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+_FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+_LENGTH_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+
+# 按域名区分的指标（URL数量有限，但同一站点的多个页面合并到域名，控制标签数量）
+PAGE_FETCH_SECONDS = _histogram(
+    'monitor_page_fetch_seconds', '页面获取耗时（浏览器导航或HTTP请求）',
+    ('host', 'mode'), _SLOW_BUCKETS)
+PAGE_CONTENT_LENGTH = _histogram(
+    'monitor_page_content_length', '页面内容长度（字符数）', ('host',), _LENGTH_BUCKETS)
+KEYWORD_MATCH_SECONDS = _histogram(
+    'monitor_keyword_match_seconds', '关键词匹配耗时', ('host',), _FAST_BUCKETS)
+CHECKS_TOTAL = _counter(
+    'monitor_checks_total', 'URL检查次数（按结果）', ('host', 'result'))
+
+# 存储和通知
+DB_WRITE_SECONDS = _histogram(
+    'monitor_db_write_seconds', '数据库写入耗时', ('operation',), _FAST_BUCKETS)
+TELEGRAM_SEND_SECONDS = _histogram(
+    'monitor_telegram_send_seconds', 'Telegram消息发送耗时', ('result',), _SLOW_BUCKETS)
+
+# 调度
+CYCLE_DURATION_SECONDS = _histogram(
+    'monitor_cycle_duration_seconds', '一次监控任务的耗时', (), _SLOW_BUCKETS)
+SCHEDULER_SKIPPED_RUNS_TOTAL = _counter(
+    'monitor_scheduler_skipped_runs_total', '调度器跳过监控任务的次数（上一次任务仍在运行或错过执行时间）',
+    ('reason',))
+SCHEDULE_LAG_SECONDS = _histogram(
+    'monitor_schedule_lag_seconds', 'URL实际检查时间晚于到期时间的秒数', (), _SLOW_BUCKETS)
+
+# 资源
+BROWSER_RESTARTS_TOTAL = _counter(
+    'monitor_browser_restarts_total', '浏览器断开后重启的次数')
+QUEUE_DEPTH = _gauge(
+    'monitor_queue_depth', '队列长度', ('queue',))
+
+
+def host_label(url: str) -> str:
+    """URL对应的域名标签"""
+    return (urlparse(url).hostname or 'unknown').lower()
+
+
+@contextmanager
+def observe_seconds(metric, *labels):
+    """统计代码块耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        (metric.labels(*labels) if labels else metric).observe(elapsed)
+
+
+def track_queue(name: str, func: Callable[[], float]):
+    """注册队列长度（抓取指标时调用 func 获取当前值）"""
+    QUEUE_DEPTH.labels(name).set_function(func)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """生成Prometheus文本格式的指标，返回 (内容, Content-Type)"""
+    if not PROMETHEUS_AVAILABLE:
+        return b'# prometheus-client not installed\n', CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -6,137 +6,292 @@
 import asyncio
 import logging
 import re
-from typing import List, Dict, Optional
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, List, Dict, Optional, Tuple
 from datetime import datetime
-from playwright.async_api import async_playwright, Browser, Page, TimeoutError as PlaywrightTimeoutError
+from urllib.parse import urlparse
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from browser_pool import BrowserPool
+from log_writer import LogWriter
+from notification_dispatcher import NotificationDispatcher
+from keyword_matcher import KeywordMatcher, keyword_signature
+from resource_policy import ResourcePolicy
+from page_readiness import PageReadiness
+from page_fingerprint import normalize_text, fingerprint, summarize_diff, MAX_DIFF_TEXT
+from page_text import EXTRACT_TEXT_JS, extract_text, keyword_context, parse_selector
+from fetch_strategy import DEFAULT_FETCH_MODE, MIN_TEXT_COVERAGE, detect_browser_required, text_coverage
+from http_session import DEFAULT_MAX_BYTES, SessionPool, fetch_http, session_pool as shared_session_pool
+import metrics
 
 logger = logging.getLogger(__name__)
 
 
+class HostRateLimiter:
+    """
+    按域名限速
+    
+    同一域名的并发数不超过 max_per_host，且相邻两次请求的开始时间至少间隔 min_interval 秒；
+    不同域名之间互不影响
+    """
+    
+    def __init__(self, max_per_host: int = 1, min_interval: float = 2.0):
+        self.max_per_host = max_per_host
+        self.min_interval = min_interval
+        self._hosts: Dict[str, Dict] = {}
+        self._loop = None
+    
+    def _get_host_state(self, host: str) -> Dict:
+        # asyncio同步原语与事件循环绑定，循环变化时重建
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._hosts = {}
+            self._loop = loop
+        
+        state = self._hosts.get(host)
+        if state is None:
+            state = {
+                'semaphore': asyncio.Semaphore(self.max_per_host),
+                'lock': asyncio.Lock(),
+                'last_start': 0.0,
+            }
+            self._hosts[host] = state
+        return state
+    
+    @asynccontextmanager
+    async def limit(self, url: str):
+        """在域名限制内执行请求"""
+        host = (urlparse(url).hostname or url).lower()
+        state = self._get_host_state(host)
+        loop = asyncio.get_running_loop()
+        
+        async with state['semaphore']:
+            async with state['lock']:
+                wait = state['last_start'] + self.min_interval - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                state['last_start'] = loop.time()
+            yield
+
+
 class WebMonitor:
-    def __init__(self, database, telegram_notifier=None):
+    def __init__(self, database, telegram_notifier=None, browser_pool: BrowserPool = None,
+                 max_concurrency: int = None, max_per_host: int = 1, host_min_interval: float = 2.0,
+                 log_writer: LogWriter = None, notification_dispatcher: NotificationDispatcher = None,
+                 worker_pool=None, session_pool: SessionPool = None, max_bytes: int = DEFAULT_MAX_BYTES):
         self.db = database
         self.telegram_notifier = telegram_notifier
-        self.browser = None
-    
-    async def init_browser(self):
-        """初始化浏览器（反检测配置）"""
-        if self.browser:
-            return
-        
-        try:
-            playwright = await async_playwright().start()
-            
-            # 启动浏览器，配置反检测参数
-            self.browser = await playwright.chromium.launch(
-                headless=True,
-                args=[
-                    '--disable-blink-features=AutomationControlled',  # 禁用自动化控制特征
-                    '--disable-dev-shm-usage',
-                    '--no-sandbox',
-                    '--disable-setuid-sandbox',
-                    '--disable-web-security',
-                    '--disable-features=IsolateOrigins,site-per-process',
-                    '--no-proxy-server',  # 禁用代理服务器
-                ]
-            )
-            
-            logger.info("浏览器初始化成功")
-        except Exception as e:
-            logger.error(f"浏览器初始化失败: {e}")
-            raise
+        # 通知派发器（可选），配置后通知在后台合并发送，不阻塞检查
+        self.notification_dispatcher = notification_dispatcher
+        # 日志写入器（可选），未配置时直接写数据库
+        self.log_writer = log_writer
+        # 工作进程池（可选），配置后页面在工作进程中获取和匹配，本进程只负责写入结果
+        self.worker_pool = worker_pool
+        self.browser_pool = browser_pool or BrowserPool()
+        # HTTP快速路径（fetch_mode为http/auto时）共用长连接会话
+        self.session_pool = session_pool or shared_session_pool
+        # HTTP快速路径最多读取的正文字节数
+        self.max_bytes = max_bytes
+        # 默认并发数与浏览器池（或全部工作进程）的上下文数量一致
+        if worker_pool:
+            self.max_concurrency = max_concurrency or worker_pool.capacity
+        else:
+            self.max_concurrency = max_concurrency or self.browser_pool.max_contexts
+        self.host_limiter = HostRateLimiter(max_per_host, host_min_interval)
+        # 每个URL的关键词匹配器缓存: url_id -> (关键词签名, KeywordMatcher)
+        self._matchers: Dict[int, tuple] = {}
+        # 每个URL上次的归一化文本，用于生成变化摘要
+        self._page_texts: Dict[int, str] = {}
+        # 等待或正在检查的URL数量
+        self.pending_checks = 0
+        # 并发名额（同时进行的多批检查共用），在事件循环中首次使用时创建: (事件循环, [Semaphore, ...])
+        self._semaphores: Optional[Tuple[asyncio.AbstractEventLoop, List[asyncio.Semaphore]]] = None
     
-    async def create_stealth_page(self) -> Page:
-        """创建反检测页面"""
-        context = await self.browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            locale='zh-CN',
-            timezone_id='Asia/Shanghai',
-        )
+    def _semaphore_for(self, url: str) -> asyncio.Semaphore:
+        """
+        URL占用的并发名额
         
-        page = await context.new_page()
+        工作进程模式下URL按域名固定分配到工作进程，每个工作进程单独限制并发：
+        排在繁忙进程后面的任务不会占住其他空闲进程的名额
+        """
+        loop = asyncio.get_running_loop()
+        if self._semaphores is None or self._semaphores[0] is not loop:
+            if self.worker_pool:
+                num_workers = self.worker_pool.num_workers
+                semaphores = [asyncio.Semaphore(max(1, self.max_concurrency // num_workers))
+                              for _ in range(num_workers)]
+            else:
+                semaphores = [asyncio.Semaphore(self.max_concurrency)]
+            self._semaphores = (loop, semaphores)
         
-        # 注入反检测脚本
-        await page.add_init_script("""
-            // 覆盖 navigator.webdriver
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            });
-            
-            // 覆盖 navigator.plugins
-            Object.defineProperty(navigator, 'plugins', {
-                get: () => [1, 2, 3, 4, 5]
-            });
-            
-            // 覆盖 navigator.languages
-            Object.defineProperty(navigator, 'languages', {
-                get: () => ['zh-CN', 'zh', 'en-US', 'en']
-            });
-            
-            // 覆盖 chrome 对象
-            window.chrome = {
-                runtime: {}
-            };
-            
-            // 覆盖权限查询
-            const originalQuery = window.navigator.permissions.query;
-            window.navigator.permissions.query = (parameters) => (
-                parameters.name === 'notifications' ?
-                    Promise.resolve({ state: Notification.permission }) :
-                    originalQuery(parameters)
-            );
-        """)
-        
-        return page
+        semaphores = self._semaphores[1]
+        return semaphores[self.worker_pool.worker_for(url)] if self.worker_pool else semaphores[0]
     
-    async def fetch_page_content(self, url: str) -> Optional[str]:
+    async def _log(self, url_id: int, keyword: str = None, found: bool = False, message: str = None):
+        """记录监控日志（配置了日志写入器时只入队，不阻塞事件循环）"""
+        if self.log_writer:
+            await self.log_writer.aadd(url_id, keyword, found, message)
+        else:
+            self.db.add_log(url_id, keyword, found, message)
+    
+    async def init_browser(self):
+        """初始化浏览器（已启动则复用）"""
+        await self.browser_pool.start()
+    
+    async def close(self):
+        """关闭浏览器池"""
+        await self.browser_pool.close()
+    
+    async def fetch_page_content(self, url: str, resource_policy: ResourcePolicy = None,
+                                 readiness: PageReadiness = None,
+                                 keywords: List[str] = None,
+                                 content_selector: str = None) -> Optional[str]:
         """
-        获取网页内容（反爬虫绕过）
-        使用Playwright模拟真实浏览器行为
+        获取网页的可见文本（反爬虫绕过）
+        使用Playwright模拟真实浏览器行为，返回 innerText 而不是完整HTML
+        
+        Args:
+            url: 网址
+            resource_policy: 资源拦截策略，为None时使用默认策略
+            readiness: 页面就绪策略，为None时使用默认策略
+            keywords: 关键词列表（就绪策略开启提前结束时使用）
+            content_selector: 内容区域的CSS选择器，为空时提取整个页面
         """
-        page = None
+        readiness = readiness or PageReadiness()
         try:
-            if not self.browser:
-                await self.init_browser()
-            
-            page = await self.create_stealth_page()
-            
-            # 设置超时时间
-            page.set_default_timeout(30000)
-            
-            # 访问页面
-            logger.info(f"正在访问: {url}")
-            response = await page.goto(url, wait_until='networkidle')
-            
-            if not response:
-                logger.error(f"无法访问: {url}")
-                return None
-            
-            # 等待页面加载完成
-            await asyncio.sleep(2)
-            
-            # 随机滚动页面（模拟真实用户行为）
-            await page.evaluate("""
-                window.scrollTo(0, document.body.scrollHeight / 2);
-            """)
-            await asyncio.sleep(1)
-            
-            # 获取页面内容
-            content = await page.content()
-            
-            logger.info(f"成功获取页面内容: {url} (长度: {len(content)})")
-            return content
-            
+            async with self.browser_pool.page() as page:
+                # 设置超时时间
+                page.set_default_timeout(30000)
+                
+                # 拦截与关键词匹配无关的资源（图片、字体、媒体、样式表、统计脚本）
+                block_stats = await (resource_policy or ResourcePolicy()).apply(page)
+                
+                # 访问页面
+                logger.info(f"正在访问: {url}")
+                response = await page.goto(url, wait_until=readiness.goto_wait_until)
+                
+                if not response:
+                    logger.error(f"无法访问: {url}")
+                    return None
+                
+                # 按URL配置的策略等待页面就绪（而不是固定等待）
+                if await readiness.wait(page, keywords):
+                    logger.info(f"页面中已出现关键词，提前结束等待: {url}")
+                
+                # 滚动页面（模拟真实用户行为）
+                await page.evaluate("""
+                    window.scrollTo(0, document.body.scrollHeight / 2);
+                """)
+                
+                # 提取可见文本（可限定区域），不序列化整个DOM
+                extracted = await page.evaluate(EXTRACT_TEXT_JS, content_selector)
+                content = extracted['text']
+                if content_selector and extracted['matched'] <= 0:
+                    reason = '无效' if extracted['matched'] < 0 else '未匹配到任何元素'
+                    logger.warning(f"内容选择器{reason}: {content_selector} ({url})")
+                
+                blocked = f", 拦截请求: {block_stats['blocked']}" if block_stats else ''
+                logger.info(f"成功获取页面文本: {url} (长度: {len(content)}{blocked})")
+                return content
+        
         except PlaywrightTimeoutError:
             logger.error(f"访问超时: {url}")
             return None
         except Exception as e:
             logger.error(f"获取页面内容失败: {url}, 错误: {e}")
             return None
-        finally:
-            if page:
-                await page.close()
+    
+    async def fetch_http_content(self, url: str, content_selector: str = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        用HTTP请求获取网页的可见文本（不启动浏览器）
+        
+        Returns:
+            (可见文本, 需要浏览器的原因)；响应像JS外壳页或反爬验证页时文本为None并给出原因，
+            请求失败时两者都为None
+        """
+        try:
+            session = await self.session_pool.get()
+            page = await fetch_http(session, url, max_bytes=self.max_bytes)
+        except Exception as e:
+            logger.warning(f"HTTP请求失败: {url}, 错误: {e or type(e).__name__}")
+            return None, None
+        
+        if page.truncated:
+            logger.warning(f"正文超过 {self.max_bytes} 字节，只提取了前面的部分: {url}")
+        text = extract_text(page.content, content_selector) if page.status == 200 else ''
+        # 只提取了选择器区域时文本本来就少，不按文本长度判断（首次检查时与浏览器结果对比）
+        reason = detect_browser_required(page.status, page.headers, page.content,
+                                         None if content_selector else text)
+        if reason:
+            return None, reason
+        if page.status != 200:
+            logger.warning(f"HTTP请求失败: {url}, 状态码: {page.status}")
+            return None, None
+        
+        logger.info(f"成功获取页面文本(HTTP): {url} (长度: {len(text)})")
+        return text, None
+    
+    async def _fetch_browser(self, url_data: Dict, keywords: List[Dict]) -> Optional[str]:
+        return await self.fetch_page_content(
+            url_data['url'],
+            ResourcePolicy.from_url_data(url_data),
+            PageReadiness.from_url_data(url_data),
+            [kw['keyword'] for kw in keywords],
+            url_data.get('content_selector')
+        )
+    
+    async def fetch_content(self, url_data: Dict, keywords: List[Dict]) -> Tuple[Optional[str], str, Optional[str]]:
+        """
+        按URL的获取方式（fetch_mode）获取网页的可见文本
+        
+        auto模式先用HTTP请求，响应像JS外壳页或反爬验证页时改用浏览器；
+        首次检查时再用浏览器获取一次，HTTP文本与之一致时以后只用HTTP。
+        HTTP提取只支持简单的内容选择器，其他选择器（后代、属性、伪类等）只能使用浏览器
+        
+        Returns:
+            (可见文本, 实际使用的方式, 本次学习到的方式)
+        """
+        url = url_data['url']
+        mode = url_data.get('fetch_mode') or DEFAULT_FETCH_MODE
+        learned = url_data.get('learned_fetch_mode')
+        selector = url_data.get('content_selector')
+        http_supported = not selector or parse_selector(selector) is not None
+        
+        if mode == 'browser' or (mode == 'auto' and (learned == 'browser' or not http_supported)):
+            return await self._fetch_browser(url_data, keywords), 'browser', None
+        if not http_supported:
+            # 不能退回到匹配整个页面，否则选择器区域外的关键词也会触发通知
+            logger.error(f"HTTP模式不支持该内容选择器，请改用浏览器或简单选择器: {selector} ({url})")
+            return None, 'http', None
+        
+        text, reason = await self.fetch_http_content(url, selector)
+        if mode == 'http':
+            if reason:
+                logger.warning(f"{reason}，该URL可能需要使用浏览器获取: {url}")
+            return text, 'http', None
+        
+        if reason:
+            logger.info(f"{reason}，改用浏览器获取: {url}")
+            return await self._fetch_browser(url_data, keywords), 'browser', 'browser'
+        if text is None:
+            # HTTP请求失败（可能是临时错误），本次改用浏览器，不改变学习结果
+            return await self._fetch_browser(url_data, keywords), 'browser', None
+        if learned == 'http':
+            return text, 'http', None
+        
+        # 首次检查：与浏览器结果对比，决定以后是否可以跳过浏览器
+        browser_text = await self._fetch_browser(url_data, keywords)
+        if browser_text is None:
+            return text, 'http', None
+        
+        matcher = KeywordMatcher(keywords)
+        http_found = {kw['id'] for kw in matcher.find(text)}
+        missing = [kw for kw in matcher.find(browser_text) if kw['id'] not in http_found]
+        coverage = text_coverage(text, browser_text)
+        learned = 'http' if coverage >= MIN_TEXT_COVERAGE and not missing else 'browser'
+        logger.info(f"HTTP文本覆盖率 {coverage:.0%}，以后使用{'HTTP请求' if learned == 'http' else '浏览器'}获取: {url}")
+        return browser_text, 'browser', learned
     
     def check_keyword(self, content: str, keyword: str, fuzzy_match: bool = True) -> bool:
         """
@@ -165,6 +320,17 @@ class WebMonitor:
             pattern = r'\b' + re.escape(keyword_lower) + r'\b'
             return bool(re.search(pattern, content_lower))
     
+    def get_matcher(self, url_id: int, keywords: List[Dict]) -> KeywordMatcher:
+        """获取URL的关键词匹配器，关键词未变化时复用缓存的自动机"""
+        signature = keyword_signature(keywords)
+        cached = self._matchers.get(url_id)
+        if cached and cached[0] == signature:
+            return cached[1]
+        
+        matcher = KeywordMatcher(keywords)
+        self._matchers[url_id] = (signature, matcher)
+        return matcher
+    
     async def check_url(self, url_data: Dict):
         """
         检查单个URL
@@ -172,45 +338,169 @@ class WebMonitor:
         Args:
             url_data: URL数据，包含id, url, name等字段
         """
+        # 页面获取和匹配可以交给工作进程，数据库写入和通知始终在当前进程完成
+        if self.worker_pool:
+            result = await self.worker_pool.inspect(url_data)
+        else:
+            result = await self.inspect_url(url_data)
+        await self.apply_result(url_data, result)
+    
+    async def inspect_url(self, url_data: Dict) -> Dict:
+        """
+        获取页面并匹配关键词（只读取数据库，不写入）
+        
+        Args:
+            url_data: URL数据，包含id, url, name等字段
+        
+        Returns:
+            检查结果，status 为 no_keywords / error / unchanged / checked 之一，
+            checked 时包含命中的关键词、页面指纹和变化摘要
+        """
         url_id = url_data['id']
         url = url_data['url']
         url_name = url_data.get('name', url)
         
         logger.info(f"开始检查: {url_name} ({url})")
         
-        # 获取该URL的所有关键词
-        keywords = self.db.get_keywords_by_url(url_id)
+        # 获取该URL的所有关键词（批量加载的配置中已包含）
+        keywords = url_data.get('keywords')
+        if keywords is None:
+            keywords = self.db.get_keywords_by_url(url_id)
         
         if not keywords:
-            logger.warning(f"URL {url_name} 没有配置关键词，跳过检查")
-            self.db.add_log(url_id, None, False, "没有配置关键词")
-            return
+            return {'status': 'no_keywords'}
         
-        # 获取网页内容
-        content = await self.fetch_page_content(url)
+        # 获取网页可见文本（按URL的获取方式使用HTTP请求或浏览器）
+        started = time.perf_counter()
+        content, fetch_mode, learned_fetch_mode = await self.fetch_content(url_data, keywords)
         
+        result = {
+            'status': 'unchanged',
+            'fetch_seconds': time.perf_counter() - started,
+            'fetch_mode': fetch_mode,
+            'learned_fetch_mode': learned_fetch_mode
+        }
         if not content:
+            result['status'] = 'error'
+            return result
+        result['content_length'] = len(content)
+        
+        # 页面内容和关键词都未变化时，结果必然与上次相同，跳过匹配和日志；
+        # 指纹必须覆盖匹配的文本本身（不能去除日期等易变内容，关键词本身可能就是日期或数字）
+        content_hash = fingerprint(content)
+        keywords_hash = fingerprint(repr(keyword_signature(keywords)))
+        snapshot = self.db.get_page_snapshot(url_id)
+        
+        if snapshot and snapshot['content_hash'] == content_hash and snapshot['keywords_hash'] == keywords_hash:
+            return result
+        
+        # 去除易变内容后的文本只用于生成变化摘要（只有易变内容变化时不输出摘要）
+        text = normalize_text(content)
+        previous_text = self._page_texts.get(url_id)
+        change_summary = None
+        if snapshot and snapshot['content_hash'] != content_hash and previous_text != text:
+            change_summary = summarize_diff(previous_text, text)
+        if len(text) <= MAX_DIFF_TEXT:
+            self._page_texts[url_id] = text
+        else:
+            self._page_texts.pop(url_id, None)
+        
+        # 一次扫描找出所有命中的关键词（只扫描可见文本）
+        started = time.perf_counter()
+        matched = self.get_matcher(url_id, keywords).find(content)
+        
+        result.update({
+            'status': 'checked',
+            'match_seconds': time.perf_counter() - started,
+            'matched': matched,
+            'contexts': {kw['id']: keyword_context(content, kw['keyword']) for kw in matched},
+            'content_hash': content_hash,
+            'keywords_hash': keywords_hash,
+            'text_length': len(text),
+            'change_summary': change_summary
+        })
+        return result
+    
+    async def apply_result(self, url_data: Dict, result: Dict):
+        """
+        根据检查结果认领关键词、记录日志、发送通知并保存页面指纹
+        
+        Args:
+            url_data: URL数据
+            result: inspect_url() 的返回值
+        """
+        url_id = url_data['id']
+        url = url_data['url']
+        url_name = url_data.get('name', url)
+        host = metrics.host_label(url)
+        status = result['status']
+        
+        if result.get('fetch_seconds') is not None:
+            metrics.PAGE_FETCH_SECONDS.labels(host, result.get('fetch_mode', 'browser')).observe(
+                result['fetch_seconds'])
+        if result.get('learned_fetch_mode'):
+            self.db.set_learned_fetch_mode(url_id, result['learned_fetch_mode'])
+        
+        if status == 'no_keywords':
+            logger.warning(f"URL {url_name} 没有配置关键词，跳过检查")
+            await self._log(url_id, None, False, "没有配置关键词")
+            metrics.CHECKS_TOTAL.labels(host, 'no_keywords').inc()
+            return
+        
+        if status == 'error':
             logger.error(f"无法获取页面内容: {url_name}")
-            self.db.add_log(url_id, None, False, "无法获取页面内容")
+            await self._log(url_id, None, False, "无法获取页面内容")
+            metrics.CHECKS_TOTAL.labels(host, 'error').inc()
             return
         
-        # 检查每个关键词
+        metrics.PAGE_CONTENT_LENGTH.labels(host).observe(result['content_length'])
+        
+        if status == 'unchanged':
+            logger.info(f"页面内容未变化，跳过关键词检查 (URL: {url_name})")
+            metrics.CHECKS_TOTAL.labels(host, 'unchanged').inc()
+            return
+        
+        change_summary = result['change_summary']
+        if change_summary:
+            logger.info(f"页面内容已变化: {change_summary} (URL: {url_name})")
+        metrics.KEYWORD_MATCH_SECONDS.labels(host).observe(result['match_seconds'])
+        
         found_keywords = []
+        matched = result['matched']
         
-        for kw_data in keywords:
+        for kw_data in matched:
             keyword = kw_data['keyword']
-            fuzzy_match = bool(kw_data['fuzzy_match'])
             
-            if self.check_keyword(content, keyword, fuzzy_match):
-                found_keywords.append(keyword)
-                logger.info(f"✓ 找到关键词: {keyword} (URL: {url_name})")
-                
-                # 记录日志
-                self.db.add_log(url_id, keyword, True, f"检测到关键词: {keyword}")
-                
-                # 发送Telegram通知
-                if self.telegram_notifier:
-                    message = f"""
+            # 先认领（删除）关键词再通知：并发的检查中只有认领成功的一方会发送通知
+            notification = None
+            if self.notification_dispatcher and self.notification_dispatcher.notifier:
+                notification = {
+                    'url_id': url_id,
+                    'url_name': url_name,
+                    'url': url,
+                    'keyword': keyword,
+                    'note': "⚠️ 该关键词已自动删除，不会再次通知。"
+                }
+            if not self.db.claim_keyword(kw_data['id'], notification):
+                logger.info(f"关键词已被其他检查任务处理，跳过: {keyword} (URL: {url_name})")
+                continue
+            
+            found_keywords.append(keyword)
+            logger.info(f"✓ 找到关键词: {keyword} (URL: {url_name})")
+            logger.info(f"🗑️ 自动删除关键词: {keyword}")
+            
+            # 记录日志（附带关键词所在的上下文）
+            message = f"检测到关键词: {keyword}"
+            context = result.get('contexts', {}).get(kw_data['id'])
+            if context:
+                message += f"（{context}）"
+            await self._log(url_id, keyword, True, message)
+            
+            # 发送Telegram通知（通知已随认领写入发件箱，唤醒派发器即可）
+            if notification:
+                await self.notification_dispatcher.wake()
+            elif self.telegram_notifier:
+                message = f"""
 🔔 <b>监控提醒</b>
 
 📌 <b>网址:</b> {url_name}
@@ -221,50 +511,71 @@ class WebMonitor:
 ✅ 检测到指定关键词！
 
 ⚠️ 该关键词已自动删除，不会再次通知。
-                    """.strip()
-                    
-                    await self.telegram_notifier.send_message(message)
+                """.strip()
                 
-                # 自动删除已检测到的关键词，避免重复通知
-                self.db.delete_keyword(kw_data['id'])
-                logger.info(f"🗑️ 自动删除关键词: {keyword} (已通知)")
+                await self.telegram_notifier.send_message(message)
+        
+        if matched and not found_keywords:
+            # 命中的关键词都已被并发的检查处理
+            return
         
         if not found_keywords:
             logger.info(f"✗ 未找到关键词 (URL: {url_name})")
-            self.db.add_log(url_id, None, False, "未检测到关键词")
+            message = "未检测到关键词"
+            if change_summary:
+                message += f"（页面变化: {change_summary}）"
+            await self._log(url_id, None, False, message)
+        
+        metrics.CHECKS_TOTAL.labels(host, 'found' if found_keywords else 'not_found').inc()
+        
+        # 记录本次指纹；命中的关键词已被删除，下次签名不同会重新检查
+        with metrics.observe_seconds(metrics.DB_WRITE_SECONDS, 'snapshot'):
+            self.db.save_page_snapshot(url_id, result['content_hash'], result['keywords_hash'],
+                                       result['text_length'])
     
     async def check_all_urls(self):
         """检查所有启用的URL"""
         try:
-            # 获取所有启用的URL
-            urls = self.db.get_enabled_urls()
-            
+            # 获取所有启用的URL及其关键词
+            urls = self.db.get_monitor_config()
+        except Exception as e:
+            logger.error(f"获取监控URL失败: {e}", exc_info=True)
+            return
+        
+        await self.check_urls(urls)
+    
+    async def check_urls(self, urls: List[Dict], on_check_start: Callable[[int], None] = None):
+        """
+        检查指定的URL列表（有限并发，按域名限速）
+        
+        Args:
+            urls: URL列表
+            on_check_start: 某个URL拿到并发名额、开始检查时的回调（参数为URL ID）
+        """
+        try:
             if not urls:
-                logger.info("没有启用的监控URL")
+                logger.info("没有需要检查的URL")
                 return
             
-            logger.info(f"开始检查 {len(urls)} 个URL...")
+            logger.info(f"开始检查 {len(urls)} 个URL（并发数: {self.max_concurrency}）...")
             
-            # 初始化浏览器
-            await self.init_browser()
-            
-            # 检查每个URL
-            for url_data in urls:
+            async def check_one(url_data: Dict):
+                self.pending_checks += 1
                 try:
-                    await self.check_url(url_data)
+                    # 先等待域名限速，再占用全局并发名额，避免排队的同域名请求占住名额
+                    async with self.host_limiter.limit(url_data['url']):
+                        async with self._semaphore_for(url_data['url']):
+                            if on_check_start:
+                                on_check_start(url_data['id'])
+                            await self.check_url(url_data)
                 except Exception as e:
                     logger.error(f"检查URL失败: {url_data.get('name', url_data['url'])}, 错误: {e}")
-                
-                # 添加延迟，避免请求过快
-                await asyncio.sleep(2)
+                finally:
+                    self.pending_checks -= 1
             
-            logger.info("所有URL检查完成")
+            await asyncio.gather(*(check_one(url_data) for url_data in urls))
             
+            logger.info("所有URL检查完成")
+        
         except Exception as e:
             logger.error(f"检查所有URL失败: {e}", exc_info=True)
-        finally:
-            # 关闭浏览器
-            if self.browser:
-                await self.browser.close()
-                self.browser = None
-
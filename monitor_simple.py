@@ -4,79 +4,275 @@
 """
 import logging
 import asyncio
-import aiohttp
+import codecs
+import hashlib
+import re
+import time
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, NamedTuple
+
+from keyword_matcher import KeywordMatcher, keyword_signature
+from page_text import check_selector_matched, make_extractor
+from http_session import (CHUNK_SIZE, DEFAULT_HEADERS, DEFAULT_MAX_BYTES, SNIFF_BYTES, SessionPool,
+                          resolve_charset, session_pool as shared_session_pool)
+from log_writer import LogWriter
+from notification_dispatcher import NotificationDispatcher
+import metrics
 
 logger = logging.getLogger(__name__)
 
 
+class StreamScan(NamedTuple):
+    """流式关键词扫描结果"""
+    found: List[Dict]   # 命中的关键词记录
+    bytes_read: int
+    stop_reason: str    # complete: 读完正文；all_found: 所有关键词已命中；byte_cap: 达到字节上限
+    match_seconds: float
+
+
+async def scan_stream(chunks, matcher: KeywordMatcher, charset: str = None, selector: str = None,
+                      max_bytes: int = DEFAULT_MAX_BYTES) -> StreamScan:
+    """
+    边读取边匹配关键词，不在内存中保存完整正文
+    
+    字节块依次经过增量解码、可见文本提取和增量关键词匹配，解码器、HTML解析器和匹配自动机的状态都跨块延续；
+    所有关键词都已命中或正文超过字节上限时停止读取（正文恰好等于上限时完整读取）
+    
+    Args:
+        chunks: 正文字节块的异步迭代器（如 response.content.iter_chunked()）
+        matcher: 关键词匹配器
+        charset: 响应头声明的编码，为空时从 <meta charset> 识别，仍未识别则按UTF-8解码
+        selector: 内容区域的CSS选择器
+        max_bytes: 最多读取的字节数
+    """
+    stream = matcher.stream()
+    parser = make_extractor(selector)
+    decoder = None
+    head = b''
+    bytes_read = 0
+    match_seconds = 0.0
+    stop_reason = 'complete'
+    
+    async for chunk in chunks:
+        if bytes_read + len(chunk) > max_bytes:
+            chunk = chunk[:max_bytes - bytes_read]
+            stop_reason = 'byte_cap'
+        bytes_read += len(chunk)
+        
+        started = time.perf_counter()
+        if decoder is None:
+            # 等读到足够的开头字节再确定编码（<meta charset> 通常在前1KB内）
+            head += chunk
+            if len(head) < SNIFF_BYTES and stop_reason != 'byte_cap':
+                continue
+            chunk, head = head, b''
+            decoder = codecs.getincrementaldecoder(resolve_charset(charset, chunk))(errors='replace')
+        
+        parser.feed(decoder.decode(chunk))
+        stream.feed(parser.take_text())
+        match_seconds += time.perf_counter() - started
+        
+        if stop_reason == 'byte_cap':
+            break
+        if stream.done:
+            stop_reason = 'all_found'
+            break
+    
+    started = time.perf_counter()
+    if stop_reason == 'complete':
+        if decoder is None:
+            # 正文不足 SNIFF_BYTES
+            decoder = codecs.getincrementaldecoder(resolve_charset(charset, head))(errors='replace')
+            parser.feed(decoder.decode(head))
+        parser.feed(decoder.decode(b'', final=True))
+        parser.close()
+        stream.feed(parser.take_text())
+        check_selector_matched(parser, selector)
+    found = stream.finish()
+    match_seconds += time.perf_counter() - started
+    
+    return StreamScan(found, bytes_read, stop_reason, match_seconds)
+
+
+_MAX_AGE_RE = re.compile(r'(?:^|,)\s*max-age\s*=\s*"?(\d+)"?', re.IGNORECASE)
+
+
+def parse_cache_expiry(headers) -> float:
+    """
+    根据 Cache-Control: max-age（减去 Age）计算缓存过期时间
+    
+    Returns:
+        过期时间戳，不可缓存时返回0
+    """
+    cache_control = headers.get('Cache-Control', '')
+    directives = cache_control.lower()
+    if 'no-store' in directives or 'no-cache' in directives:
+        return 0
+    
+    match = _MAX_AGE_RE.search(cache_control)
+    if not match:
+        return 0
+    
+    try:
+        age = int(headers.get('Age', 0))
+    except ValueError:
+        age = 0
+    
+    max_age = int(match.group(1)) - age
+    return time.time() + max_age if max_age > 0 else 0
+
+
 class WebMonitor:
     """简化版网页监控器（使用HTTP请求，不需要浏览器）"""
     
-    def __init__(self, database, telegram_notifier=None):
+    def __init__(self, database, telegram_notifier=None, session_pool: SessionPool = None,
+                 log_writer: LogWriter = None, notification_dispatcher: NotificationDispatcher = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
         self.db = database
         self.telegram_notifier = telegram_notifier
+        # 通知派发器（可选），配置后通知在后台合并发送，不阻塞检查
+        self.notification_dispatcher = notification_dispatcher
+        # 日志写入器（可选），未配置时直接写数据库
+        self.log_writer = log_writer
+        # 所有URL共用长连接会话（keep-alive、DNS缓存、按域名限制连接数）
+        self.session_pool = session_pool or shared_session_pool
+        # 每个页面最多读取的正文字节数
+        self.max_bytes = max_bytes
+        # 每个URL的关键词匹配器缓存: url_id -> (关键词签名, KeywordMatcher)
+        self._matchers: Dict[int, tuple] = {}
         logger.info("初始化简化版监控器（HTTP模式）")
     
+    async def close(self):
+        """
+        关闭监控器
+        
+        会话池由创建者关闭（全局会话池与TelegramNotifier等共用，在进程退出时由 app.py / worker.py 关闭）
+        """
+        self._matchers.clear()
+    
+    async def _log(self, url_id: int, keyword: str = None, found: bool = False, message: str = None):
+        """记录监控日志（配置了日志写入器时只入队，不阻塞事件循环）"""
+        if self.log_writer:
+            await self.log_writer.aadd(url_id, keyword, found, message)
+        else:
+            self.db.add_log(url_id, keyword, found, message)
+    
+    def get_matcher(self, url_id: int, keywords: List[Dict]) -> KeywordMatcher:
+        """获取URL的关键词匹配器（关键词未变化时复用）"""
+        signature = keyword_signature(keywords)
+        cached = self._matchers.get(url_id)
+        if cached and cached[0] == signature:
+            return cached[1]
+        
+        # 精确匹配沿用简化版监控原有的语义（区分大小写的子串匹配，中文关键词不受整词边界影响）
+        matcher = KeywordMatcher(keywords, exact_mode='case')
+        self._matchers[url_id] = (signature, matcher)
+        return matcher
+    
     async def check_url(self, url_data: dict):
         """检查单个URL"""
         url_id = url_data['id']
         url = url_data['url']
         name = url_data['name']
+        host = metrics.host_label(url)
         
         try:
             logger.info(f"开始检查URL: {name} ({url})")
             
-            # 获取该URL的所有关键词
-            keywords = self.db.get_keywords_by_url(url_id)
+            # 获取该URL的所有关键词（批量加载的配置中已包含）
+            keywords = url_data.get('keywords')
+            if keywords is None:
+                keywords = self.db.get_keywords_by_url(url_id)
             
             if not keywords:
                 logger.warning(f"URL {name} 没有配置关键词")
                 return
             
+            # 关键词变化后，即使页面未修改也要重新获取完整内容进行匹配
+            keywords_hash = hashlib.sha1(repr(keyword_signature(keywords)).encode('utf-8')).hexdigest()
+            cache = self.db.get_http_cache(url_id)
+            if cache and cache['keywords_hash'] != keywords_hash:
+                cache = None
+            
+            if cache and cache['expires_at'] > time.time():
+                logger.info(f"缓存未过期（Cache-Control: max-age），跳过请求: {url}")
+                metrics.CHECKS_TOTAL.labels(host, 'cached').inc()
+                return
+            
             # 使用aiohttp获取页面内容
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-                
-                try:
-                    async with session.get(url, headers=headers, timeout=30) as response:
-                        if response.status != 200:
-                            logger.error(f"访问失败: {url}, 状态码: {response.status}")
-                            self.db.add_log(url_id, None, False, f"访问失败，状态码: {response.status}")
-                            return
-                        
-                        # 获取页面内容
-                        content = await response.text()
-                        logger.info(f"成功获取页面内容，长度: {len(content)}")
-                        
-                except asyncio.TimeoutError:
-                    logger.error(f"访问超时: {url}")
-                    self.db.add_log(url_id, None, False, "访问超时")
-                    return
-                except Exception as e:
-                    logger.error(f"访问出错: {url}, 错误: {e}")
-                    self.db.add_log(url_id, None, False, f"访问出错: {str(e)}")
-                    return
-            
-            # 检查关键词
-            found_keywords = []
-            for keyword_data in keywords:
-                keyword = keyword_data['keyword']
-                fuzzy_match = keyword_data['fuzzy_match']
-                
-                if fuzzy_match:
-                    # 模糊匹配
-                    if keyword.lower() in content.lower():
-                        found_keywords.append(keyword)
-                        logger.info(f"✓ 找到关键词: {keyword}")
-                else:
-                    # 精确匹配
-                    if keyword in content:
-                        found_keywords.append(keyword)
-                        logger.info(f"✓ 找到关键词: {keyword}")
+            session = await self.session_pool.get()
+            headers = {}
+            
+            # 条件请求：页面未修改时服务器返回304，不传输正文
+            if cache:
+                if cache['etag']:
+                    headers['If-None-Match'] = cache['etag']
+                if cache['last_modified']:
+                    headers['If-Modified-Since'] = cache['last_modified']
+            
+            matcher = self.get_matcher(url_id, keywords)
+            started = time.perf_counter()
+            scan = None
+            try:
+                async with session.get(url, headers={**DEFAULT_HEADERS, **headers}, timeout=30) as response:
+                    status = response.status
+                    response_headers = response.headers
+                    if status == 200:
+                        # 边下载边匹配（只匹配可见文本或内容选择器限定的区域），
+                        # 所有关键词都已命中或达到字节上限后不再读取剩余正文
+                        scan = await scan_stream(response.content.iter_chunked(CHUNK_SIZE), matcher,
+                                                 response.charset, url_data.get('content_selector'),
+                                                 self.max_bytes)
+            except asyncio.TimeoutError:
+                logger.error(f"访问超时: {url}")
+                await self._log(url_id, None, False, "访问超时")
+                metrics.CHECKS_TOTAL.labels(host, 'error').inc()
+                return
+            except Exception as e:
+                logger.error(f"访问出错: {url}, 错误: {e}")
+                await self._log(url_id, None, False, f"访问出错: {str(e)}")
+                metrics.CHECKS_TOTAL.labels(host, 'error').inc()
+                return
+            
+            elapsed = time.perf_counter() - started
+            metrics.PAGE_FETCH_SECONDS.labels(host, 'http').observe(elapsed - (scan.match_seconds if scan else 0))
+            
+            if status == 304:
+                logger.info(f"页面未修改(304)，跳过关键词检查: {url}")
+                metrics.CHECKS_TOTAL.labels(host, 'unchanged').inc()
+                self.db.save_http_cache(
+                    url_id,
+                    response_headers.get('ETag') or cache['etag'],
+                    response_headers.get('Last-Modified') or cache['last_modified'],
+                    parse_cache_expiry(response_headers),
+                    keywords_hash
+                )
+                return
+            
+            if status != 200:
+                logger.error(f"访问失败: {url}, 状态码: {status}")
+                await self._log(url_id, None, False, f"访问失败，状态码: {status}")
+                metrics.CHECKS_TOTAL.labels(host, 'error').inc()
+                return
+            
+            metrics.PAGE_CONTENT_LENGTH.labels(host).observe(scan.bytes_read)
+            if scan.stop_reason == 'all_found':
+                logger.info(f"所有关键词都已命中，停止读取剩余正文（已读取 {scan.bytes_read} 字节）: {url}")
+            elif scan.stop_reason == 'byte_cap':
+                logger.warning(f"正文超过 {self.max_bytes} 字节，只匹配了已读取的部分: {url}")
+            else:
+                logger.info(f"成功获取页面内容，长度: {scan.bytes_read}")
+            
+            etag = response_headers.get('ETag')
+            last_modified = response_headers.get('Last-Modified')
+            expires_at = parse_cache_expiry(response_headers)
+            
+            found_keywords = [kw['keyword'] for kw in scan.found]
+            for keyword in found_keywords:
+                logger.info(f"✓ 找到关键词: {keyword}")
+            
+            metrics.KEYWORD_MATCH_SECONDS.labels(host).observe(scan.match_seconds)
+            metrics.CHECKS_TOTAL.labels(host, 'found' if found_keywords else 'not_found').inc()
             
             # 记录结果
             if found_keywords:
@@ -85,10 +281,13 @@ class WebMonitor:
                 
                 # 记录日志
                 for kw in found_keywords:
-                    self.db.add_log(url_id, kw, True, "关键词匹配成功")
+                    await self._log(url_id, kw, True, "关键词匹配成功")
                 
                 # 发送Telegram通知
-                if self.telegram_notifier:
+                if self.notification_dispatcher:
+                    for kw in found_keywords:
+                        await self.notification_dispatcher.notify(url_id, name, url, kw)
+                elif self.telegram_notifier:
                     notify_msg = (
                         f"🔔 <b>监控提醒</b>\n\n"
                         f"📋 网址：{name}\n"
@@ -99,16 +298,20 @@ class WebMonitor:
                     await self.telegram_notifier.send_message(notify_msg)
             else:
                 logger.info(f"URL {name}: 未发现关键词")
-                self.db.add_log(url_id, None, False, "未发现关键词")
-                
+                await self._log(url_id, None, False, "未发现关键词")
+            
+            # 保存验证器，供下次条件请求使用
+            with metrics.observe_seconds(metrics.DB_WRITE_SECONDS, 'http_cache'):
+                self.db.save_http_cache(url_id, etag, last_modified, expires_at, keywords_hash)
+        
         except Exception as e:
             logger.error(f"检查URL失败: {name}, 错误: {e}", exc_info=True)
-            self.db.add_log(url_id, None, False, f"检查失败: {str(e)}")
+            await self._log(url_id, None, False, f"检查失败: {str(e)}")
     
     async def check_all_urls(self):
         """检查所有启用的URL"""
         try:
-            urls = self.db.get_enabled_urls()
+            urls = self.db.get_monitor_config()
             
             if not urls:
                 logger.info("没有启用的监控URL")
@@ -121,6 +324,6 @@ class WebMonitor:
             await asyncio.gather(*tasks, return_exceptions=True)
             
             logger.info("所有URL检查完成")
-            
+        
         except Exception as e:
             logger.error(f"检查所有URL失败: {e}", exc_info=True)
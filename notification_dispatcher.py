@@ -0,0 +1,245 @@
+"""
+通知派发模块
+监控协程只把命中的关键词放入有界队列，由后台任务合并后发送Telegram通知：
+- 同一URL在合并窗口内的多个关键词合成一条消息
+- 遵守Telegram 429 响应中的 retry_after，其余失败按指数退避重试
+- 待发送的通知保存在SQLite发件箱中，重启后继续发送
+"""
+import asyncio
+import html
+import logging
+import random
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    """
+    Telegram通知派发器
+    
+    与 SessionPool、BrowserPool 一样绑定到当前事件循环，事件循环变化时重新创建队列和后台任务
+    """
+    
+    def __init__(self, db, notifier=None, max_queue: int = 1000, merge_window: float = 2.0,
+                 min_interval: float = 1.0, max_attempts: int = 8,
+                 base_backoff: float = 5.0, max_backoff: float = 900.0):
+        """
+        Args:
+            db: 数据库实例（通知发件箱）
+            notifier: TelegramNotifier，可在运行中替换
+            max_queue: 内存队列上限，队列满时 notify() 等待
+            merge_window: 合并窗口（秒），窗口内同一URL的命中合成一条消息
+            min_interval: 两条消息之间的最小间隔（秒），避免触发单个聊天的频率限制
+            max_attempts: 最大发送次数，超过后放弃
+            base_backoff: 首次重试的等待时间（秒），之后每次翻倍
+            max_backoff: 重试等待时间上限（秒）
+        """
+        self.db = db
+        self.notifier = notifier
+        self.max_queue = max_queue
+        self.merge_window = merge_window
+        self.min_interval = min_interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        
+        self._loop = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._paused_until = 0.0   # 被限流后暂停发送到此时间
+        self._last_sent = 0.0
+        
+        # 统计
+        self.sent = 0
+        self.dropped = 0
+    
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = None
+    
+    async def start(self):
+        """启动后台发送任务（会先发送发件箱中遗留的通知）"""
+        self._bind_loop()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+    
+    async def notify(self, url_id: int, url_name: str, url: str, keyword: str,
+                     note: str = None) -> bool:
+        """
+        提交一条关键词命中通知（队列满时等待）
+        
+        Returns:
+            是否已提交（未配置Telegram时返回False）
+        """
+        if self.notifier is None:
+            return False
+        
+        await self.start()
+        await self._queue.put({
+            'url_id': url_id,
+            'url_name': url_name,
+            'url': url,
+            'keyword': keyword,
+            'note': note
+        })
+        return True
+    
+    async def wake(self):
+        """发件箱中有新写入的通知（如随关键词认领写入），唤醒后台任务发送"""
+        if self.notifier is None:
+            return
+        
+        await self.start()
+        await self._queue.put(None)
+    
+    def pending(self) -> int:
+        """内存队列中等待写入发件箱的通知数"""
+        return self._queue.qsize() if self._queue else 0
+    
+    async def close(self):
+        """停止后台任务，队列中尚未写入发件箱的通知会被保存"""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        
+        hits = []
+        while not self._queue.empty():
+            hit = self._queue.get_nowait()
+            if hit is not None:
+                hits.append(hit)
+        if hits:
+            await asyncio.to_thread(self.db.add_notifications, hits)
+            logger.info(f"已保存 {len(hits)} 条待发送通知")
+    
+    async def _run(self):
+        while True:
+            try:
+                await self._collect()
+                await self._send_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"通知派发出错: {e}", exc_info=True)
+                await asyncio.sleep(self.base_backoff)
+    
+    async def _collect(self):
+        """等待新通知或下一次重试时间；收到新通知后等待合并窗口，再写入发件箱"""
+        next_time = await asyncio.to_thread(self.db.get_next_notification_time)
+        timeout = None
+        if next_time is not None:
+            timeout = max(0.0, max(next_time, self._paused_until) - time.time())
+            if self.notifier is None:
+                # 未配置Telegram时发件箱中的通知暂不发送，定期检查是否已配置
+                timeout = max(timeout, 30.0)
+        
+        try:
+            first = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return
+        
+        hits = [first]
+        try:
+            deadline = self._loop.time() + self.merge_window
+            while True:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    hits.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+        finally:
+            # 即使在合并窗口内被取消（关闭），也要写入发件箱（None 只是唤醒标记）
+            hits = [hit for hit in hits if hit is not None]
+            if hits:
+                await asyncio.shield(asyncio.to_thread(self.db.add_notifications, hits))
+    
+    async def _send_due(self):
+        """发送所有已到时间的通知，同一URL的多条合成一条消息"""
+        if time.time() < self._paused_until:
+            return
+        
+        rows = await asyncio.to_thread(self.db.claim_due_notifications, time.time())
+        groups: Dict[int, List[Dict]] = OrderedDict()
+        for row in rows:
+            groups.setdefault(row['url_id'], []).append(row)
+        
+        for items in groups.values():
+            if self.notifier is None:
+                return
+            
+            # 控制发送速率
+            wait = self._last_sent + self.min_interval - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            
+            result = await self.notifier.deliver(self._format(items))
+            self._last_sent = time.time()
+            ids = [item['id'] for item in items]
+            
+            if result.ok:
+                await asyncio.to_thread(self.db.delete_notifications, ids)
+                self.sent += 1
+                continue
+            
+            if result.retry_after:
+                # 被限流：所有通知都暂停到Telegram要求的时间之后
+                self._paused_until = time.time() + result.retry_after
+                logger.warning(f"Telegram限流，{result.retry_after:.0f} 秒后重试")
+                await asyncio.to_thread(self.db.reschedule_notifications, ids,
+                                        self._paused_until, result.error)
+                return
+            
+            attempts = max(item['attempts'] for item in items) + 1
+            if not result.retryable or attempts >= self.max_attempts:
+                logger.error(f"通知发送失败，已放弃（{attempts}次）: {items[0]['url_name']}, {result.error}")
+                await asyncio.to_thread(self.db.delete_notifications, ids)
+                self.dropped += len(ids)
+                continue
+            
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+            delay *= random.uniform(0.8, 1.2)
+            logger.warning(f"通知发送失败，{delay:.0f} 秒后重试（第{attempts}次）: {items[0]['url_name']}")
+            await asyncio.to_thread(self.db.reschedule_notifications, ids,
+                                    time.time() + delay, result.error)
+    
+    @staticmethod
+    def _format(items: List[Dict]) -> str:
+        """把同一URL的多条命中合成一条消息"""
+        first = items[0]
+        keywords = []
+        notes = []
+        for item in items:
+            if item['keyword'] not in keywords:
+                keywords.append(item['keyword'])
+            if item.get('note') and item['note'] not in notes:
+                notes.append(item['note'])
+        
+        detected_at = datetime.now()
+        if first.get('created_at'):
+            # 发件箱中的时间为UTC
+            detected_at = datetime.strptime(first['created_at'], '%Y-%m-%d %H:%M:%S') \
+                .replace(tzinfo=timezone.utc).astimezone()
+        
+        message = (
+            f"🔔 <b>监控提醒</b>\n\n"
+            f"📌 <b>网址:</b> {html.escape(first['url_name'] or first['url'] or '')}\n"
+            f"🔗 <b>链接:</b> {html.escape(first['url'] or '')}\n"
+            f"🔑 <b>关键词:</b> {html.escape(', '.join(keywords))}\n"
+            f"⏰ <b>时间:</b> {detected_at.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+            f"✅ 检测到指定关键词！"
+        )
+        if notes:
+            message += '\n\n' + '\n'.join(notes)
+        return message
@@ -0,0 +1,79 @@
+"""
+页面指纹模块
+- fingerprint():   计算文本哈希，用于判断页面内容是否发生变化（哈希的文本必须与匹配关键词的文本完全相同）
+- normalize_text(): 去除日期、时间戳等易变内容，只用于生成变化摘要
+"""
+import difflib
+import hashlib
+import re
+from typing import Optional
+
+# 易变内容：每次访问都可能不同，但不代表页面有实质变化
+_VOLATILE_RES = [
+    re.compile(r'\d{4}[-/年]\d{1,2}[-/月]\d{1,2}日?(?:[ T]?\d{1,2}:\d{2}(?::\d{2})?(?:\.\d+)?)?'),  # 日期/时间
+    re.compile(r'(?<!\d)\d{1,2}:\d{2}(?::\d{2})?(?!\d)'),           # 时刻
+    re.compile(r'(?<!\d)\d{10}(?:\d{3})?(?!\d)'),                    # Unix时间戳（秒/毫秒）
+    re.compile(r'(?<![0-9a-f-])[0-9a-f-]{16,}(?![0-9a-f-])', re.IGNORECASE),  # UUID、nonce、token等长十六进制串
+    re.compile(r'\d+\s*(?:秒|分钟|小时|天)前'),                       # 相对时间
+]
+_SPACE_RE = re.compile(r'[ \t\r\f\v 　]+')
+
+# 保留用于生成差异摘要的文本上限（字符数）
+MAX_DIFF_TEXT = 200_000
+
+
+def normalize_text(text: str) -> str:
+    """
+    去除已提取的可见文本（innerText 等）中的易变内容
+    
+    Args:
+        text: 页面文本
+    
+    Returns:
+        归一化后的文本（每行一个文本块）
+    """
+    if not text:
+        return ''
+    
+    for pattern in _VOLATILE_RES:
+        text = pattern.sub('#', text)
+    
+    lines = (_SPACE_RE.sub(' ', line).strip() for line in text.split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def fingerprint(text: str) -> str:
+    """计算文本指纹"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def summarize_diff(old_text: Optional[str], new_text: str, max_snippet: int = 60) -> str:
+    """
+    生成简短的变化摘要，例如 "+3行 -1行，新增: xxx"
+    
+    Args:
+        old_text: 上次的归一化文本（未知时为None）
+        new_text: 本次的归一化文本
+        max_snippet: 摘要中示例文本的最大长度
+    """
+    if old_text is None:
+        return f"内容已变化（{len(new_text)}字）"
+    
+    old_lines = old_text.split('\n')
+    new_lines = new_text.split('\n')
+    
+    added = []
+    removed = 0
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines).get_opcodes():
+        if tag in ('replace', 'delete'):
+            removed += i2 - i1
+        if tag in ('replace', 'insert'):
+            added.extend(new_lines[j1:j2])
+    
+    summary = f"+{len(added)}行 -{removed}行"
+    if added:
+        snippet = added[0]
+        if len(snippet) > max_snippet:
+            snippet = snippet[:max_snippet] + '…'
+        summary += f"，新增: {snippet}"
+    return summary
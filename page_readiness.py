@@ -0,0 +1,139 @@
+"""
+页面就绪策略模块
+按URL配置决定何时认为页面加载完成，替代固定的 networkidle + sleep 等待
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+# 支持的就绪策略
+#   domcontentloaded: DOM解析完成即可
+#   load:             load事件触发
+#   networkidle:      网络空闲（最多等待 wait_timeout 毫秒，轮询型页面不会无限等待）
+#   selector:         wait_target 指定的CSS选择器出现
+#   text:             页面可见文本中出现 wait_target
+READY_STRATEGIES = ('domcontentloaded', 'load', 'networkidle', 'selector', 'text')
+
+DEFAULT_STRATEGY = 'networkidle'
+DEFAULT_WAIT_TIMEOUT = 10000  # 毫秒
+
+# 检测页面中是否已出现任一关键词（用于提前结束等待）
+_KEYWORDS_PRESENT_JS = """
+    (keywords) => {
+        const text = (document.body ? document.body.innerText : '').toLowerCase();
+        return keywords.some(keyword => text.includes(keyword));
+    }
+"""
+
+_TEXT_PRESENT_JS = """
+    (target) => !!document.body && document.body.innerText.includes(target)
+"""
+
+
+class PageReadiness:
+    """
+    页面就绪策略
+    
+    early_exit 开启时，只要页面中出现任一关键词就立即结束等待，不必等到策略条件满足
+    """
+    
+    def __init__(self, strategy: str = DEFAULT_STRATEGY, target: str = None,
+                 timeout: int = DEFAULT_WAIT_TIMEOUT, early_exit: bool = False):
+        if strategy not in READY_STRATEGIES:
+            logger.warning(f"未知的就绪策略: {strategy}，使用默认策略 {DEFAULT_STRATEGY}")
+            strategy = DEFAULT_STRATEGY
+        if strategy in ('selector', 'text') and not target:
+            logger.warning(f"就绪策略 {strategy} 缺少等待目标，改为 domcontentloaded")
+            strategy = 'domcontentloaded'
+        
+        self.strategy = strategy
+        self.target = target
+        self.timeout = timeout or DEFAULT_WAIT_TIMEOUT
+        self.early_exit = early_exit
+    
+    @classmethod
+    def from_url_data(cls, url_data: Dict) -> 'PageReadiness':
+        """根据URL配置（wait_strategy、wait_target、wait_timeout、early_exit字段）创建策略"""
+        return cls(
+            strategy=url_data.get('wait_strategy') or DEFAULT_STRATEGY,
+            target=url_data.get('wait_target'),
+            timeout=url_data.get('wait_timeout') or DEFAULT_WAIT_TIMEOUT,
+            early_exit=bool(url_data.get('early_exit'))
+        )
+    
+    @property
+    def goto_wait_until(self) -> str:
+        """page.goto 的 wait_until 参数（其余条件在 wait() 中继续等待）"""
+        return 'load' if self.strategy == 'load' else 'domcontentloaded'
+    
+    async def _wait_strategy(self, page) -> bool:
+        """等待策略条件满足，超时不视为错误（使用当时已有的内容）"""
+        try:
+            if self.strategy == 'networkidle':
+                await page.wait_for_load_state('networkidle', timeout=self.timeout)
+            elif self.strategy == 'selector':
+                await page.wait_for_selector(self.target, timeout=self.timeout)
+            elif self.strategy == 'text':
+                await page.wait_for_function(_TEXT_PRESENT_JS, arg=self.target,
+                                             timeout=self.timeout, polling=250)
+            return True
+        except PlaywrightTimeoutError:
+            logger.info(f"等待页面就绪超时（{self.strategy}, {self.timeout}ms），使用当前内容")
+            return False
+        except Exception as e:
+            logger.warning(f"等待页面就绪失败（{self.strategy}）: {e}")
+            return False
+    
+    async def _wait_keywords(self, page, keywords: List[str]) -> bool:
+        """等待任一关键词出现在页面中"""
+        try:
+            await page.wait_for_function(_KEYWORDS_PRESENT_JS, arg=keywords,
+                                         timeout=self.timeout, polling=250)
+            return True
+        except Exception:
+            # 超时或页面已关闭，按未出现处理
+            return False
+    
+    async def wait(self, page, keywords: Optional[List[str]] = None) -> bool:
+        """
+        等待页面就绪
+        
+        Args:
+            page: Playwright页面（已完成 goto）
+            keywords: 提前结束所用的关键词
+        
+        Returns:
+            是否因关键词出现而提前结束
+        """
+        if self.strategy in ('domcontentloaded', 'load') and not (self.early_exit and keywords):
+            return False
+        
+        strategy_task = asyncio.ensure_future(self._wait_strategy(page))
+        pending = {strategy_task}
+        keyword_task = None
+        if self.early_exit and keywords:
+            keyword_task = asyncio.ensure_future(
+                self._wait_keywords(page, [kw.lower() for kw in keywords])
+            )
+            pending.add(keyword_task)
+        
+        early = False
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if strategy_task in done:
+                    break
+                if keyword_task in done and keyword_task.result():
+                    early = True
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        return early
@@ -0,0 +1,233 @@
+"""
+页面文本提取模块
+只提取页面的可见文本（可按URL配置的CSS选择器限定区域），关键词匹配、变化检测和日志都基于提取后的文本，
+不再扫描包含脚本、样式、属性和内联JSON的完整HTML
+"""
+import logging
+import re
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# 浏览器模式：直接取 innerText（只包含渲染后的可见文本）；
+# 指定选择器时只取匹配元素的文本，多个元素按文档顺序拼接
+EXTRACT_TEXT_JS = """
+    (selector) => {
+        const body = document.body;
+        if (!body) return {text: '', matched: 0};
+        if (!selector) return {text: body.innerText, matched: 1};
+        let elements;
+        try {
+            elements = Array.from(document.querySelectorAll(selector));
+        } catch (e) {
+            return {text: '', matched: -1};
+        }
+        return {text: elements.map(el => el.innerText).join('\\n'), matched: elements.length};
+    }
+"""
+
+# 不可见的元素
+_SKIP_TAGS = {'head', 'script', 'style', 'noscript', 'template', 'svg', 'iframe', 'object'}
+# 没有结束标签的元素
+_VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+              'param', 'source', 'track', 'wbr'}
+# 块级元素前后换行（与 innerText 一致），行内元素的文本直接相连
+_BLOCK_TAGS = {'address', 'article', 'aside', 'blockquote', 'dd', 'details', 'div', 'dl', 'dt',
+               'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5',
+               'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'summary',
+               'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'ul', 'option', 'button'}
+
+_WHITESPACE_RE = re.compile(r'\s+')
+# 提取结果中连续的空白：含换行时合并为一个换行，否则合并为一个空格
+_GAP_RE = re.compile(r'[ \n]+')
+
+# HTTP模式支持的简单选择器：标签、#id、.class 及其组合，多个选择器用逗号分隔
+_SIMPLE_SELECTOR_RE = re.compile(r'^([a-zA-Z][\w-]*)?((?:[#.][\w-]+)*)$')
+
+
+def _collapse_gap(match) -> str:
+    return '\n' if '\n' in match.group() else ' '
+
+
+def parse_selector(selector: str) -> Optional[List[Tuple[Optional[str], Optional[str], Tuple[str, ...]]]]:
+    """
+    解析简单CSS选择器
+    
+    Returns:
+        [(标签, id, 类名), ...]，选择器不受支持（包含后代、属性、伪类等）时返回None
+    """
+    parsed = []
+    for part in selector.split(','):
+        part = part.strip()
+        match = _SIMPLE_SELECTOR_RE.match(part)
+        if not part or not match:
+            return None
+        
+        tag = match.group(1).lower() if match.group(1) else None
+        element_id = None
+        classes = []
+        for token in re.findall(r'[#.][\w-]+', match.group(2)):
+            if token[0] == '#':
+                element_id = token[1:]
+            else:
+                classes.append(token[1:])
+        parsed.append((tag, element_id, tuple(classes)))
+    return parsed
+
+
+class HTMLTextExtractor(HTMLParser):
+    """
+    从HTML中提取可见文本（HTTP模式使用，效果接近浏览器的 innerText）
+    
+    - 跳过 script、style 等不可见元素
+    - 块级元素换行，行内元素的文本相连，连续空白合并为一个空格
+    - 指定选择器时只提取匹配元素（及其子元素）中的文本
+    """
+    
+    def __init__(self, selectors: List[Tuple] = None):
+        super().__init__(convert_charrefs=True)
+        self._selectors = selectors
+        self._parts: List[str] = []
+        self._stack: List[str] = []
+        self._skip_depth: Optional[int] = None     # 进入不可见元素时的栈深度
+        self._capture_depth: Optional[int] = None  # 进入选择器匹配元素时的栈深度
+        self._gap = ''                              # take_text() 尚未输出的末尾空白
+        self._started = False                       # take_text() 是否已输出过文本
+        self.matched = 0
+    
+    @property
+    def _capturing(self) -> bool:
+        return self._selectors is None or self._capture_depth is not None
+    
+    def _matches(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> bool:
+        attributes = dict(attrs)
+        element_classes = set((attributes.get('class') or '').split())
+        for selector_tag, element_id, classes in self._selectors:
+            if selector_tag and selector_tag != tag:
+                continue
+            if element_id and attributes.get('id') != element_id:
+                continue
+            if not element_classes.issuperset(classes):
+                continue
+            return True
+        return False
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in _VOID_TAGS:
+            if tag in ('br', 'hr') and self._capturing:
+                self._parts.append('\n')
+            return
+        
+        self._stack.append(tag)
+        depth = len(self._stack)
+        if self._skip_depth is None and tag in _SKIP_TAGS:
+            self._skip_depth = depth
+        if self._selectors is not None and self._capture_depth is None and self._matches(tag, attrs):
+            self._capture_depth = depth
+            self.matched += 1
+        if tag in _BLOCK_TAGS and self._capturing:
+            self._parts.append('\n')
+    
+    def handle_endtag(self, tag):
+        if tag in _VOID_TAGS or tag not in self._stack:
+            return
+        
+        # 弹出到对应的开始标签（未闭合的子元素一并结束）
+        while self._stack.pop() != tag:
+            pass
+        depth = len(self._stack)
+        
+        if tag in _BLOCK_TAGS and self._capturing:
+            self._parts.append('\n')
+        if self._skip_depth is not None and depth < self._skip_depth:
+            self._skip_depth = None
+        if self._capture_depth is not None and depth < self._capture_depth:
+            # 多个匹配区域之间换行
+            self._capture_depth = None
+            self._parts.append('\n')
+    
+    def handle_data(self, data):
+        if self._skip_depth is None and self._capturing:
+            self._parts.append(_WHITESPACE_RE.sub(' ', data))
+    
+    def get_text(self) -> str:
+        """提取的文本（每行一个文本块）"""
+        return _GAP_RE.sub(_collapse_gap, ''.join(self._parts)).strip(' \n')
+    
+    def take_text(self) -> str:
+        """
+        取出上次调用以来新提取的文本（流式匹配时每次 feed() 后调用）
+        
+        依次拼接每次的返回值，结果与 get_text() 相同：末尾的空白暂不输出，
+        等后面有文本时再与后面的空白一起合并
+        """
+        text = self._gap + ''.join(self._parts)
+        self._parts = []
+        
+        body = text.rstrip(' \n')
+        self._gap = text[len(body):]
+        if not body.strip(' \n'):
+            self._gap = text
+            return ''
+        
+        if not self._started:
+            body = body.lstrip(' \n')
+            self._started = True
+        return _GAP_RE.sub(_collapse_gap, body)
+
+
+def extract_text(content: str, selector: str = None) -> str:
+    """
+    从HTML中提取可见文本
+    
+    Args:
+        content: 网页HTML
+        selector: 内容区域的CSS选择器（仅支持标签、#id、.class 的组合），为空时提取整个页面
+    
+    Returns:
+        可见文本；指定的选择器没有匹配到任何元素时返回空字符串
+    """
+    if not content:
+        return ''
+    
+    parser = make_extractor(selector)
+    parser.feed(content)
+    parser.close()
+    
+    check_selector_matched(parser, selector)
+    return parser.get_text()
+
+
+def make_extractor(selector: str = None) -> HTMLTextExtractor:
+    """创建文本提取器（选择器不受支持时提取整个页面）"""
+    selectors = None
+    if selector:
+        selectors = parse_selector(selector)
+        if selectors is None:
+            logger.warning(f"HTTP模式不支持该内容选择器，改为提取整个页面: {selector}")
+    return HTMLTextExtractor(selectors)
+
+
+def check_selector_matched(parser: HTMLTextExtractor, selector: str = None):
+    """内容选择器没有匹配到任何元素时记录警告"""
+    if selector and parser._selectors is not None and not parser.matched:
+        logger.warning(f"内容选择器未匹配到任何元素: {selector}")
+
+
+def keyword_context(text: str, keyword: str, width: int = 20) -> Optional[str]:
+    """
+    关键词在文本中第一次出现位置的上下文（用于日志）
+    
+    Returns:
+        形如 "…前文关键词后文…" 的片段，找不到时返回None
+    """
+    index = text.lower().find(keyword.lower())
+    if index < 0:
+        return None
+    
+    start = max(0, index - width)
+    end = min(len(text), index + len(keyword) + width)
+    snippet = _WHITESPACE_RE.sub(' ', text[start:end]).strip()
+    return ('…' if start > 0 else '') + snippet + ('…' if end < len(text) else '')
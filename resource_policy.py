@@ -0,0 +1,116 @@
+"""
+资源拦截策略模块
+关键词匹配只需要页面DOM文本，通过Playwright路由拦截图片、字体、媒体、样式表及统计脚本，
+加快页面加载并减少带宽和渲染进程内存
+"""
+import logging
+import re
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+# 默认拦截的资源类型（Playwright request.resource_type）
+BLOCKED_RESOURCE_TYPES = frozenset(['image', 'font', 'media', 'stylesheet'])
+
+# 默认拦截的统计/广告域名（匹配域名及其子域名）
+TRACKER_DOMAINS = (
+    'google-analytics.com',
+    'googletagmanager.com',
+    'googlesyndication.com',
+    'googleadservices.com',
+    'doubleclick.net',
+    'connect.facebook.net',
+    'hotjar.com',
+    'clarity.ms',
+    'mixpanel.com',
+    'segment.io',
+    'scorecardresearch.com',
+    'hm.baidu.com',
+    'cnzz.com',
+    'umeng.com',
+    'growingio.com',
+    '51.la',
+)
+
+
+def _match_domain(host: str, domain: str) -> bool:
+    return host == domain or host.endswith('.' + domain)
+
+
+def parse_allowlist(value) -> frozenset:
+    """解析放行列表（逗号、空格或换行分隔）"""
+    if not value:
+        return frozenset()
+    if isinstance(value, str):
+        value = re.split(r'[\s,;]+', value)
+    return frozenset(item.strip().lower() for item in value if item and item.strip())
+
+
+class ResourcePolicy:
+    """
+    页面资源拦截策略
+    
+    放行列表中的条目可以是资源类型（如 stylesheet、image），
+    也可以是域名（如 cdn.example.com，同时匹配其子域名），命中放行列表的请求不会被拦截
+    """
+    
+    def __init__(self, enabled: bool = True, allowlist: Iterable[str] = None,
+                 blocked_types: Iterable[str] = BLOCKED_RESOURCE_TYPES,
+                 blocked_domains: Iterable[str] = TRACKER_DOMAINS):
+        self.enabled = enabled
+        self.allowlist = parse_allowlist(allowlist)
+        self.blocked_types = frozenset(blocked_types) - self.allowlist
+        self.blocked_domains = tuple(d for d in blocked_domains if d not in self.allowlist)
+        self._allowed_domains = tuple(item for item in self.allowlist if '.' in item)
+    
+    @classmethod
+    def from_url_data(cls, url_data: Dict) -> 'ResourcePolicy':
+        """根据URL配置（block_resources、resource_allowlist字段）创建策略"""
+        enabled = url_data.get('block_resources')
+        return cls(
+            enabled=True if enabled is None else bool(enabled),
+            allowlist=url_data.get('resource_allowlist')
+        )
+    
+    def should_block(self, resource_type: str, url: str) -> bool:
+        """判断请求是否应被拦截"""
+        if not self.enabled:
+            return False
+        
+        host = (urlparse(url).hostname or '').lower()
+        if any(_match_domain(host, domain) for domain in self._allowed_domains):
+            return False
+        
+        if resource_type in self.blocked_types:
+            return True
+        
+        return any(_match_domain(host, domain) for domain in self.blocked_domains)
+    
+    async def apply(self, page) -> Optional[Dict]:
+        """
+        在页面上注册路由拦截
+        
+        Returns:
+            拦截统计 {'blocked': 数量}，未启用时返回None
+        """
+        if not self.enabled:
+            return None
+        
+        stats = {'blocked': 0}
+        
+        async def handle(route):
+            request = route.request
+            try:
+                if self.should_block(request.resource_type, request.url):
+                    stats['blocked'] += 1
+                    await route.abort()
+                else:
+                    await route.continue_()
+            except Exception as e:
+                # 页面关闭后路由可能已失效
+                logger.debug(f"处理请求拦截失败: {request.url}, 错误: {e}")
+        
+        await page.route('**/*', handle)
+        return stats
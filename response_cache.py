@@ -0,0 +1,120 @@
+"""
+接口响应缓存模块
+缓存仪表盘轮询的只读接口（URL列表、关键词、日志、状态等），
+带有短TTL、ETag/304 支持，以及按标签的主动失效，多个页面同时打开时几乎不产生数据库查询
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+from typing import Dict, Iterable, Optional, Tuple
+
+from flask import request, make_response
+
+
+class ResponseCache:
+    """
+    进程内响应缓存
+    
+    - 以请求路径（含查询参数）为键，缓存成功响应的正文和ETag
+    - 每个缓存项带有若干标签，写接口调用 invalidate(标签) 使相关缓存立即失效
+    - 客户端带 If-None-Match 且ETag未变时返回 304
+    """
+    
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple] = {}  # key -> (过期时间, 正文, ETag, mimetype, 标签)
+        self._generations: Dict[str, int] = {}  # 标签 -> 失效次数
+        self._lock = threading.Lock()
+        
+        # 统计
+        self.hits = 0
+        self.misses = 0
+    
+    def _generation(self, tags: Iterable[str]) -> Tuple:
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+    
+    def get(self, key: str) -> Optional[Tuple]:
+        """获取未过期的缓存项 (正文, ETag, mimetype)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1:4]
+    
+    def set(self, key: str, body: bytes, mimetype: str, tags: Tuple[str, ...], ttl: float,
+            generation: Tuple) -> str:
+        """
+        写入缓存项
+        
+        Args:
+            generation: 开始生成响应前的标签版本，生成期间标签被失效时不写入缓存
+        
+        Returns:
+            响应的ETag
+        """
+        etag = hashlib.sha1(body).hexdigest()
+        with self._lock:
+            if generation != self._generation(tags):
+                return etag
+            
+            if len(self._entries) >= self.max_entries and key not in self._entries:
+                # 先清理过期项，仍然过多时整体清空（缓存键只有少数几个接口路径）
+                now = time.monotonic()
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            
+            self._entries[key] = (time.monotonic() + ttl, body, etag, mimetype, tags)
+        return etag
+    
+    def invalidate(self, *tags: str):
+        """使带有任一标签的缓存失效"""
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            self._entries = {key: entry for key, entry in self._entries.items()
+                             if not set(entry[4]) & set(tags)}
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def cached(self, *tags: str, ttl: float = 5):
+        """
+        Flask路由装饰器：缓存GET接口的成功响应
+        
+        Args:
+            tags: 缓存标签，对应的写接口调用 invalidate() 时失效
+            ttl: 缓存有效期（秒）
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = request.full_path
+                entry = self.get(key)
+                
+                if entry is None:
+                    with self._lock:
+                        generation = self._generation(tags)
+                    
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        # 错误响应不缓存
+                        return response
+                    
+                    body = response.get_data()
+                    etag = self.set(key, body, response.mimetype, tags, ttl, generation)
+                else:
+                    body, etag, mimetype = entry
+                    response = make_response(body)
+                    response.mimetype = mimetype
+                
+                response.set_etag(etag)
+                # 浏览器每次都带上ETag重新验证，而不是直接使用本地缓存
+                response.headers['Cache-Control'] = 'no-cache'
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
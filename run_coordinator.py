@@ -0,0 +1,90 @@
+"""
+运行协调模块
+保证同一个URL同时最多只有一次检查在进行：调度器和手动触发重叠时，
+后来的请求不会再启动一次检查，而是合并为“完成后再检查一次”
+"""
+import logging
+import threading
+from typing import Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# URL运行状态
+QUEUED = 'queued'     # 已认领，等待并发名额/域名限速
+RUNNING = 'running'   # 正在检查
+
+
+class RunCoordinator:
+    """
+    URL检查的运行协调器（线程安全）
+    
+    - claim():    认领要检查的URL，已在排队或运行中的URL不会重复认领，改为标记“完成后重跑”
+    - started():  URL开始实际检查
+    - finish():   URL检查完成，返回需要重跑的URL（这些URL直接保持认领状态）
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states: Dict[int, str] = {}
+        self._rerun = set()
+        
+        # 统计
+        self.skipped = 0      # 因已在运行而被合并的触发次数
+        self.completed = 0    # 完成的检查次数
+    
+    def claim(self, url_ids: List[int]) -> List[int]:
+        """
+        认领URL
+        
+        Returns:
+            本次认领成功、应由调用方检查的URL ID
+        """
+        claimed = []
+        with self._lock:
+            for url_id in url_ids:
+                if url_id in self._states:
+                    self._rerun.add(url_id)
+                    self.skipped += 1
+                else:
+                    self._states[url_id] = QUEUED
+                    claimed.append(url_id)
+        
+        if len(claimed) < len(url_ids):
+            logger.info(f"{len(url_ids) - len(claimed)} 个URL正在检查中，完成后将再检查一次")
+        return claimed
+    
+    def started(self, url_id: int):
+        """URL开始检查"""
+        with self._lock:
+            if url_id in self._states:
+                self._states[url_id] = RUNNING
+    
+    def finish(self, url_ids: Iterable[int]) -> List[int]:
+        """
+        URL检查完成
+        
+        Returns:
+            检查期间又被触发、需要再检查一次的URL ID（保持认领状态）
+        """
+        rerun = []
+        with self._lock:
+            for url_id in url_ids:
+                self.completed += 1
+                if url_id in self._rerun:
+                    self._rerun.discard(url_id)
+                    self._states[url_id] = QUEUED
+                    rerun.append(url_id)
+                else:
+                    self._states.pop(url_id, None)
+        return rerun
+    
+    def status(self) -> Dict:
+        """当前排队、运行中和待重跑的URL"""
+        with self._lock:
+            return {
+                'queued': sorted(url_id for url_id, state in self._states.items() if state == QUEUED),
+                'running': sorted(url_id for url_id, state in self._states.items() if state == RUNNING),
+                'rerun_pending': sorted(self._rerun),
+                'skipped': self.skipped,
+                'completed': self.completed
+            }
@@ -2,27 +2,48 @@
 Telegram通知模块
 用于发送监控提醒
 """
+import json
 import logging
-import aiohttp
-from typing import Optional
+import time
+from typing import NamedTuple, Optional
 
-# 尝试导入SOCKS5支持
-try:
-    from aiohttp_socks import ProxyConnector
-    SOCKS_AVAILABLE = True
-except ImportError:
-    SOCKS_AVAILABLE = False
-    logging.warning("aiohttp-socks未安装，SOCKS5代理功能不可用")
+from http_session import SessionPool, session_pool as shared_session_pool, is_socks_proxy, SOCKS_AVAILABLE
+import metrics
 
 logger = logging.getLogger(__name__)
 
 
+class SendResult(NamedTuple):
+    """消息发送结果"""
+    ok: bool
+    retry_after: Optional[float] = None  # 被限流（429）时需要等待的秒数
+    retryable: bool = True               # 失败后重试是否可能成功
+    error: Optional[str] = None
+
+
 class TelegramNotifier:
-    def __init__(self, bot_token: str, chat_id: str, proxy_url: str = None):
+    def __init__(self, bot_token: str, chat_id: str, proxy_url: str = None,
+                 session_pool: SessionPool = None):
         self.bot_token = bot_token
         self.chat_id = chat_id
         self.proxy_url = proxy_url
         self.api_url = f"https://api.telegram.org/bot{bot_token}"
+        # 复用长连接会话，避免每条消息都重新经代理建立TLS连接
+        self.session_pool = session_pool or shared_session_pool
+    
+    def _request_proxy(self) -> Optional[str]:
+        """HTTP/HTTPS代理通过请求参数传递，SOCKS代理由会话连接器处理"""
+        if self.proxy_url and not is_socks_proxy(self.proxy_url):
+            return self.proxy_url
+        return None
+    
+    async def _get_session(self):
+        """获取当前代理配置对应的会话，SOCKS依赖缺失时返回None"""
+        if is_socks_proxy(self.proxy_url) and not SOCKS_AVAILABLE:
+            # SOCKS代理需要aiohttp-socks
+            logger.error("SOCKS5代理需要安装 aiohttp-socks: pip install aiohttp-socks")
+            return None
+        return await self.session_pool.get(self.proxy_url)
     
     async def send_message(self, message: str, parse_mode: str = 'HTML') -> bool:
         """
@@ -35,6 +56,22 @@ class TelegramNotifier:
         Returns:
             是否发送成功
         """
+        result = await self.deliver(message, parse_mode)
+        return result.ok
+    
+    async def deliver(self, message: str, parse_mode: str = 'HTML') -> SendResult:
+        """
+        发送Telegram消息，并返回失败时是否可以重试、需要等待多久
+        
+        Returns:
+            SendResult（被限流时 retry_after 为Telegram要求等待的秒数）
+        """
+        started = time.perf_counter()
+        result = await self._deliver(message, parse_mode)
+        metrics.TELEGRAM_SEND_SECONDS.labels('ok' if result.ok else 'error').observe(time.perf_counter() - started)
+        return result
+    
+    async def _deliver(self, message: str, parse_mode: str) -> SendResult:
         try:
             url = f"{self.api_url}/sendMessage"
             
@@ -44,51 +81,36 @@ class TelegramNotifier:
                 'parse_mode': parse_mode
             }
             
-            # 配置连接器和代理
-            connector = None
-            
-            if self.proxy_url:
-                if self.proxy_url.startswith('socks5://') or self.proxy_url.startswith('socks4://'):
-                    # SOCKS代理需要aiohttp-socks
-                    if SOCKS_AVAILABLE:
-                        connector = ProxyConnector.from_url(self.proxy_url)
-                        logger.info(f"使用SOCKS代理: {self.proxy_url.split('@')[-1]}")
-                    else:
-                        logger.error("SOCKS5代理需要安装 aiohttp-socks: pip install aiohttp-socks")
-                        return False
-                else:
-                    # HTTP/HTTPS代理使用普通connector
-                    connector = aiohttp.TCPConnector()
-            
-            timeout = aiohttp.ClientTimeout(total=30)
+            session = await self._get_session()
+            if session is None:
+                return SendResult(False, retryable=False, error='SOCKS代理依赖缺失')
             
-            # 根据代理类型决定如何传递
-            if self.proxy_url and not self.proxy_url.startswith('socks'):
-                # HTTP/HTTPS代理
-                async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-                    async with session.post(url, json=data, proxy=self.proxy_url) as response:
-                        if response.status == 200:
-                            logger.info("Telegram消息发送成功")
-                            return True
-                        else:
-                            error_text = await response.text()
-                            logger.error(f"Telegram消息发送失败: {response.status}, {error_text}")
-                            return False
-            else:
-                # SOCKS代理或无代理
-                async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-                    async with session.post(url, json=data) as response:
-                        if response.status == 200:
-                            logger.info("Telegram消息发送成功")
-                            return True
-                        else:
-                            error_text = await response.text()
-                            logger.error(f"Telegram消息发送失败: {response.status}, {error_text}")
-                            return False
+            async with session.post(url, json=data, proxy=self._request_proxy()) as response:
+                if response.status == 200:
+                    logger.info("Telegram消息发送成功")
+                    return SendResult(True)
+                
+                error_text = await response.text()
+                logger.error(f"Telegram消息发送失败: {response.status}, {error_text}")
+                
+                if response.status == 429:
+                    # 触发频率限制，Telegram会在 parameters.retry_after 中给出等待秒数
+                    retry_after = None
+                    try:
+                        retry_after = json.loads(error_text).get('parameters', {}).get('retry_after')
+                    except ValueError:
+                        pass
+                    if retry_after is None:
+                        retry_after = response.headers.get('Retry-After')
+                    return SendResult(False, retry_after=float(retry_after or 1), error=error_text)
+                
+                # 其余4xx（如chat_id错误、消息格式错误）重试也不会成功
+                retryable = response.status >= 500
+                return SendResult(False, retryable=retryable, error=f"{response.status}: {error_text}")
         
         except Exception as e:
             logger.error(f"发送Telegram消息异常: {e}")
-            return False
+            return SendResult(False, error=str(e))
     
     async def test_connection(self) -> bool:
         """
@@ -100,50 +122,20 @@ class TelegramNotifier:
         try:
             url = f"{self.api_url}/getMe"
             
-            # 配置连接器和代理
-            connector = None
-            
-            if self.proxy_url:
-                if self.proxy_url.startswith('socks5://') or self.proxy_url.startswith('socks4://'):
-                    # SOCKS代理需要aiohttp-socks
-                    if SOCKS_AVAILABLE:
-                        connector = ProxyConnector.from_url(self.proxy_url)
-                    else:
-                        logger.error("SOCKS5代理需要安装 aiohttp-socks: pip install aiohttp-socks")
-                        return False
-                else:
-                    # HTTP/HTTPS代理
-                    connector = aiohttp.TCPConnector()
+            session = await self._get_session()
+            if session is None:
+                return False
             
-            timeout = aiohttp.ClientTimeout(total=30)
-            
-            # 根据代理类型决定如何传递
-            if self.proxy_url and not self.proxy_url.startswith('socks'):
-                # HTTP/HTTPS代理
-                async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-                    async with session.get(url, proxy=self.proxy_url) as response:
-                        if response.status == 200:
-                            result = await response.json()
-                            if result.get('ok'):
-                                logger.info(f"Telegram连接测试成功: {result.get('result', {}).get('username')}")
-                                return True
-                        
-                        logger.error(f"Telegram连接测试失败: {response.status}")
-                        return False
-            else:
-                # SOCKS代理或无代理
-                async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-                    async with session.get(url) as response:
-                        if response.status == 200:
-                            result = await response.json()
-                            if result.get('ok'):
-                                logger.info(f"Telegram连接测试成功: {result.get('result', {}).get('username')}")
-                                return True
-                        
-                        logger.error(f"Telegram连接测试失败: {response.status}")
-                        return False
+            async with session.get(url, proxy=self._request_proxy()) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    if result.get('ok'):
+                        logger.info(f"Telegram连接测试成功: {result.get('result', {}).get('username')}")
+                        return True
+                
+                logger.error(f"Telegram连接测试失败: {response.status}")
+                return False
         
         except Exception as e:
             logger.error(f"Telegram连接测试异常: {e}")
             return False
-
@@ -5,6 +5,7 @@
 """
 import sys
 import os
+import time
 
 def test_imports():
     """测试模块导入"""
@@ -59,8 +60,11 @@ def test_database():
         db.update_telegram_config('test_token', 'test_chat_id', 'http://proxy.com:8080')
         config = db.get_telegram_config()
         
-        # 清理测试数据
-        os.remove('test_monitor.db')
+        # 清理测试数据（WAL模式下还有 -wal / -shm 文件）
+        db.close()
+        for path in ('test_monitor.db', 'test_monitor.db-wal', 'test_monitor.db-shm'):
+            if os.path.exists(path):
+                os.remove(path)
         
         print("✓ 数据库功能正常")
         return True
@@ -68,6 +72,546 @@ def test_database():
         print(f"✗ 数据库测试失败: {e}")
         return False
 
+def _lease_worker(db_path, worker_id, results):
+    """URL租约测试的工作进程：不断认领到期的URL，直到没有可认领的URL"""
+    from database import Database
+    db = Database(db_path)
+    claimed = []
+    while True:
+        url_ids = db.claim_due_urls(worker_id, limit=3, lease_seconds=30)
+        if not url_ids:
+            break
+        claimed.extend(url_ids)
+        for url_id in url_ids:
+            db.release_lease(url_id, worker_id, time.time() + 3600)
+    db.close()
+    results.put(claimed)
+
+def test_url_leases():
+    """测试URL租约（多个进程共享同一个数据库文件）"""
+    print("\n测试URL租约...")
+    db_path = 'test_leases.db'
+    try:
+        import multiprocessing
+        from database import Database
+        db = Database(db_path)
+        db.init_db()
+        url_ids = [db.add_url(f'https://example.com/{i}', f'Test {i}', 300) for i in range(30)]
+        
+        # 多个进程同时认领，每个URL只被一个进程检查一次
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        processes = [context.Process(target=_lease_worker, args=(db_path, f'worker-{i}', results))
+                     for i in range(4)]
+        for process in processes:
+            process.start()
+        claimed = [url_id for _ in processes for url_id in results.get(timeout=60)]
+        for process in processes:
+            process.join(10)
+        
+        if sorted(claimed) != sorted(url_ids):
+            print(f"✗ URL被重复认领或遗漏: {len(claimed)}/{len(url_ids)}")
+            return False
+        
+        # 进程崩溃（未释放租约）：租约到期前其他进程认领不到，到期后被接管
+        url_id = db.add_url('https://example.com/crashed', 'Crashed', 300)
+        if db.claim_due_urls('crashed', lease_seconds=0.5) != [url_id] or db.claim_due_urls('other'):
+            print("✗ 租约未生效")
+            return False
+        time.sleep(0.6)
+        if db.claim_due_urls('other') != [url_id] or db.release_lease(url_id, 'crashed', time.time()):
+            print("✗ 过期的租约未被接管")
+            return False
+        
+        db.close()
+        print("✓ URL租约功能正常")
+        return True
+    except Exception as e:
+        print(f"✗ URL租约测试失败: {e}")
+        return False
+    finally:
+        for path in (db_path, db_path + '-wal', db_path + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+
+def test_unchanged_page_skip():
+    """测试页面未变化时跳过匹配（只有日期变化的页面不能被跳过，关键词可能就是日期）"""
+    print("\n测试页面变化检测...")
+    db_path = 'test_snapshot.db'
+    try:
+        import asyncio
+        from database import Database
+        from monitor import WebMonitor
+        db = Database(db_path)
+        db.init_db()
+        url_id = db.add_url('https://example.com/sale', 'Sale', 300)
+        db.add_keyword(url_id, '2026-10-21', True)
+        url_data = {'id': url_id, 'url': 'https://example.com/sale', 'name': 'Sale'}
+        
+        monitor = WebMonitor(db)
+        pages = []
+        
+        async def fetch_content(url_data, keywords):
+            return pages[-1], 'http', None
+        monitor.fetch_content = fetch_content
+        
+        async def check(text):
+            pages.append(text)
+            result = await monitor.inspect_url(url_data)
+            await monitor.apply_result(url_data, result)
+            return result
+        
+        async def run():
+            first = await check('抢购开始时间 2026-10-20 10:00')
+            same = await check('抢购开始时间 2026-10-20 10:00')
+            changed = await check('抢购开始时间 2026-10-21 10:00')
+            return first, same, changed
+        
+        first, same, changed = asyncio.run(run())
+        db.close()
+        
+        if first['status'] != 'checked' or same['status'] != 'unchanged':
+            print("✗ 未变化的页面没有跳过匹配")
+            return False
+        if changed['status'] != 'checked' or [kw['keyword'] for kw in changed['matched']] != ['2026-10-21']:
+            print("✗ 只有日期变化的页面被跳过，日期关键词未被发现")
+            return False
+        
+        print("✓ 页面变化检测正常")
+        return True
+    except Exception as e:
+        print(f"✗ 页面变化检测测试失败: {e}")
+        return False
+    finally:
+        for path in (db_path, db_path + '-wal', db_path + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+
+def test_fetch_strategy():
+    """测试页面获取方式的判断与学习（auto模式何时改用浏览器、何时以后只用HTTP）"""
+    print("\n测试页面获取策略...")
+    try:
+        import asyncio
+        from fetch_strategy import MIN_TEXT_COVERAGE, detect_browser_required, text_coverage
+        from monitor import WebMonitor
+        
+        article = '<html><body><p>' + '商品详情 ' * 60 + '</p></body></html>'
+        shell = '<html><body><div id="root"></div><script src="/app.js"></script></body></html>'
+        challenge = '<html><title>Just a moment...</title><script src="/cdn-cgi/challenge-platform/x.js"></script></html>'
+        if (detect_browser_required(200, {}, article, '商品详情 ' * 60) is not None
+                or detect_browser_required(200, {}, shell, '') != '单页应用外壳页'
+                or detect_browser_required(503, {}, challenge, '') != '反爬验证页'
+                or detect_browser_required(200, {}, shell, None) is not None):
+            print("✗ 需要浏览器的响应判断错误")
+            return False
+        if text_coverage('价格 100\n库存 有货', '价格 100 库存\n有货') != 1.0 \
+                or not 0 < text_coverage('价格 100', '价格 100 库存 有货') < MIN_TEXT_COVERAGE:
+            print("✗ 文本覆盖率计算错误")
+            return False
+        
+        keywords = [{'id': 1, 'keyword': '有货', 'fuzzy_match': 1}]
+        monitor = WebMonitor(None)
+        calls = []
+        pages = {}
+        
+        async def fetch_http_content(url, selector=None):
+            calls.append('http')
+            return pages['http']
+        
+        async def fetch_browser(url_data, keywords):
+            calls.append('browser')
+            return pages['browser']
+        
+        monitor.fetch_http_content = fetch_http_content
+        monitor._fetch_browser = fetch_browser
+        
+        def fetch(http, browser, **url_data):
+            pages['http'], pages['browser'] = http, browser
+            calls.clear()
+            url_data.setdefault('fetch_mode', 'auto')
+            result = asyncio.run(monitor.fetch_content({'url': 'https://example.com/p', **url_data}, keywords))
+            return result, list(calls)
+        
+        same = ('价格 100 库存 有货', None)
+        cases = [
+            # 首次检查：HTTP文本与浏览器一致，以后只用HTTP
+            (fetch(same, '价格 100\n库存 有货'), ('价格 100\n库存 有货', 'browser', 'http'),
+             ['http', 'browser']),
+            (fetch(same, '价格 100 库存 有货', learned_fetch_mode='http'), (same[0], 'http', None), ['http']),
+            # 关键词只出现在浏览器渲染的文本中
+            (fetch(('价格 100 库存', None), '价格 100 库存 有货'), ('价格 100 库存 有货', 'browser', 'browser'),
+             ['http', 'browser']),
+            # JS外壳页；HTTP请求失败（临时错误，不改变学习结果）
+            (fetch((None, '单页应用外壳页'), '有货'), ('有货', 'browser', 'browser'), ['http', 'browser']),
+            (fetch((None, None), '有货'), ('有货', 'browser', None), ['http', 'browser']),
+            # HTTP不支持的选择器：auto模式只用浏览器（不学习HTTP），http模式报错而不是匹配整个页面
+            (fetch(same, '有货', content_selector='div.main p', learned_fetch_mode='http'),
+             ('有货', 'browser', None), ['browser']),
+            (fetch(same, '有货', content_selector='div.main p', fetch_mode='http'), (None, 'http', None), []),
+            (fetch(same, '有货', content_selector='div.main', fetch_mode='http'), (same[0], 'http', None), ['http']),
+        ]
+        for i, ((result, used), expected, expected_calls) in enumerate(cases):
+            if result != expected or used != expected_calls:
+                print(f"✗ 第{i + 1}种情况获取方式错误: {result}")
+                return False
+        
+        print("✓ 页面获取策略正常")
+        return True
+    except Exception as e:
+        print(f"✗ 页面获取策略测试失败: {e}")
+        return False
+
+def test_keyword_stream():
+    """测试流式关键词匹配（内容分块输入的结果与整体匹配相同）"""
+    print("\n测试流式关键词匹配...")
+    try:
+        import random
+        from keyword_matcher import KeywordMatcher
+        from page_text import make_extractor, extract_text
+        
+        html = ('<html><head><script>var a = "上架";</script></head><body>'
+                '<div class="a">商品  <b>已经</b>\n上架了</div><p> Apple pie </p>tail<br> <br>q&amp;r'
+                '<p>apple_pie applepie</p></body></html>') * 3
+        text = extract_text(html)
+        keywords = [
+            {'id': 1, 'keyword': '上架', 'fuzzy_match': 0},
+            {'id': 2, 'keyword': 'Apple', 'fuzzy_match': 0},
+            {'id': 3, 'keyword': 'APPLE', 'fuzzy_match': 0},
+            {'id': 4, 'keyword': 'pie', 'fuzzy_match': 0},
+            {'id': 5, 'keyword': 'q&r', 'fuzzy_match': 1},
+        ]
+        expected = {'word': [2, 3, 4, 5], 'case': [1, 2, 4, 5]}
+        
+        rng = random.Random(0)
+        for _ in range(200):
+            # 文本提取分块进行，拼接结果与一次提取相同
+            parser = make_extractor()
+            streams = {mode: KeywordMatcher(keywords, mode).stream() for mode in expected}
+            extracted = ''
+            i = 0
+            while i < len(html):
+                j = i + rng.randint(1, 12)
+                parser.feed(html[i:j])
+                chunk = parser.take_text()
+                extracted += chunk
+                for stream in streams.values():
+                    stream.feed(chunk)
+                i = j
+            parser.close()
+            chunk = parser.take_text()
+            extracted += chunk
+            
+            if extracted != text:
+                print(f"✗ 分块提取的文本与整体提取不同: {extracted!r}")
+                return False
+            for mode, stream in streams.items():
+                stream.feed(chunk)
+                found = [kw['id'] for kw in stream.finish()]
+                if found != expected[mode] or found != [kw['id'] for kw in KeywordMatcher(keywords, mode).find(text)]:
+                    print(f"✗ 分块匹配结果错误（{mode}）: {found}")
+                    return False
+        
+        print("✓ 流式关键词匹配正常")
+        return True
+    except Exception as e:
+        print(f"✗ 流式关键词匹配测试失败: {e}")
+        return False
+
+def test_log_writer():
+    """测试批量日志写入（按批次写入，关闭时写完队列中剩余的日志）"""
+    print("\n测试批量日志写入...")
+    db_path = 'test_logs.db'
+    try:
+        from database import Database
+        from log_writer import LogWriter
+        db = Database(db_path)
+        db.init_db()
+        url_id = db.add_url('https://example.com/logs', 'Logs', 300)
+        
+        batches = []
+        add_logs = db.add_logs
+        def record_batch(records):
+            batches.append(len(records))
+            add_logs(records)
+        db.add_logs = record_batch
+        
+        # 时间窗口足够长，只有攒够一批或关闭时才会写入
+        writer = LogWriter(db, batch_size=3, flush_interval=60)
+        for i in range(7):
+            writer.add(url_id, message=f'log {i}')
+        writer.close()
+        
+        if batches != [3, 3, 1]:
+            print(f"✗ 写入批次错误: {batches}")
+            return False
+        
+        # 关闭后添加的日志直接写入
+        writer.add(url_id, message='log 7')
+        messages = [log['message'] for log in db.get_logs(limit=100)]
+        db.close()
+        
+        if messages != [f'log {i}' for i in range(7, -1, -1)]:
+            print(f"✗ 日志丢失或顺序错误: {messages}")
+            return False
+        
+        print("✓ 批量日志写入正常")
+        return True
+    except Exception as e:
+        print(f"✗ 批量日志写入测试失败: {e}")
+        return False
+    finally:
+        for path in (db_path, db_path + '-wal', db_path + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+
+def test_log_retention():
+    """测试日志保留策略（按天数、每个URL的条数、总数分批清理）"""
+    print("\n测试日志保留策略...")
+    db_path = 'test_retention.db'
+    try:
+        from database import Database
+        from log_retention import LogRetention
+        db = Database(db_path)
+        db.init_db()
+        url_a = db.add_url('https://example.com/a', 'A', 300)
+        url_b = db.add_url('https://example.com/b', 'B', 300)
+        
+        now = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+        records = [(url_a, None, False, f'old {i}', '2000-01-01 00:00:00') for i in range(10)]
+        records += [(url_a, None, False, f'a {i}', now) for i in range(2)]
+        records += [(url_b, None, False, f'b {i}', now) for i in range(4)]
+        db.add_logs(records)
+        
+        def remaining():
+            return sorted(log['message'] for log in db.get_logs(limit=100))
+        
+        # 每轮最多删除 2x2 条，未清理完的部分留到下一轮
+        retention = LogRetention(db, keep_days=1, chunk_size=2, max_chunks=2)
+        steps = [retention.run_step() for _ in range(4)]
+        if steps != [4, 4, 2, 0] or any(message.startswith('old') for message in remaining()):
+            print(f"✗ 按天数清理错误: {steps}")
+            return False
+        
+        LogRetention(db, keep_per_url=3).run_step()
+        if remaining() != ['a 0', 'a 1', 'b 1', 'b 2', 'b 3']:
+            print(f"✗ 按URL条数清理错误: {remaining()}")
+            return False
+        
+        LogRetention(db, keep_total=3).run_step()
+        if remaining() != ['b 1', 'b 2', 'b 3']:
+            print(f"✗ 按总数清理错误: {remaining()}")
+            return False
+        
+        db.close()
+        print("✓ 日志保留策略正常")
+        return True
+    except Exception as e:
+        print(f"✗ 日志保留策略测试失败: {e}")
+        return False
+    finally:
+        for path in (db_path, db_path + '-wal', db_path + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+
+def test_run_coordinator():
+    """测试运行协调（同一个URL同时只有一次检查，重叠的触发合并为完成后再检查一次）"""
+    print("\n测试运行协调...")
+    try:
+        import threading
+        from run_coordinator import RunCoordinator
+        coordinator = RunCoordinator()
+        
+        if coordinator.claim([1, 2]) != [1, 2]:
+            print("✗ 空闲的URL认领失败")
+            return False
+        coordinator.started(1)
+        
+        # URL 1 正在检查：再次触发（多次）只合并为一次重跑
+        if coordinator.claim([1, 3]) != [3] or coordinator.claim([1]) != []:
+            print("✗ 正在检查的URL被重复认领")
+            return False
+        status = coordinator.status()
+        if status['running'] != [1] or status['queued'] != [2, 3] or status['rerun_pending'] != [1]:
+            print(f"✗ 运行状态错误: {status}")
+            return False
+        
+        # 完成后需要重跑的URL保持认领状态，其余URL释放
+        if coordinator.finish([1, 2]) != [1] or coordinator.claim([2]) != [2]:
+            print("✗ 完成后的重跑/释放错误")
+            return False
+        if coordinator.finish([1, 2, 3]) != [] or coordinator.claim([1]) != [1]:
+            print("✗ 重跑完成后URL未释放")
+            return False
+        
+        # 多个线程同时触发同一个URL，只有一个认领成功
+        claimed = []
+        def claim():
+            claimed.extend(coordinator.claim([4]))
+        threads = [threading.Thread(target=claim) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if claimed != [4] or coordinator.status()['rerun_pending'] != [4]:
+            print(f"✗ 并发触发时认领结果错误: {claimed}")
+            return False
+        
+        print("✓ 运行协调正常")
+        return True
+    except Exception as e:
+        print(f"✗ 运行协调测试失败: {e}")
+        return False
+
+def test_notification_dispatcher():
+    """测试通知派发（同一URL的命中合并、失败重试、发件箱认领与持久化）"""
+    print("\n测试通知派发...")
+    db_path = 'test_outbox.db'
+    try:
+        import asyncio
+        from database import Database
+        from notification_dispatcher import NotificationDispatcher
+        from telegram_bot import SendResult
+        db = Database(db_path)
+        db.init_db()
+        
+        class FakeNotifier:
+            """第一次发送失败（可重试），之后发送成功；最后一个URL的通知无法送达"""
+            def __init__(self):
+                self.messages = []
+            
+            async def deliver(self, message):
+                self.messages.append(message)
+                if 'example.com/c' in message:
+                    return SendResult(False, retryable=False, error='chat not found')
+                if len(self.messages) == 1:
+                    return SendResult(False, error='timeout')
+                return SendResult(True)
+        
+        notifier = FakeNotifier()
+        dispatcher = NotificationDispatcher(db, notifier, merge_window=0.2, min_interval=0,
+                                            base_backoff=0.05)
+        
+        async def run():
+            await dispatcher.notify(1, 'A', 'https://example.com/a', '上架', '库存: 有货')
+            await dispatcher.notify(1, 'A', 'https://example.com/a', '有货', '库存: 有货')
+            await dispatcher.notify(2, 'B', 'https://example.com/b', '降价')
+            await dispatcher.notify(3, 'C', 'https://example.com/c', '开售')
+            for _ in range(100):
+                await asyncio.sleep(0.05)
+                if notifier.messages and db.get_next_notification_time() is None:
+                    break
+            await dispatcher.close()
+        
+        asyncio.run(run())
+        
+        a_messages = [m for m in notifier.messages if 'example.com/a' in m]
+        if len(a_messages) != 2 or a_messages[0] != a_messages[1]:
+            print(f"✗ 发送失败的通知没有重试: {len(a_messages)}")
+            return False
+        if '上架, 有货' not in a_messages[0] or a_messages[0].count('库存: 有货') != 1:
+            print("✗ 同一URL的多个关键词没有合并为一条消息")
+            return False
+        if len(notifier.messages) != 4 or dispatcher.sent != 2 or dispatcher.dropped != 1:
+            print(f"✗ 发送结果统计错误: sent={dispatcher.sent}, dropped={dispatcher.dropped}")
+            return False
+        if db.get_next_notification_time() is not None:
+            print("✗ 已送达或放弃的通知仍留在发件箱中")
+            return False
+        
+        # 发件箱：已认领的通知在租约期内不会被其他进程再次认领
+        db.add_notifications([{'url_id': 4, 'url_name': 'D', 'url': 'https://example.com/d',
+                               'keyword': '补货'}])
+        now = time.time()
+        if len(db.claim_due_notifications(now)) != 1 or db.claim_due_notifications(now):
+            print("✗ 发件箱中的通知被重复认领")
+            return False
+        if len(db.claim_due_notifications(now + 61)) != 1:
+            print("✗ 租约到期后通知未被重新认领")
+            return False
+        
+        # 关闭时尚未写入发件箱的通知被保存，重启后继续发送
+        db.delete_notifications([row['id'] for row in db.claim_due_notifications(now + 200)])
+        async def close_early():
+            await dispatcher.notify(5, 'E', 'https://example.com/e', '到货')
+            await dispatcher.close()
+        asyncio.run(close_early())
+        if [row['keyword'] for row in db.claim_due_notifications(time.time())] != ['到货']:
+            print("✗ 关闭时未发送的通知丢失")
+            return False
+        
+        db.close()
+        print("✓ 通知派发正常")
+        return True
+    except Exception as e:
+        print(f"✗ 通知派发测试失败: {e}")
+        return False
+    finally:
+        for path in (db_path, db_path + '-wal', db_path + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+
+def test_response_cache():
+    """测试接口响应缓存（ETag/304、按标签失效、错误响应不缓存）"""
+    print("\n测试接口响应缓存...")
+    try:
+        from flask import Flask, jsonify
+        from response_cache import ResponseCache
+        
+        app = Flask(__name__)
+        cache = ResponseCache()
+        calls = []
+        
+        @app.route('/items')
+        @cache.cached('items', ttl=60)
+        def items():
+            calls.append('items')
+            if len(calls) == 1:
+                # 生成响应期间数据被修改：这次的结果不能写入缓存
+                cache.invalidate('items')
+            return jsonify(count=len(calls))
+        
+        @app.route('/broken')
+        @cache.cached('items', ttl=60)
+        def broken():
+            calls.append('broken')
+            return jsonify(error='failed'), 500
+        
+        with app.test_client() as client:
+            client.get('/items')
+            first = client.get('/items')
+            second = client.get('/items')
+            if len(calls) != 2 or second.get_json() != {'count': 2}:
+                print(f"✗ 缓存未命中或缓存了过期的响应: {calls}")
+                return False
+            
+            etag = first.headers.get('ETag', '').strip('"')
+            if not etag or second.headers.get('ETag', '').strip('"') != etag:
+                print("✗ 缓存的响应ETag不一致")
+                return False
+            
+            not_modified = client.get('/items', headers={'If-None-Match': f'"{etag}"'})
+            if not_modified.status_code != 304 or not_modified.get_data() or len(calls) != 2:
+                print(f"✗ ETag未变时没有返回304: {not_modified.status_code}")
+                return False
+            
+            cache.invalidate('items')
+            after = client.get('/items', headers={'If-None-Match': f'"{etag}"'})
+            if after.status_code != 200 or after.get_json() != {'count': 3}:
+                print("✗ 标签失效后仍返回旧的缓存")
+                return False
+            
+            client.get('/broken')
+            client.get('/broken')
+            if calls.count('broken') != 2:
+                print("✗ 错误响应被缓存")
+                return False
+        
+        print("✓ 接口响应缓存正常")
+        return True
+    except Exception as e:
+        print(f"✗ 接口响应缓存测试失败: {e}")
+        return False
+
 def test_telegram_bot():
     """测试Telegram机器人（不实际发送）"""
     print("\n测试Telegram机器人...")
@@ -153,6 +697,15 @@ def main():
     results.append(("模块导入", test_imports()))
     results.append(("可选模块", test_optional_imports()))
     results.append(("数据库", test_database()))
+    results.append(("URL租约", test_url_leases()))
+    results.append(("页面变化检测", test_unchanged_page_skip()))
+    results.append(("页面获取策略", test_fetch_strategy()))
+    results.append(("流式关键词匹配", test_keyword_stream()))
+    results.append(("批量日志写入", test_log_writer()))
+    results.append(("日志保留策略", test_log_retention()))
+    results.append(("运行协调", test_run_coordinator()))
+    results.append(("通知派发", test_notification_dispatcher()))
+    results.append(("接口响应缓存", test_response_cache()))
     results.append(("Telegram", test_telegram_bot()))
     results.append(("健康监控", test_health_monitor()))
     results.append(("Flask应用", test_flask_app()))
@@ -0,0 +1,149 @@
+"""
+URL租约模块
+同一台机器上的多个监控进程（app.py 或 worker.py）共享同一个本地数据库文件时，通过 url_leases 表分配到期的URL：
+认领时加租约，检查期间定期续约，完成后释放并写入下次检查时间；
+进程崩溃后租约到期，URL自动由其他进程接管。
+认领依赖 SQLite 的WAL模式和 BEGIN IMMEDIATE 加锁，数据库文件不能放在网络文件系统上（不支持多台机器）
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+from url_scheduler import DEFAULT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseManager:
+    """
+    当前进程持有的URL租约
+    
+    - claim():    认领一批到期的URL
+    - release():  检查完成，释放租约并按检查间隔安排下次检查
+    - 后台线程每 lease_seconds/3 秒为持有的租约续约
+    """
+    
+    def __init__(self, db, worker_id: str = None, lease_seconds: float = 120, batch_size: int = 10,
+                 jitter: float = 0.1, min_interval: int = 10):
+        """
+        Args:
+            db: 数据库实例
+            worker_id: 进程标识，默认为 主机名:PID:随机后缀
+            lease_seconds: 租约时长（秒），进程崩溃后最多经过这么久URL被其他进程接管
+            batch_size: 每次最多认领的URL数
+            jitter: 下次检查时间的随机抖动比例
+            min_interval: 最小检查间隔（秒）
+        """
+        self.db = db
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.jitter = jitter
+        self.min_interval = min_interval
+        
+        self._held = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._renewer: Optional[threading.Thread] = None
+        
+        # 统计
+        self.claimed = 0
+        self.lost = 0   # 续约前租约已过期并被其他进程接管的次数
+    
+    def _next_due(self, interval, now: float) -> float:
+        try:
+            interval = int(interval)
+        except (TypeError, ValueError):
+            interval = DEFAULT_INTERVAL
+        interval = max(interval, self.min_interval)
+        return now + interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+    
+    def claim(self) -> List[int]:
+        """认领到期的URL（最多 batch_size 个）"""
+        url_ids = self.db.claim_due_urls(self.worker_id, self.batch_size, self.lease_seconds)
+        if url_ids:
+            with self._lock:
+                self._held.update(url_ids)
+                self.claimed += len(url_ids)
+            self._start_renewer()
+        return url_ids
+    
+    def release(self, url_ids: Iterable[int], intervals: Dict[int, int] = None):
+        """
+        释放租约并安排下次检查
+        
+        Args:
+            url_ids: 已检查完成的URL
+            intervals: URL ID -> 检查间隔（秒），未提供时从监控配置中读取
+        """
+        url_ids = list(url_ids)
+        if intervals is None:
+            intervals = {url_data['id']: url_data.get('check_interval')
+                         for url_data in self.db.get_monitor_config()}
+        
+        now = time.time()
+        for url_id in url_ids:
+            if not self.db.release_lease(url_id, self.worker_id, self._next_due(intervals.get(url_id), now)):
+                logger.warning(f"URL {url_id} 的租约已被其他进程接管")
+        
+        with self._lock:
+            self._held.difference_update(url_ids)
+    
+    def renew(self):
+        """为持有的所有租约续约"""
+        with self._lock:
+            held = list(self._held)
+        if not held:
+            return
+        
+        renewed = set(self.db.renew_leases(self.worker_id, held, self.lease_seconds))
+        lost = [url_id for url_id in held if url_id not in renewed]
+        if lost:
+            logger.warning(f"租约已过期并被其他进程接管: {lost}")
+            with self._lock:
+                self._held.difference_update(lost)
+                self.lost += len(lost)
+    
+    def _start_renewer(self):
+        with self._lock:
+            if self._renewer is not None and self._renewer.is_alive():
+                return
+            self._stop.clear()
+            self._renewer = threading.Thread(target=self._run_renewer, name='lease-renewer', daemon=True)
+            self._renewer.start()
+    
+    def _run_renewer(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                self.renew()
+            except Exception as e:
+                logger.error(f"租约续约失败: {e}")
+    
+    def close(self):
+        """停止续约，尚未完成的URL立即交还给其他进程"""
+        self._stop.set()
+        if self._renewer is not None:
+            self._renewer.join(5)
+            self._renewer = None
+        
+        with self._lock:
+            held = list(self._held)
+            self._held.clear()
+        now = time.time()
+        for url_id in held:
+            self.db.release_lease(url_id, self.worker_id, now)
+    
+    def status(self) -> Dict:
+        """持有的租约和统计"""
+        with self._lock:
+            return {
+                'worker_id': self.worker_id,
+                'held': sorted(self._held),
+                'claimed': self.claimed,
+                'lost': self.lost
+            }
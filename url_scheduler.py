@@ -0,0 +1,131 @@
+"""
+URL调度模块
+按每个URL的检查间隔（check_interval）计算下次检查时间，只派发到期的URL
+"""
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_INTERVAL = 300
+
+
+class DueScheduler:
+    """
+    到期时间调度器（最小堆）
+    
+    - 堆中保存 (到期时间, 序号, url_id)，修改/删除时不从堆中移除旧条目，
+      而是通过序号判断条目是否已失效（惰性删除）
+    - 每次计算到期时间时加入随机抖动，避免大量URL在同一时刻集中检查
+    - 所有方法线程安全，可在Flask请求线程和调度线程中同时调用
+    """
+    
+    def __init__(self, jitter: float = 0.1, min_interval: int = 10):
+        self.jitter = jitter
+        self.min_interval = min_interval
+        
+        self._heap = []
+        self._entries: Dict[int, Dict] = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+    
+    def _normalize_interval(self, interval) -> int:
+        try:
+            interval = int(interval)
+        except (TypeError, ValueError):
+            interval = DEFAULT_INTERVAL
+        return max(interval, self.min_interval)
+    
+    def _jittered(self, interval: int) -> float:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+    
+    def _push(self, url_id: int, due: float, interval: int, last_run: Optional[float]):
+        seq = next(self._counter)
+        self._entries[url_id] = {
+            'due': due,
+            'interval': interval,
+            'last_run': last_run,
+            'seq': seq,
+        }
+        heapq.heappush(self._heap, (due, seq, url_id))
+    
+    def load(self, urls: Iterable[Dict]):
+        """用启用的URL列表重建调度（首次检查时间在抖动窗口内错开）"""
+        now = time.time()
+        with self._lock:
+            self._heap = []
+            self._entries = {}
+            for url_data in urls:
+                interval = self._normalize_interval(url_data.get('check_interval'))
+                due = now + random.uniform(0, interval * self.jitter)
+                self._push(url_data['id'], due, interval, None)
+        
+        logger.info(f"调度器已加载 {len(self._entries)} 个URL")
+    
+    def upsert(self, url_id: int, interval=None):
+        """添加URL或更新其检查间隔（无需重启调度器）"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(url_id)
+            if interval is None and entry is not None:
+                interval = entry['interval']
+            new_interval = self._normalize_interval(interval)
+            
+            if entry is None:
+                # 新URL尽快检查一次
+                due = now + random.uniform(0, self.min_interval)
+                self._push(url_id, due, new_interval, None)
+                return
+            
+            # 间隔变化后，按上次检查时间重新计算，取较早的到期时间
+            base = entry['last_run'] or now
+            due = min(entry['due'], base + self._jittered(new_interval))
+            self._push(url_id, due, new_interval, entry['last_run'])
+    
+    def remove(self, url_id: int):
+        """移除URL（删除或禁用时调用）"""
+        with self._lock:
+            self._entries.pop(url_id, None)
+    
+    def pop_due(self, now: float = None) -> List[int]:
+        """取出所有已到期的URL，并按各自间隔安排下一次检查"""
+        now = now or time.time()
+        due_ids = []
+        
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due, seq, url_id = heapq.heappop(self._heap)
+                entry = self._entries.get(url_id)
+                if entry is None or entry['seq'] != seq:
+                    # 已删除或已被更新的旧条目
+                    continue
+                
+                due_ids.append(url_id)
+                metrics.SCHEDULE_LAG_SECONDS.observe(now - due)
+                self._push(url_id, now + self._jittered(entry['interval']), entry['interval'], now)
+            
+            # 失效条目过多时重建堆，避免无限增长
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._heap = [(e['due'], e['seq'], url_id) for url_id, e in self._entries.items()]
+                heapq.heapify(self._heap)
+        
+        return due_ids
+    
+    def next_due_time(self) -> Optional[float]:
+        """最近一次到期时间（时间戳）"""
+        with self._lock:
+            if not self._entries:
+                return None
+            return min(entry['due'] for entry in self._entries.values())
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,101 @@
+"""
+分布式检查进程（不启动Web界面）
+与 app.py 共享同一个数据库文件，通过租约表认领到期的URL并检查，
+可以在同一台机器上启动任意多个。
+只支持同一台机器上的本地数据库文件：SQLite 的WAL模式和 BEGIN IMMEDIATE 加锁依赖本机共享内存和文件锁，
+不能用于NFS/SMB等网络文件系统，多台机器共享数据库文件可能导致重复认领或数据库损坏
+
+用法: python worker.py [--worker-id ID] [--batch-size N] [--lease-seconds S] [--db monitor.db]
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from database import Database
+from http_session import session_pool
+from log_writer import LogWriter
+from monitor import WebMonitor
+from notification_dispatcher import NotificationDispatcher
+from telegram_bot import TelegramNotifier
+from url_leases import LeaseManager
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('worker')
+
+# 没有到期URL时的轮询间隔（秒）
+POLL_INTERVAL = 5
+
+
+async def run_worker(db: Database, leases: LeaseManager, stop: asyncio.Event):
+    """循环认领到期的URL并检查，直到收到停止信号"""
+    log_writer = LogWriter(db)
+    dispatcher = NotificationDispatcher(db)
+    
+    config = db.get_telegram_config()
+    telegram_notifier = None
+    if config:
+        telegram_notifier = TelegramNotifier(config['bot_token'], config['chat_id'], config.get('proxy_url'))
+    dispatcher.notifier = telegram_notifier
+    
+    monitor = WebMonitor(db, telegram_notifier, log_writer=log_writer,
+                         notification_dispatcher=dispatcher)
+    await dispatcher.start()
+    logger.info(f"检查进程已启动: {leases.worker_id}")
+    
+    try:
+        while not stop.is_set():
+            url_ids = await asyncio.to_thread(leases.claim)
+            if not url_ids:
+                try:
+                    await asyncio.wait_for(stop.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            wanted = set(url_ids)
+            urls = [url_data for url_data in db.get_monitor_config() if url_data['id'] in wanted]
+            try:
+                await monitor.check_urls(urls)
+            finally:
+                await asyncio.to_thread(leases.release, url_ids,
+                                        {url_data['id']: url_data.get('check_interval') for url_data in urls})
+    finally:
+        await monitor.close()
+        await session_pool.close()
+        await dispatcher.close()
+        log_writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分布式检查进程')
+    parser.add_argument('--worker-id', help='进程标识（默认 主机名:PID:随机后缀）')
+    parser.add_argument('--batch-size', type=int, default=3, help='每次认领的URL数')
+    parser.add_argument('--lease-seconds', type=float, default=120, help='租约时长（秒）')
+    parser.add_argument('--db', default='monitor.db', help='数据库文件路径')
+    args = parser.parse_args()
+    
+    db = Database(args.db)
+    db.init_db()
+    leases = LeaseManager(db, args.worker_id, args.lease_seconds, args.batch_size)
+    
+    async def run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await run_worker(db, leases, stop)
+    
+    try:
+        asyncio.run(run())
+    finally:
+        leases.close()
+        db.close()
+        logger.info("检查进程已退出")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""
+多进程检查模块
+每个工作进程拥有自己的事件循环和浏览器池，负责页面获取、内容归一化和关键词匹配；
+URL按域名一致性哈希分配到固定的工作进程（同一域名的页面文本缓存和浏览器上下文留在同一进程），
+检查结果发回主进程，由主进程统一写入数据库、记录日志和发送通知
+"""
+import asyncio
+import bisect
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# 工作进程任务队列的停止标记
+_STOP = None
+
+
+class HashRing:
+    """
+    一致性哈希环
+    
+    每个节点在环上放置多个虚拟节点，节点数量变化时只有少量域名改变归属
+    """
+    
+    def __init__(self, nodes: List[int], replicas: int = 64):
+        self._ring = sorted((self._hash(f"{node}:{i}"), node) for node in nodes for i in range(replicas))
+        self._keys = [key for key, _ in self._ring]
+    
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int(hashlib.md5(value.encode('utf-8')).hexdigest()[:16], 16)
+    
+    def get(self, key: str) -> int:
+        """返回 key 所属的节点"""
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._keys)
+        return self._ring[index][1]
+
+
+def _worker_main(index: int, db_path: str, max_contexts: int, tasks, results):
+    """工作进程入口"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    try:
+        asyncio.run(_worker_loop(index, db_path, max_contexts, tasks, results))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _worker_loop(index: int, db_path: str, max_contexts: int, tasks, results):
+    # 在工作进程中导入，主进程只需要本模块的调度部分
+    from browser_pool import BrowserPool
+    from database import Database
+    from http_session import session_pool
+    from monitor import WebMonitor
+    
+    # 工作进程只读取数据库（关键词、页面指纹），写入都由主进程完成
+    db = Database(db_path, pool_size=2)
+    monitor = WebMonitor(db, browser_pool=BrowserPool(max_contexts=max_contexts))
+    loop = asyncio.get_running_loop()
+    running = set()
+    
+    async def inspect(task_id: int, url_data: Dict):
+        try:
+            result = await monitor.inspect_url(url_data)
+        except Exception as e:
+            logger.error(f"检查URL失败: {url_data.get('name', url_data['url'])}, 错误: {e}")
+            result = {'status': 'error'}
+        results.put((task_id, result))
+    
+    logger.info(f"工作进程 {index} 已启动")
+    try:
+        # 浏览器在第一次需要时才启动（只用HTTP请求的URL不会启动浏览器）
+        while True:
+            item = await loop.run_in_executor(None, tasks.get)
+            if item is _STOP:
+                break
+            # 并发数由浏览器池的上下文数量限制
+            task = asyncio.ensure_future(inspect(*item))
+            running.add(task)
+            task.add_done_callback(running.discard)
+        
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+    finally:
+        await monitor.close()
+        await session_pool.close()
+        db.close()
+        logger.info(f"工作进程 {index} 已退出")
+
+
+class WorkerPool:
+    """
+    检查工作进程池
+    
+    - inspect():  把URL发送到其域名对应的工作进程，等待检查结果（在主进程的事件循环中调用）
+    - 工作进程意外退出时，分配给它的任务返回错误结果，下一次提交时自动重启该进程
+    """
+    
+    def __init__(self, db_path: str, num_workers: int = 2, max_contexts: int = 2,
+                 task_timeout: float = 300):
+        """
+        Args:
+            db_path: 数据库文件路径（工作进程只读）
+            num_workers: 工作进程数
+            max_contexts: 每个工作进程的浏览器上下文数量
+            task_timeout: 单个URL检查的超时时间（秒），超时视为获取失败
+        """
+        self.db_path = db_path
+        self.num_workers = num_workers
+        self.max_contexts = max_contexts
+        self.task_timeout = task_timeout
+        
+        # 使用spawn启动：主进程中有事件循环线程、调度器线程，fork后的子进程状态不可靠
+        self._context = multiprocessing.get_context('spawn')
+        self._ring = HashRing(list(range(num_workers)))
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * num_workers
+        self._tasks: List = [None] * num_workers
+        self._results = None
+        self._result_thread: Optional[threading.Thread] = None
+        self._pending: Dict[int, tuple] = {}  # 任务ID -> (事件循环, Future, 工作进程序号)
+        self._task_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._running = False
+        
+        # 统计
+        self.restarts = 0
+    
+    @property
+    def capacity(self) -> int:
+        """全部工作进程可同时检查的URL数"""
+        return self.num_workers * self.max_contexts
+    
+    def start(self):
+        """启动工作进程和结果接收线程（已启动则直接返回）"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._results = self._context.Queue()
+            for index in range(self.num_workers):
+                self._start_worker(index)
+            self._result_thread = threading.Thread(target=self._receive_results,
+                                                   name='worker-results', daemon=True)
+            self._result_thread.start()
+        logger.info(f"已启动 {self.num_workers} 个检查工作进程")
+    
+    def _start_worker(self, index: int):
+        self._tasks[index] = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self.db_path, self.max_contexts, self._tasks[index], self._results),
+            name=f'monitor-worker-{index}',
+            daemon=True
+        )
+        process.start()
+        self._processes[index] = process
+    
+    def worker_for(self, url: str) -> int:
+        """URL所属的工作进程序号（按域名一致性哈希）"""
+        host = (urlparse(url).hostname or url).lower()
+        return self._ring.get(host)
+    
+    async def inspect(self, url_data: Dict) -> Dict:
+        """
+        在工作进程中检查URL
+        
+        Returns:
+            与 WebMonitor.inspect_url() 相同格式的检查结果
+        """
+        self.start()
+        index = self.worker_for(url_data['url'])
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        task_id = next(self._task_ids)
+        
+        orphaned = []
+        with self._lock:
+            process = self._processes[index]
+            if process is None or not process.is_alive():
+                # 已分配给旧进程的任务不会再有结果（新进程使用新的任务队列），立即返回错误
+                if process is not None:
+                    orphaned = [orphan_id for orphan_id, entry in self._pending.items()
+                                if entry[2] == index]
+                logger.warning(f"工作进程 {index} 已退出，正在重启")
+                self._start_worker(index)
+                self.restarts += 1
+            self._pending[task_id] = (loop, future, index)
+            self._tasks[index].put((task_id, url_data))
+        for orphan_id in orphaned:
+            self._resolve(orphan_id, {'status': 'error'})
+        
+        try:
+            return await asyncio.wait_for(future, self.task_timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"工作进程检查超时: {url_data.get('name', url_data['url'])}")
+            return {'status': 'error'}
+        finally:
+            with self._lock:
+                self._pending.pop(task_id, None)
+    
+    def _resolve(self, task_id: int, result: Dict):
+        with self._lock:
+            entry = self._pending.pop(task_id, None)
+        if entry is None:
+            return
+        loop, future, _ = entry
+        
+        def set_result():
+            if not future.done():
+                future.set_result(result)
+        loop.call_soon_threadsafe(set_result)
+    
+    def _receive_results(self):
+        """把工作进程发回的结果交给等待中的协程，同时处理意外退出的工作进程"""
+        while self._running:
+            try:
+                task_id, result = self._results.get(timeout=1)
+            except queue.Empty:
+                self._fail_dead_workers()
+                continue
+            except (EOFError, OSError):
+                break
+            self._resolve(task_id, result)
+    
+    def _fail_dead_workers(self):
+        with self._lock:
+            dead = {index for index, process in enumerate(self._processes)
+                    if process is not None and not process.is_alive()}
+            task_ids = [task_id for task_id, entry in self._pending.items() if entry[2] in dead]
+        for task_id in task_ids:
+            self._resolve(task_id, {'status': 'error'})
+    
+    def status(self) -> Dict:
+        """工作进程状态"""
+        with self._lock:
+            return {
+                'workers': [
+                    {'pid': process.pid, 'alive': process.is_alive()} if process else None
+                    for process in self._processes
+                ],
+                'pending': len(self._pending),
+                'restarts': self.restarts
+            }
+    
+    def close(self, timeout: float = 30):
+        """通知工作进程处理完已提交的任务后退出"""
+        with self._lock:
+            if not self._running:
+                return
+            processes = [process for process in self._processes if process is not None]
+            for index, process in enumerate(self._processes):
+                if process is not None and process.is_alive():
+                    self._tasks[index].put(_STOP)
+        
+        for process in processes:
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning(f"工作进程 {process.name} 未能按时退出，强制结束")
+                process.terminate()
+                process.join(5)
+        
+        self._running = False
+        if self._result_thread is not None:
+            self._result_thread.join(5)
+            self._result_thread = None
+        # 唤醒仍在等待结果的协程
+        for task_id in list(self._pending):
+            self._resolve(task_id, {'status': 'error'})
+        self._processes = [None] * self.num_workers
+        logger.info("检查工作进程已全部退出")